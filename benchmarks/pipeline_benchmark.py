@@ -0,0 +1,234 @@
+#!/usr/bin/python
+# End-to-end benchmark of the Sense2GoL processing chain (raw data extraction, FFT, Doppler centroid, plots, report)
+# on synthetic captures (see custom_modules/devices.py), over a grid of settings.
+#
+# Each configuration runs in a new process, so that its peak RSS is not inflated by the previous ones.
+# For each stage: wall time (median of the repeats, all directions of one scan), peak RSS of the process at the end
+# of the stage, and memory allocated by the stage (tracemalloc peak, in a separate untimed scan).
+# Results are printed as JSON. With --baseline (the JSON of a previous run), wall times and allocations are compared
+# and any regression makes the script fail. Baselines are machine specific: keep one for each target (Pi Zero, Pi 3B+).
+#
+# Launch from "radars" root folder, e.g.:
+# python benchmarks/pipeline_benchmark.py --fft-resolution 1 0.5 --directions 3 5 --output pizero.json
+# python benchmarks/pipeline_benchmark.py --fft-resolution 1 0.5 --directions 3 5 --baseline pizero.json
+import argparse
+import copy
+import contextlib
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+os.environ.setdefault('MPLBACKEND', 'Agg') # Plots saved, never shown.
+import numpy as np
+sys.path.insert(1, ".")
+from custom_modules.devices import SimulatedScene, SimulatedSense2GoL
+from custom_modules.sense2gol import raw_extract, write_report
+from custom_modules.settings import DEFAULT_SETTINGS_FILE, Settings
+from custom_modules.signal_processing import FFTPlan, centroid_estimation
+
+try:
+    import resource
+except ImportError: # Windows: no peak RSS
+    resource = None
+
+BENCHMARK_VERSION = 1
+# FFT: FFTPlan.process() as called by the monitoring scripts (spectrum, centroid and velocity).
+# centroid_estimation: timed alone, on the same smoothed spectrum.
+STAGES = ('FFT_parameters', 'txt_extract', 'FFT', 'centroid_estimation', 'plots', 'report')
+DEFAULT_TOLERANCE = 0.25 # Relative increase considered a regression.
+DEFAULT_MIN_WALL_DIFFERENCE_S = 0.002 # Smaller differences are timing noise.
+DEFAULT_MIN_ALLOCATED_DIFFERENCE_MIB = 0.5
+
+def peak_rss_MiB():
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / 2**20 if sys.platform == 'darwin' else maxrss / 2**10 # Bytes on macOS, KiB elsewhere.
+
+def configuration_settings(baseSettings: dict, resolution_Hz: float, samplesPerFrame: int, frames: int, directions: int):
+    settings = copy.deepcopy(baseSettings)
+    settings['signal-processing']['fft-resolution-Hz'] = resolution_Hz
+    settings['signal-processing']['print-fft-info'] = False
+    settings['sense2gol']['samples-per-frame'] = samplesPerFrame
+    settings['sense2gol']['number-of-frames'] = frames
+    settings['raspberry-pi-zero']['directions'] = directions
+    return Settings(settings)
+
+def run_configuration(task):
+    '''
+    Benchmark of one configuration: synthetic captures (not timed), one warm-up scan, timed scans, traced scan.
+    :return: Results of the configuration (dict, see main()).
+    '''
+    baseSettings, (resolution_Hz, samplesPerFrame, frames, directions), rawDataFormat, repeats, plotsEnabled, seed = task
+    warnings.simplefilter('ignore') # Console output of the pipeline (warnings included) is not part of the benchmark.
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull), tempfile.TemporaryDirectory() as outputPath:
+        settings = configuration_settings(baseSettings, resolution_Hz, samplesPerFrame, frames, directions)
+        radar, signalProcessing = settings.radar, settings.signalProcessing
+        SAMPLING_FREQUENCY, ADC_RANGE_BITS = settings.samplingFrequency, settings.adcRangeBits
+        antennaBeamDirections_DEG, tiltAngle_DEG = settings.antennaBeamDirections_DEG, settings.tiltAngle_DEG
+        plotPath = outputPath + os.sep
+        simulator = SimulatedSense2GoL(SimulatedScene(seed=seed), outputPath=outputPath)
+        fileNames = [simulator.acquire(settings.tiltAngle_DEG_str, 0, 1, "dir{:.1f}deg".format(direction_DEG), radar.frames, radar.samplesPerFrame, settings.serialBufferSize, radar.serialTimeout_s,
+                                       rawDataFormat, SAMPLING_FREQUENCY, ADC_RANGE_BITS, radar.adcRange_V, tiltAngle_DEG, direction_DEG) for direction_DEG in antennaBeamDirections_DEG]
+
+        def plot_direction(fftPlan, timeAxis_s, I_array_mV, Q_array_mV, complexSignal_mV, result):
+            # Same plots as the monitoring script (sequential scan)
+            import custom_modules.plots_readytouse as plots
+            plots.plot_IFI_IFQ(timeAxis_s, I_array_mV, Q_array_mV, "time (s)", "voltage (mV)", False, True, False, True, plotPath)
+            plots.plot_doppler_centroid(result.freqAxis_Hz, result.FFT_dBV, result.FFT_dBV_smoothed, result.centroid_start, result.centroid_stop, result.centroid_threshold, "frequency (Hz)", "FFT magnitude (dBV)", fftPlan.zeroForcing, fftPlan.frequencyMin_fixed, fftPlan.frequencyMax_fixed, False, True, False, True, plotPath)
+            if signalProcessing.spectrogramEnabled:
+                plots.plot_spectrogram(complexSignal_mV, SAMPLING_FREQUENCY, signalProcessing.stftOverlappingSamples, signalProcessing.stftSamplesInSegment, signalProcessing.stftBins, 'time (s)', 'frequency (Hz)', False, True, False, True, plotPath)
+
+        def scan(measure):
+            fftPlan = measure('FFT_parameters', FFTPlan.from_settings, settings.signalProcessing, SAMPLING_FREQUENCY, settings.platform.targetThreshold_dBV)
+            FFT_dBV_peaks = np.zeros((1, directions))
+            centroid_frequencies = np.zeros((1, directions))
+            surface_velocities_table = np.zeros((1, directions))
+            for direction, fileName in enumerate(fileNames):
+                I_array_mV, Q_array_mV, complexSignal_mV, timeAxis_s, IQ_arrays_length = measure('txt_extract', raw_extract, fileName, ADC_RANGE_BITS, radar.adcRange_V, SAMPLING_FREQUENCY)
+                result = measure('FFT', fftPlan.process, complexSignal_mV, antennaBeamDirections_DEG[direction], tiltAngle_DEG)
+                FFT_dBV_peaks[0,direction], centroid_frequencies[0,direction], surface_velocities_table[0,direction] = result.FFT_dBV_max, result.centroid_frequency, result.surface_velocity
+                measure('centroid_estimation', centroid_estimation, result.FFT_dBV_smoothed, fftPlan.bandwidthThreshold, fftPlan.freqAxis_Hz, fftPlan.frequencyMin_fixed, result.FFT_dBV_max, fftPlan.freqBins_FFT, fftPlan.centroidMethod, fftPlan.contiguousBand)
+                if plotsEnabled:
+                    measure('plots', plot_direction, fftPlan, timeAxis_s, I_array_mV, Q_array_mV, complexSignal_mV, result)
+            measure('report', write_report, os.path.join(outputPath, 'report.txt'), FFT_dBV_peaks, centroid_frequencies, surface_velocities_table, antennaBeamDirections_DEG, True, False)
+            return fftPlan
+
+        # Warm-up: imports (e.g. matplotlib), caches, first touch of the buffers
+        fftPlan = scan(lambda stage, function, *args: function(*args))
+
+        wallTimes, peakRSS = {}, {}
+        for repeat in range(repeats):
+            totals = {}
+            def timed(stage, function, *args):
+                start = time.perf_counter()
+                result = function(*args)
+                totals[stage] = totals.get(stage, 0.0) + time.perf_counter() - start
+                peakRSS[stage] = peak_rss_MiB()
+                return result
+            scan(timed)
+            for stage, total in totals.items():
+                wallTimes.setdefault(stage, []).append(total)
+
+        allocated = {}
+        def traced(stage, function, *args):
+            tracemalloc.reset_peak()
+            start = tracemalloc.get_traced_memory()[0]
+            result = function(*args)
+            allocated[stage] = max(allocated.get(stage, 0), tracemalloc.get_traced_memory()[1] - start)
+            return result
+        tracemalloc.start()
+        try:
+            scan(traced)
+        finally:
+            tracemalloc.stop()
+
+    stages = {stage: {'wall_s': float(np.median(wallTimes[stage])), 'wall_s_min': min(wallTimes[stage]), 'peak_rss_MiB': peakRSS[stage], 'allocated_MiB': allocated[stage] / 2**20}
+              for stage in STAGES if stage in wallTimes}
+    acquisition_s = directions * settings.totalSamples / SAMPLING_FREQUENCY
+    processing_s = sum(values['wall_s'] for values in stages.values())
+    return {'configuration': {'fft-resolution-Hz': resolution_Hz, 'samples-per-frame': samplesPerFrame, 'number-of-frames': frames, 'directions': directions, 'raw-data-format': rawDataFormat},
+            'fft-bins': fftPlan.freqBins_FFT, 'acquisition_s': acquisition_s, 'processing_s': processing_s, 'scan_s': acquisition_s + processing_s, 'stages': stages}
+
+def configuration_key(result):
+    return json.dumps(result['configuration'], sort_keys=True)
+
+def compare(results, baseline, tolerance: float = DEFAULT_TOLERANCE, minWallDifference_s: float = DEFAULT_MIN_WALL_DIFFERENCE_S, minAllocatedDifference_MiB: float = DEFAULT_MIN_ALLOCATED_DIFFERENCE_MIB):
+    '''
+    Regressions with respect to a baseline run: wall time or allocated memory of a stage increased by more than
+    tolerance (relative) and by more than the minimum difference (absolute). Configurations missing from the baseline are skipped.
+    :return: List of (configuration, stage, metric, baseline value, new value).
+    '''
+    baselineResults = {configuration_key(result): result for result in baseline['results']}
+    regressions = []
+    for result in results:
+        baselineResult = baselineResults.get(configuration_key(result))
+        if baselineResult is None:
+            print("Not in the baseline: " + configuration_key(result), file=sys.stderr)
+            continue
+        for stage, values in result['stages'].items():
+            baselineValues = baselineResult['stages'].get(stage)
+            if baselineValues is None:
+                continue
+            for metric, minDifference in (('wall_s', minWallDifference_s), ('allocated_MiB', minAllocatedDifference_MiB)):
+                new, old = values[metric], baselineValues[metric]
+                if new > old * (1 + tolerance) and new - old > minDifference:
+                    regressions.append((result['configuration'], stage, metric, old, new))
+    return regressions
+
+def print_summary(results, cycleBudget_s=None, file=sys.stderr):
+    header = '{:>8} {:>6} {:>7} {:>4} {:>6}'.format('res.Hz', 'spf', 'frames', 'dir', 'bins') + ''.join(' {:>12}'.format(stage[:12]) for stage in STAGES) + ' {:>8} {:>8} {:>8}'.format('proc.s', 'scan.s', 'RSS.MiB')
+    print(header, file=file)
+    for result in results:
+        configuration, stages = result['configuration'], result['stages']
+        line = '{:>8g} {:>6d} {:>7d} {:>4d} {:>6d}'.format(configuration['fft-resolution-Hz'], configuration['samples-per-frame'], configuration['number-of-frames'], configuration['directions'], result['fft-bins'])
+        line += ''.join(' {:>12.4f}'.format(stages[stage]['wall_s']) if stage in stages else ' {:>12}'.format('-') for stage in STAGES)
+        peakRSS = max((values['peak_rss_MiB'] or 0) for values in stages.values())
+        line += ' {:>8.3f} {:>8.3f} {:>8.1f}'.format(result['processing_s'], result['scan_s'], peakRSS)
+        if cycleBudget_s is not None and not result['fits_cycle_budget']:
+            line += '  OVER BUDGET'
+        print(line, file=file)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the acquisition-to-velocity pipeline (Sense2GoL layout), on synthetic captures.")
+    parser.add_argument('--settings', default=DEFAULT_SETTINGS_FILE, help="Base settings *.json file (Sense2GoL layout).")
+    parser.add_argument('--fft-resolution', type=float, nargs='+', default=[1.0, 0.5], help="fft-resolution-Hz values (Hz).")
+    parser.add_argument('--samples-per-frame', type=int, nargs='+', default=[128], help="samples-per-frame values.")
+    parser.add_argument('--frames', type=int, nargs='+', default=[1, 8], help="number-of-frames values.")
+    parser.add_argument('--directions', type=int, nargs='+', default=[3], help="Number of directions.")
+    parser.add_argument('--raw-data-format', choices=('txt', 'bin'), default='txt', help="Format of the synthetic captures.")
+    parser.add_argument('--repeats', type=int, default=5, help="Timed scans for each configuration.")
+    parser.add_argument('--no-plots', action='store_true', help="Skip the plots stage.")
+    parser.add_argument('--no-isolation', action='store_true', help="Run all the configurations in this process (faster, but peak RSS is cumulative).")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the synthetic captures.")
+    parser.add_argument('--cycle-budget-s', type=float, default=None, help="Time available for one scan (s): configurations exceeding it are flagged.")
+    parser.add_argument('--output', default=None, help="JSON results file (default: standard output).")
+    parser.add_argument('--baseline', default=None, help="JSON results of a previous run: exit with an error on regressions.")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help="Relative increase considered a regression.")
+    args = parser.parse_args()
+
+    with open(args.settings) as f:
+        baseSettings = json.load(f)
+    if 'sense2gol' not in baseSettings:
+        parser.error("Sense2GoL settings needed (e.g. sense2gol_pizero/settings.json).")
+    grid = list(itertools.product(args.fft_resolution, args.samples_per_frame, args.frames, args.directions))
+    tasks = [(baseSettings, configuration, args.raw_data_format, args.repeats, not args.no_plots, args.seed) for configuration in grid]
+    if args.no_isolation:
+        results = [run_configuration(task) for task in tasks]
+    else:
+        # A new process for each configuration (spawned: no memory inherited from this one)
+        with multiprocessing.get_context('spawn').Pool(1, maxtasksperchild=1) as pool:
+            results = pool.map(run_configuration, tasks, chunksize=1)
+    for result in results:
+        result['fits_cycle_budget'] = None if args.cycle_budget_s is None else result['scan_s'] <= args.cycle_budget_s
+
+    report = {'benchmark': 'pipeline', 'version': BENCHMARK_VERSION, 'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+              'platform': {'machine': platform.machine(), 'processor': platform.processor(), 'system': platform.platform(), 'python': platform.python_version(), 'numpy': np.__version__, 'cpus': os.cpu_count()},
+              'settings': args.settings, 'repeats': args.repeats, 'plots': not args.no_plots, 'cycle_budget_s': args.cycle_budget_s, 'results': results}
+    print_summary(results, args.cycle_budget_s)
+    if args.output is None:
+        print(json.dumps(report, indent=1))
+    else:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1)
+
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline['platform']['machine'] != report['platform']['machine']:
+            print("WARNING: baseline recorded on a different machine ({}).".format(baseline['platform']['machine']), file=sys.stderr)
+        regressions = compare(results, baseline, args.tolerance)
+        for configuration, stage, metric, old, new in regressions:
+            print("REGRESSION: {} {} {}: {:.4g} -> {:.4g} (+{:.0%})".format(json.dumps(configuration, sort_keys=True), stage, metric, old, new, new/old - 1 if old > 0 else float('inf')), file=sys.stderr)
+        if regressions:
+            sys.exit("{:d} regression(s) with respect to {}.".format(len(regressions), args.baseline))
+        print("No regressions with respect to {}.".format(args.baseline), file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
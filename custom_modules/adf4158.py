@@ -1,5 +1,12 @@
+import logging
+import sys
 from math import log2
 
+# Register values and derived ramp parameters are DEBUG records: printed when run as a script
+logger = logging.getLogger(__name__)
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG, format='%(message)s', stream=sys.stdout)
+
 # Parameters for FMCW radar (triengle chirp)
 ### User Input
 VCO_FREQUENCY_START = 23.5e9 # Hz
@@ -10,51 +17,51 @@ UPCHIRP_TIME = 1.25e-3 # s
 UPCHIRP_NUMBER_OF_STEPS = 1000
 REF_IN_FREQUENCY = 10e6 # Hz
 ### End of User Input
-print("\nFMCW ramp parameters (triangle chirp):")
-print("VCO frequency start: {:e} Hz".format(VCO_FREQUENCY_START))
-print("VCO frequency stop: {:e} Hz".format(VCO_FREQUENCY_STOP))
+logger.debug("\nFMCW ramp parameters (triangle chirp):")
+logger.debug("VCO frequency start: {:e} Hz".format(VCO_FREQUENCY_START))
+logger.debug("VCO frequency stop: {:e} Hz".format(VCO_FREQUENCY_STOP))
 vcoSweep = VCO_FREQUENCY_STOP - VCO_FREQUENCY_START # Hz
-print("VCO sweep: {:e} Hz".format(vcoSweep))
-print("Prescaler ratio: {:}".format(PRESCALER_RATIO.as_integer_ratio()))
+logger.debug("VCO sweep: {:e} Hz".format(vcoSweep))
+logger.debug("Prescaler ratio: {:}".format(PRESCALER_RATIO.as_integer_ratio()))
 pllFrequencyStart = VCO_FREQUENCY_START*PRESCALER_RATIO # Hz
-print("PLL frequency start: {:e} Hz".format(pllFrequencyStart))
+logger.debug("PLL frequency start: {:e} Hz".format(pllFrequencyStart))
 pllFrequencyStop = VCO_FREQUENCY_STOP*PRESCALER_RATIO # Hz
-print("PLL frequency stop: {:e} Hz".format(pllFrequencyStop))
+logger.debug("PLL frequency stop: {:e} Hz".format(pllFrequencyStop))
 pllSweep = pllFrequencyStop - pllFrequencyStart # Hz
-print("PLL sweep: {:e} Hz".format(pllSweep))
-print("Chirp time (up-chirp): {:e} s".format(UPCHIRP_TIME))
-print("Wait time before up-chirp: {:e} s".format(UPCHIRP_WAIT_TIME))
+logger.debug("PLL sweep: {:e} Hz".format(pllSweep))
+logger.debug("Chirp time (up-chirp): {:e} s".format(UPCHIRP_TIME))
+logger.debug("Wait time before up-chirp: {:e} s".format(UPCHIRP_WAIT_TIME))
 modulationPeriod = UPCHIRP_WAIT_TIME + UPCHIRP_TIME*2 # s
-print("Modulation period: {:e} s".format(modulationPeriod))
-print("Number of steps (up-chirp): {:d}".format(UPCHIRP_NUMBER_OF_STEPS))
+logger.debug("Modulation period: {:e} s".format(modulationPeriod))
+logger.debug("Number of steps (up-chirp): {:d}".format(UPCHIRP_NUMBER_OF_STEPS))
 stepDuration = UPCHIRP_TIME/UPCHIRP_NUMBER_OF_STEPS # s
-print("Step duration: {:e} s".format(stepDuration))
+logger.debug("Step duration: {:e} s".format(stepDuration))
 vcoStepDeviation = (VCO_FREQUENCY_STOP - VCO_FREQUENCY_START)/UPCHIRP_NUMBER_OF_STEPS # Hz
-print("Step deviation (VCO): {:e} Hz".format(vcoStepDeviation))
+logger.debug("Step deviation (VCO): {:e} Hz".format(vcoStepDeviation))
 pllStepDeviation = vcoStepDeviation*PRESCALER_RATIO # Hz
-print("Step deviation (PLL): {:e} Hz".format(pllStepDeviation))
-print("IF frequency of static target: {:e} Hz/m".format(2*vcoSweep/(3e8*UPCHIRP_TIME)))
+logger.debug("Step deviation (PLL): {:e} Hz".format(pllStepDeviation))
+logger.debug("IF frequency of static target: {:e} Hz/m".format(2*vcoSweep/(3e8*UPCHIRP_TIME)))
 
 # ADF4158 parameters
-print("\nADF4158 parameters:")
+logger.debug("\nADF4158 parameters:")
 # PFD settings
 RDIV2_ENABLED = False # This can be used to provide a 50% duty cycle signal at the PFD for use with cycle slip reduction
 CYCLE_SLIP_REDUCTION_ENABLED = False # method for improving lock times
 REFERENCE_DOUBLER_ENABLED = True # Multiplies REF_IN by 2
 R_COUNTER = 1 # 5-bit word (integer value from 1 to 32). Divide down the REF_IN frequency by this value, to produce the PFD frequency
 pfdFrequency = REF_IN_FREQUENCY * ((1 + REFERENCE_DOUBLER_ENABLED)/(R_COUNTER*(1 + RDIV2_ENABLED))) # Hz
-print("PFD frequency: {:e} Hz".format(pfdFrequency))
+logger.debug("PFD frequency: {:e} Hz".format(pfdFrequency))
 pllResolution = pfdFrequency/2**25 # Hz
-print("Frequency resolution (PLL): {:e} Hz".format(pllResolution))
+logger.debug("Frequency resolution (PLL): {:e} Hz".format(pllResolution))
 vcoResolution = pllResolution/PRESCALER_RATIO # Hz
-print("Frequency resolution (VCO): {:e} Hz".format(vcoResolution))
+logger.debug("Frequency resolution (VCO): {:e} Hz".format(vcoResolution))
 
 
 # Charge pump settings
 RESISTOR_CHARGE_PUMP = 5.1e3 # Ohm
 CHARGE_PUMP_LEVEL = 7 # 4-bit word (integer value from 0 to 15)
 MAX_CHARGE_PUMP_CURRENT = 25.5/RESISTOR_CHARGE_PUMP # A
-print("Charge Pump Current = {:e} A".format((CHARGE_PUMP_LEVEL+1)*MAX_CHARGE_PUMP_CURRENT/16))
+logger.debug("Charge Pump Current = {:e} A".format((CHARGE_PUMP_LEVEL+1)*MAX_CHARGE_PUMP_CURRENT/16))
 CHARGE_PUMP_THREESTATE_ENABLED = False # set to False for normal operation
 
 # Other settings
@@ -90,7 +97,7 @@ SD_MODULATOR_MODE = 0b00000   # 5-bit word, only two values allowed.
                         # 0b00000: normal operation
                         # 0b01110: ADF4158 in integer-N mode. Ramping, PSK, FKS and phase adjust are disabled.
 if SD_MODULATOR_MODE == 0b01110:
-    print("ADF4158 in integer-N mode. Ensure to write R3 twice to trigger a counter reset: once with COUNTER_RESET = True, and then with COUNTER_RESET = False.")
+    logger.warning("ADF4158 in integer-N mode. Ensure to write R3 twice to trigger a counter reset: once with COUNTER_RESET = True, and then with COUNTER_RESET = False.")
 NEGATIVE_BLEED_CURRENT = 0b00   # 2-bit word, only two values allowed. Ensures that the charge pump operates outof the dead zone.
                                 # 0b00: OFF
                                 # 0b11: ON
@@ -135,8 +142,8 @@ assert INT >= N_MIN and INT <= 4095, "INT must be an integer between N_MIN and 4
 FRAC = round((pllFrequencyStart/pfdFrequency - INT)*2**25) # 25-bit word (integer between 0 and 33_554_431)
 assert FRAC >=0 and FRAC <= 33_554_431, "FRAC must be an integer between 0 and 33_554_431"
 pllFrequency = pfdFrequency * (INT + (FRAC/2**25)) # Hz
-print("Synthesized PLL frequency (start) = {:e} Hz".format(pllFrequency))
-print("Synthesized VCO frequency (start)= {:e} Hz".format(pllFrequency/PRESCALER_RATIO))
+logger.debug("Synthesized PLL frequency (start) = {:e} Hz".format(pllFrequency))
+logger.debug("Synthesized VCO frequency (start)= {:e} Hz".format(pllFrequency/PRESCALER_RATIO))
 RAMP_MODE = 1   # 2-bit word (integer between 0 and 3).
                 # 0: continuous sawtooth
                 # 1: continuous triangle
@@ -156,7 +163,7 @@ RAMP_ENABLED = True
 FSK_RAMP_ENABLED = False # FSK ramp mode
 RAMP2_ENABLED = False # second ramp
 if RAMP2_ENABLED:
-    print("Ramp 2 is enabled. Ensure to load R5 twice, changing \'Deviation Select\' bit and '\Step select\' bit between the two writes.")
+    logger.warning("Ramp 2 is enabled. Ensure to load R5 twice, changing \'Deviation Select\' bit and '\Step select\' bit between the two writes.")
 DEVIATION_SELECT_RAMP1 = 0b0
 DEVIATION_SELECT_RAMP2 = 0b1
 STEP_SELECT = 0b0 # 1-bit word
@@ -174,124 +181,124 @@ frequencyDeviation = (pfdFrequency/2**25)*(DEV*DEV_OFFSET) # Hz. Frequency devia
 
 
 # R0 register
-print("\nR0 register settings:")
-print("Ramp On = {:01b}".format(int(RAMP_ENABLED))) 
-print("MuxOut Control = {:04b} (0x{:01x})".format(MUXOUT_CTRL, MUXOUT_CTRL))
-print("INT = {:012b} (0x{:03x}) ({:d})".format(INT, INT, INT))
-print("FRAC = {:025b} (0x{:07x}) ({:d})".format(FRAC, FRAC, FRAC))
+logger.debug("\nR0 register settings:")
+logger.debug("Ramp On = {:01b}".format(int(RAMP_ENABLED))) 
+logger.debug("MuxOut Control = {:04b} (0x{:01x})".format(MUXOUT_CTRL, MUXOUT_CTRL))
+logger.debug("INT = {:012b} (0x{:03x}) ({:d})".format(INT, INT, INT))
+logger.debug("FRAC = {:025b} (0x{:07x}) ({:d})".format(FRAC, FRAC, FRAC))
 FRAC_MSB = FRAC>>13 # 12-MSBs of FRAC
-print("FRAC 12-MSBs = {:012b} (0x{:03x})".format(FRAC_MSB, FRAC_MSB))
+logger.debug("FRAC 12-MSBs = {:012b} (0x{:03x})".format(FRAC_MSB, FRAC_MSB))
 CTRL_BITS_R0 = 0b000
-print("Control bits: {:03b} (0x{:01x})".format(CTRL_BITS_R0, CTRL_BITS_R0))
+logger.debug("Control bits: {:03b} (0x{:01x})".format(CTRL_BITS_R0, CTRL_BITS_R0))
 R0_REGISTER = int(RAMP_ENABLED)<<31 | MUXOUT_CTRL<<27 | INT<<15 | FRAC_MSB<<3 | CTRL_BITS_R0
-print("R0 register: {:032b} (0x{:08x})".format(R0_REGISTER, R0_REGISTER)) 
+logger.debug("R0 register: {:032b} (0x{:08x})".format(R0_REGISTER, R0_REGISTER)) 
 
 # R1 register
-print("\nR1 register settings:")
+logger.debug("\nR1 register settings:")
 FRAC_LSB = FRAC & 0b1_1111_1111_1111 # 13-LSBs of FRAC
-print("FRAC 13-LSBs = {:013b} (0x{:04x})".format(FRAC_LSB, FRAC_LSB))
+logger.debug("FRAC 13-LSBs = {:013b} (0x{:04x})".format(FRAC_LSB, FRAC_LSB))
 CTRL_BITS_R1 = 0b001
-print("Control bits: {:03b} (0x{:01x})".format(CTRL_BITS_R1, CTRL_BITS_R1))
+logger.debug("Control bits: {:03b} (0x{:01x})".format(CTRL_BITS_R1, CTRL_BITS_R1))
 R1_REGISTER = FRAC_LSB<<15 | CTRL_BITS_R1
 # Assert R0 and R1 register settings
 assert (INT + (FRAC/2**25))>=N_MIN, "N must be greater than or equal to {}".format(N_MIN)
 if SD_MODULATOR_MODE == 0b01110:
     assert FRAC == 0, "FRAC must be 0 when ADF4158 in integer-N mode (SD_MODULATOR_MODE is 0b01110)."
-print("R1 register: {:032b} (0x{:08x})".format(R1_REGISTER, R1_REGISTER))
+logger.debug("R1 register: {:032b} (0x{:08x})".format(R1_REGISTER, R1_REGISTER))
 
 # R2 register
-print("\nR2 register settings:")
-print("Cycle Slip Reduction = {:01b}".format(CYCLE_SLIP_REDUCTION_ENABLED))
-print("Charge Pump Level = {:04b} (0x{:01x})".format(CHARGE_PUMP_LEVEL, CHARGE_PUMP_LEVEL))
-print("P = {:01b}".format(PRESCALER_BIT))
-print("T (or RDIV2) = {:01b}".format(RDIV2_ENABLED))
-print("D = {:01b}".format(REFERENCE_DOUBLER_ENABLED))
-print("R = {:05b} (0x{:02x})".format(R_COUNTER%32, R_COUNTER%32))
-print("CLK1 = {:012b} (0x{:03x}) ({:d})".format(CLK1, CLK1, CLK1))
+logger.debug("\nR2 register settings:")
+logger.debug("Cycle Slip Reduction = {:01b}".format(CYCLE_SLIP_REDUCTION_ENABLED))
+logger.debug("Charge Pump Level = {:04b} (0x{:01x})".format(CHARGE_PUMP_LEVEL, CHARGE_PUMP_LEVEL))
+logger.debug("P = {:01b}".format(PRESCALER_BIT))
+logger.debug("T (or RDIV2) = {:01b}".format(RDIV2_ENABLED))
+logger.debug("D = {:01b}".format(REFERENCE_DOUBLER_ENABLED))
+logger.debug("R = {:05b} (0x{:02x})".format(R_COUNTER%32, R_COUNTER%32))
+logger.debug("CLK1 = {:012b} (0x{:03x}) ({:d})".format(CLK1, CLK1, CLK1))
 CTRL_BITS_R2 = 0b010
-print("Control bits: {:03b} (0x{:01x})".format(CTRL_BITS_R2, CTRL_BITS_R2))
+logger.debug("Control bits: {:03b} (0x{:01x})".format(CTRL_BITS_R2, CTRL_BITS_R2))
 R2_REGISTER = CYCLE_SLIP_REDUCTION_ENABLED<<28 | CHARGE_PUMP_LEVEL<<24 | PRESCALER_BIT<<22 | RDIV2_ENABLED<<21 | REFERENCE_DOUBLER_ENABLED<<20 | (R_COUNTER%32)<<15 | CLK1<<3 | CTRL_BITS_R2
 # Assert R2 register settings
 if CYCLE_SLIP_REDUCTION_ENABLED:
     assert RDIV2_ENABLED, "Cycle slip reduction requires RDIV2_ENABLED to be True"
 if REFERENCE_DOUBLER_ENABLED:
     assert REF_IN_FREQUENCY <= 30e6, "REF_IN frequency must be less than or equal to 30 MHz"
-print("R2 register: {:032b} (0x{:08x})".format(R2_REGISTER, R2_REGISTER))
+logger.debug("R2 register: {:032b} (0x{:08x})".format(R2_REGISTER, R2_REGISTER))
 
 # R3 register
-print("\nR3 register settings:")
-print("N SEL = {:01b}".format(N_SEL))
-print("SD Reset = {:01b}".format(SD_NOT_RESET))
-print("Ramp Mode = {:02b} (0x{:01x})".format(RAMP_MODE, RAMP_MODE))
-print("PSK Enable = {:01b}".format(PSK_ENABLED))
-print("FSK Enable = {:01b}".format(FSK_ENABLED))
-print("LDP = {:01b}".format(LDP))
-print("PD polarity = {:01b}".format(PHASE_DETECTOR_POLARITY))
-print("Power-Down = {:01b}".format(POWER_DOWN_ENABLED))
-print("Charge Pump Three-State = {:01b}".format(CHARGE_PUMP_THREESTATE_ENABLED))
-print("Counter Reset = {:01b}".format(COUNTER_RESET))
+logger.debug("\nR3 register settings:")
+logger.debug("N SEL = {:01b}".format(N_SEL))
+logger.debug("SD Reset = {:01b}".format(SD_NOT_RESET))
+logger.debug("Ramp Mode = {:02b} (0x{:01x})".format(RAMP_MODE, RAMP_MODE))
+logger.debug("PSK Enable = {:01b}".format(PSK_ENABLED))
+logger.debug("FSK Enable = {:01b}".format(FSK_ENABLED))
+logger.debug("LDP = {:01b}".format(LDP))
+logger.debug("PD polarity = {:01b}".format(PHASE_DETECTOR_POLARITY))
+logger.debug("Power-Down = {:01b}".format(POWER_DOWN_ENABLED))
+logger.debug("Charge Pump Three-State = {:01b}".format(CHARGE_PUMP_THREESTATE_ENABLED))
+logger.debug("Counter Reset = {:01b}".format(COUNTER_RESET))
 CTRL_BITS_R3 = 0b011
-print("Control bits: {:03b} (0x{:01x})".format(CTRL_BITS_R3, CTRL_BITS_R3))
+logger.debug("Control bits: {:03b} (0x{:01x})".format(CTRL_BITS_R3, CTRL_BITS_R3))
 R3_REGISTER = N_SEL<<15 | SD_NOT_RESET<<14 | RAMP_MODE<<10 | PSK_ENABLED<<9 | FSK_ENABLED<<8 | LDP<<7 | PHASE_DETECTOR_POLARITY<<6 | POWER_DOWN_ENABLED<<5 | CHARGE_PUMP_THREESTATE_ENABLED<<4 | COUNTER_RESET<<3 | CTRL_BITS_R3
-print("R3 register: {:032b} (0x{:08x})".format(R3_REGISTER, R3_REGISTER))
+logger.debug("R3 register: {:032b} (0x{:08x})".format(R3_REGISTER, R3_REGISTER))
 
 # R4 register
-print("\nR4 register settings:")
-print("LE SEL = {:01b}".format(LOAD_ENABLE_SYNC))
-print("SD Modulator Mode: {:05b}".format(SD_MODULATOR_MODE))
-print("Negative Bleed Current: {:02b}".format(NEGATIVE_BLEED_CURRENT))
-print("Readback to MUXOUT: {:02b}".format(READBACK_TO_MUXOUT))
-print("Clock Divider (DIV) Mode: {:02b}".format(CLOCK_DIVIDER_MODE))
-print("CLK2 = {:012b} (0x{:03x}) ({:d})".format(CLK2, CLK2, CLK2))
+logger.debug("\nR4 register settings:")
+logger.debug("LE SEL = {:01b}".format(LOAD_ENABLE_SYNC))
+logger.debug("SD Modulator Mode: {:05b}".format(SD_MODULATOR_MODE))
+logger.debug("Negative Bleed Current: {:02b}".format(NEGATIVE_BLEED_CURRENT))
+logger.debug("Readback to MUXOUT: {:02b}".format(READBACK_TO_MUXOUT))
+logger.debug("Clock Divider (DIV) Mode: {:02b}".format(CLOCK_DIVIDER_MODE))
+logger.debug("CLK2 = {:012b} (0x{:03x}) ({:d})".format(CLK2, CLK2, CLK2))
 CTRL_BITS_R4 = 0b100
-print("Control bits: {:03b} (0x{:01x})".format(CTRL_BITS_R4, CTRL_BITS_R4))
+logger.debug("Control bits: {:03b} (0x{:01x})".format(CTRL_BITS_R4, CTRL_BITS_R4))
 # Assert R4 register settings
 if NEGATIVE_BLEED_CURRENT == 0b11:
     assert READBACK_TO_MUXOUT == 0b00, "READBACK_TO_MUXOUT must be 0b00 when NEGATIVE_BLEED_CURRENT is 0b11."
 R4_REGISTER = LOAD_ENABLE_SYNC<<31 | SD_MODULATOR_MODE<<26 | NEGATIVE_BLEED_CURRENT<<23 | READBACK_TO_MUXOUT<<21 | CLOCK_DIVIDER_MODE<<19 | CLK2<<7 | CTRL_BITS_R4
-print("R4 register: {:032b} (0x{:08x})".format(R4_REGISTER, R4_REGISTER))
+logger.debug("R4 register: {:032b} (0x{:08x})".format(R4_REGISTER, R4_REGISTER))
 
 # R5 register
-print("\nR5 register settings:")
-print("Tx Ramp CLK = {:01b}".format(TX_RAMP_CLK))
-print("PAR Ramp: {:01b}".format(PAR_RAMP_ENABLED))
-print("Interrupt: {:02b}".format(INTERRUPT))
-print("FSK Ramp Enable: {:01b}".format(FSK_RAMP_ENABLED))
-print("Ramp 2 Enable: {:01b}".format(RAMP2_ENABLED))
-print("Deviation Select (load 1): {:01b}".format(DEVIATION_SELECT_RAMP1))
-print("Deviation Select (load 2): {:01b}".format(DEVIATION_SELECT_RAMP2))
-print("Deviation Offset Word: {:04b} (0x{:01x}) ({:d})".format(DEV_OFFSET, DEV_OFFSET, DEV_OFFSET))
-print("Deviation Word: {:016b} (0x{:04x}) ({:d})".format((DEV+32_768 ^ 0b1<<15), (DEV+32_768 ^ 0b1<<15), (DEV+32_768 ^ 0b1<<15)))
+logger.debug("\nR5 register settings:")
+logger.debug("Tx Ramp CLK = {:01b}".format(TX_RAMP_CLK))
+logger.debug("PAR Ramp: {:01b}".format(PAR_RAMP_ENABLED))
+logger.debug("Interrupt: {:02b}".format(INTERRUPT))
+logger.debug("FSK Ramp Enable: {:01b}".format(FSK_RAMP_ENABLED))
+logger.debug("Ramp 2 Enable: {:01b}".format(RAMP2_ENABLED))
+logger.debug("Deviation Select (load 1): {:01b}".format(DEVIATION_SELECT_RAMP1))
+logger.debug("Deviation Select (load 2): {:01b}".format(DEVIATION_SELECT_RAMP2))
+logger.debug("Deviation Offset Word: {:04b} (0x{:01x}) ({:d})".format(DEV_OFFSET, DEV_OFFSET, DEV_OFFSET))
+logger.debug("Deviation Word: {:016b} (0x{:04x}) ({:d})".format((DEV+32_768 ^ 0b1<<15), (DEV+32_768 ^ 0b1<<15), (DEV+32_768 ^ 0b1<<15)))
 CTRL_BITS_R5 = 0b101
-print("Control bits: {:03b} (0x{:01x})".format(CTRL_BITS_R5, CTRL_BITS_R5))
+logger.debug("Control bits: {:03b} (0x{:01x})".format(CTRL_BITS_R5, CTRL_BITS_R5))
 R5_REGISTER_LOAD1 = TX_RAMP_CLK<<29 | PAR_RAMP_ENABLED<<28 | INTERRUPT<<26 | FSK_RAMP_ENABLED<<25 | RAMP2_ENABLED<<24 | DEVIATION_SELECT_RAMP1<<23 | DEV_OFFSET<<19 | (DEV+32_768 ^ 0b1<<15)<<3 | CTRL_BITS_R5
-print("R5 register (load 1): {:032b} (0x{:08x})".format(R5_REGISTER_LOAD1, R5_REGISTER_LOAD1))
+logger.debug("R5 register (load 1): {:032b} (0x{:08x})".format(R5_REGISTER_LOAD1, R5_REGISTER_LOAD1))
 
 # R6 register
-print("\nR6 register settings:")
-print("Step SEL: {:01b}".format(STEP_SELECT))
-print("Step Work: {:020b} (0x{:05x})".format(STEP, STEP))
+logger.debug("\nR6 register settings:")
+logger.debug("Step SEL: {:01b}".format(STEP_SELECT))
+logger.debug("Step Work: {:020b} (0x{:05x})".format(STEP, STEP))
 CTRL_BITS_R6 = 0b110
-print("Control bits: {:03b} (0x{:01x})".format(CTRL_BITS_R6, CTRL_BITS_R6))
+logger.debug("Control bits: {:03b} (0x{:01x})".format(CTRL_BITS_R6, CTRL_BITS_R6))
 R6_REGISTER = STEP_SELECT<<23 | STEP<<3 | CTRL_BITS_R6
-print("R6 register: {:032b} (0x{:08x})".format(R6_REGISTER, R6_REGISTER))
+logger.debug("R6 register: {:032b} (0x{:08x})".format(R6_REGISTER, R6_REGISTER))
 
 # R7 register
-print("\nR7 register settings:")
-print("Ramp Delay Fast Lock: {:01b}".format(RAMP_DELAY_FAST_LOCK_ENABLED))
-print("Ramp Delay: {:01b}".format(RAMP_DELAY_ENABLED))
-print("Delay Clock Select: {:01b}".format(DELAY_CLOCK_SELECT))
-print("Delayed Start Enable: {:01b}".format(DELAYED_START_ENABLED))
-print("Delayed Start Word: {:016b} (0x{:04x})".format(DELAYED_START_WORD, DELAYED_START_WORD))
+logger.debug("\nR7 register settings:")
+logger.debug("Ramp Delay Fast Lock: {:01b}".format(RAMP_DELAY_FAST_LOCK_ENABLED))
+logger.debug("Ramp Delay: {:01b}".format(RAMP_DELAY_ENABLED))
+logger.debug("Delay Clock Select: {:01b}".format(DELAY_CLOCK_SELECT))
+logger.debug("Delayed Start Enable: {:01b}".format(DELAYED_START_ENABLED))
+logger.debug("Delayed Start Word: {:016b} (0x{:04x})".format(DELAYED_START_WORD, DELAYED_START_WORD))
 CTRL_BITS_R7 = 0b111
-print("Control bits: {:03b} (0x{:01x})".format(CTRL_BITS_R7, CTRL_BITS_R7))
+logger.debug("Control bits: {:03b} (0x{:01x})".format(CTRL_BITS_R7, CTRL_BITS_R7))
 R7_REGISTER = RAMP_DELAY_FAST_LOCK_ENABLED<<18 | RAMP_DELAY_ENABLED<<17 | DELAY_CLOCK_SELECT<<16 | DELAYED_START_ENABLED<<15 | DELAYED_START_WORD<<3 | CTRL_BITS_R7
-print("R7 register: {:032b} (0x{:08x})".format(R7_REGISTER, R7_REGISTER))
+logger.debug("R7 register: {:032b} (0x{:08x})".format(R7_REGISTER, R7_REGISTER))
 
 # Parameters for ADIsimPLL simulation
-print("\nParameters for ADIsimPLL simulation:")
-print("CLK1: {:d}".format(CLK1))
-print("CLK2: {:d}".format(CLK2))
-print("DEV: {:d}".format((DEV+32_768 ^ 0b1<<15)))
-print("DEV_OFFSET: {:d}".format(DEV_OFFSET))
-print("Number of steps: {:d}".format(UPCHIRP_NUMBER_OF_STEPS))
\ No newline at end of file
+logger.debug("\nParameters for ADIsimPLL simulation:")
+logger.debug("CLK1: {:d}".format(CLK1))
+logger.debug("CLK2: {:d}".format(CLK2))
+logger.debug("DEV: {:d}".format((DEV+32_768 ^ 0b1<<15)))
+logger.debug("DEV_OFFSET: {:d}".format(DEV_OFFSET))
+logger.debug("Number of steps: {:d}".format(UPCHIRP_NUMBER_OF_STEPS))
\ No newline at end of file
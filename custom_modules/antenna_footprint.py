@@ -1,7 +1,9 @@
-import matplotlib.pyplot as plt
+import logging
 import numpy as np
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
 # Figure Width (inches)
 FIG_SIZE_X_INCHES = 3.5
 FIG_SIZE_Y_INCHES = 3
@@ -23,10 +25,13 @@ def evaluate_antenna_footprint(HEIGHT_FROM_WATER_LEVEL: float, antennaBeamWidth_
         plotPathPNG = PLOT_PATH + timestamp + '.png'
         plotPathPDF = PLOT_PATH + timestamp + '.pdf'
 
-    # Plot Configuration
-    plt.rcParams['font.family'] = FONT_CHOICE
-    plt.rcParams['axes.linewidth'] = LINE_WIDTH
-    plt.rcParams["figure.figsize"] = (FIG_SIZE_X_INCHES, FIG_SIZE_Y_INCHES)
+    # Plot Configuration (matplotlib imported only if the plot is needed)
+    PLOT_ENABLED = SAVE_PLOT or SHOW_FIGURE
+    if PLOT_ENABLED:
+        import matplotlib.pyplot as plt
+        plt.rcParams['font.family'] = FONT_CHOICE
+        plt.rcParams['axes.linewidth'] = LINE_WIDTH
+        plt.rcParams["figure.figsize"] = (FIG_SIZE_X_INCHES, FIG_SIZE_Y_INCHES)
 
     grid_parameters = np.zeros((horizontal_directions_deg.size, 8))
     # For each "horizontal direction" the following parameters are evaluated:
@@ -39,22 +44,25 @@ def evaluate_antenna_footprint(HEIGHT_FROM_WATER_LEVEL: float, antennaBeamWidth_
     grid_parameters[:, 1] = HEIGHT_FROM_WATER_LEVEL / np.tan(np.deg2rad(tiltAngle_deg))
     maxScanAngle = horizontal_directions_deg[-1]
     grid_parameters[:, 2] = radarTargetDistance_projection * np.tan(maxScanAngle) * 2
-    print(f"Tilt Angle: {tiltAngle_deg:.1f} degree")
-    print(f"Radar-to-target distance: {radarTargetDistance_projection:.1f} m")
-    print(f"Radar-to-target distance (projection): {grid_parameters[0, 1]:.1f} m")
-    print(f"Swath range: {grid_parameters[0, 2]:.1f} m")
+    logger.debug("Tilt Angle: %.1f degree", tiltAngle_deg)
+    logger.debug("Radar-to-target distance: %.1f m", radarTargetDistance_projection)
+    logger.debug("Radar-to-target distance (projection): %.1f m", grid_parameters[0, 1])
+    logger.debug("Swath range: %.1f m", grid_parameters[0, 2])
     for index, direction in enumerate(horizontal_directions_deg):
-        print("\tDirection: " + str(direction) + " degree")
+        logger.debug("\tDirection: %s degree", direction)
         grid_parameters[index, 3] = radarTargetDistance_projection * np.tan(np.deg2rad(direction))
         grid_parameters[index, 4] = np.abs(HEIGHT_FROM_WATER_LEVEL * (1/np.tan(np.deg2rad(tiltAngle_deg)) - 1/np.tan(np.deg2rad(tiltAngle_deg-antennaBeamWidth_elevation_deg/2))))
-        print("\t\tAntenna footprint, upper semiaxis: {:.2f} m".format(grid_parameters[index,4]))
+        logger.debug("\t\tAntenna footprint, upper semiaxis: %.2f m", grid_parameters[index,4])
         grid_parameters[index, 5] = np.abs(HEIGHT_FROM_WATER_LEVEL * (1/np.tan(np.deg2rad(tiltAngle_deg)) - 1/np.tan(np.deg2rad(tiltAngle_deg+antennaBeamWidth_elevation_deg/2))))
-        print("\t\tAntenna footprint, lower semiaxis: {:.2f} m".format(grid_parameters[index,5]))
+        logger.debug("\t\tAntenna footprint, lower semiaxis: %.2f m", grid_parameters[index,5])
         grid_parameters[index, 6] = np.abs(radarTargetDistance_projection * np.tan(np.deg2rad(direction)) - radarTargetDistance_projection * np.tan(np.deg2rad(direction+antennaBeamWidth_azimuth_deg/2)))
-        print("\t\tAntenna footprint, right semiaxis: " + str(grid_parameters[index,6]) + " m")
+        logger.debug("\t\tAntenna footprint, right semiaxis: %s m", grid_parameters[index,6])
         grid_parameters[index, 7] = np.abs(radarTargetDistance_projection * np.tan(np.deg2rad(direction)) - radarTargetDistance_projection * np.tan(np.deg2rad(direction-antennaBeamWidth_azimuth_deg/2)))
-        print("\t\tAntenna footprint, left semiaxis: " + str(grid_parameters[index,7]) + " m")
-        plt.errorbar(grid_parameters[index,3], grid_parameters[index,1], xerr=[[grid_parameters[index,7]], [grid_parameters[index,6]]], yerr=[[grid_parameters[index,5]],[grid_parameters[index,4]]], fmt="o", color='r', markersize=7, capsize=10)
+        logger.debug("\t\tAntenna footprint, left semiaxis: %s m", grid_parameters[index,7])
+        if PLOT_ENABLED:
+            plt.errorbar(grid_parameters[index,3], grid_parameters[index,1], xerr=[[grid_parameters[index,7]], [grid_parameters[index,6]]], yerr=[[grid_parameters[index,5]],[grid_parameters[index,4]]], fmt="o", color='r', markersize=7, capsize=10)
+    if not PLOT_ENABLED:
+        return
     plt.axis('equal')
     plt.grid(visible=True, which="both", linewidth=0.3)
     plt.tight_layout()
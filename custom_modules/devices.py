@@ -0,0 +1,231 @@
+# Devices of the monitoring stations (radar, servo motor, accelerometer), real or simulated.
+#
+# The hardware modules (RPi.GPIO, Adafruit ADXL345, pyserial, picosdk) are imported only when a real
+# device is opened, so that the whole measurement chain can run (and be profiled) on any machine.
+# Selected by the "devices" section of the settings file, see custom_modules/settings.py.
+import logging
+import os
+import sys
+import time
+import numpy as np
+sys.path.insert(1, ".")
+from custom_modules.raw_capture import CAPTURE_EXTENSION, write_capture
+from custom_modules.signal_processing import _surface_velocity
+
+logger = logging.getLogger(__name__)
+
+SENSE2GOL_OUTPUT_PATH = 'sense2gol_pizero/output'
+
+def doppler_frequency(surfaceVelocity_mps: float, antennaBeamDirection_DEG: float, tiltAngle_DEG: float):
+    # Inverse of the surface velocity evaluation (signal_processing), so that simulated velocities are measured back
+    return surfaceVelocity_mps / _surface_velocity(1.0, antennaBeamDirection_DEG, tiltAngle_DEG)
+
+def synthetic_doppler_iq(samples: int, samplingFrequency: float, dopplerFrequency: float, spectrumSpread_Hz: float, SNR_dB: float, amplitude: float, random):
+    '''
+    Echo of the water surface: narrowband random signal with a Gaussian spectrum (standard deviation spectrumSpread_Hz)
+    centred on the Doppler frequency, plus white noise. A pure tone if spectrumSpread_Hz is 0.
+    amplitude is the RMS value of the echo; SNR_dB is the ratio of echo and noise powers, over the whole band.
+    :return: Complex signal, I + jQ.
+    '''
+    timeAxis_s = np.arange(samples) / samplingFrequency
+    if spectrumSpread_Hz > 0:
+        frequencies = np.fft.fftfreq(samples, 1/samplingFrequency)
+        envelope = np.exp(-0.25 * ((frequencies - dopplerFrequency) / spectrumSpread_Hz)**2) # Square root of the power spectrum.
+        echo = np.fft.ifft(envelope * (random.standard_normal(samples) + 1j*random.standard_normal(samples)))
+        echo *= amplitude / max(np.sqrt(np.mean(np.abs(echo)**2)), np.finfo(float).tiny)
+    else:
+        echo = amplitude * np.exp(1j * (2*np.pi*dopplerFrequency*timeAxis_s + random.uniform(0, 2*np.pi)))
+    noise_RMS = amplitude / 10**(SNR_dB/20)
+    noise = noise_RMS / np.sqrt(2) * (random.standard_normal(samples) + 1j*random.standard_normal(samples))
+    return echo + noise
+
+class SimulatedScene:
+    '''
+    River surface seen by the simulated radars: velocity, spectrum spread, SNR and echo level.
+    '''
+    def __init__(self, surfaceVelocity_mps: float = 1.0, spectrumSpread_Hz: float = 20.0, SNR_dB: float = 20.0, signalLevel_dBFS: float = -20.0, seed: int = None):
+        self.surfaceVelocity_mps = surfaceVelocity_mps
+        self.spectrumSpread_Hz = spectrumSpread_Hz
+        self.SNR_dB = SNR_dB
+        self.signalLevel_dBFS = signalLevel_dBFS
+        self.random = np.random.default_rng(seed)
+
+    @classmethod
+    def from_settings(cls, devices):
+        return cls(devices.simulatedSurfaceVelocity_mps, devices.simulatedSpectrumSpread_Hz, devices.simulatedSNR_dB, devices.simulatedSignalLevel_dBFS, devices.simulationSeed)
+
+    def echo(self, samples: int, samplingFrequency: float, direction_DEG: float, tiltAngle_DEG: float, fullScale: float):
+        # Complex echo, with amplitude relative to the ADC half range ("fullScale", any unit)
+        amplitude = fullScale * 10**(self.signalLevel_dBFS/20)
+        return synthetic_doppler_iq(samples, samplingFrequency, doppler_frequency(self.surfaceVelocity_mps, direction_DEG, tiltAngle_DEG), self.spectrumSpread_Hz, self.SNR_dB, amplitude, self.random)
+
+class SimulatedSense2GoL:
+    '''
+    Stand-in for Sense2GoLSession: same acquire() interface, same output files (binary capture or *.txt dump),
+    with ADC counts of a simulated echo.
+    '''
+    def __init__(self, scene: SimulatedScene, realTime: bool = False, outputPath: str = SENSE2GOL_OUTPUT_PATH):
+        self.scene = scene
+        self.realTime = realTime # Wait as long as a real acquisition.
+        self.outputPath = outputPath
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def open(self):
+        logger.info("Simulated Sense2GoL.")
+
+    def close(self):
+        pass
+
+    def acquire(self, tiltAngle_DEG_str, episode, EPISODES, direction_DEG_str, FRAMES, SAMPLES_PER_FRAME, serialBufferSize, SERIAL_TIMEOUT, RAW_DATA_FORMAT='txt', SAMPLING_FREQUENCY=None, ADC_RANGE_BITS=None, ADC_RANGE_V=None, tiltAngle_DEG=float('nan'), direction_DEG=float('nan'), onSamples=None):
+        # onSamples: see sense2gol.serial_read(), called once per frame (paced by the sampling frequency if realTime).
+        from custom_modules.sense2gol import acquisition_label
+        samples = FRAMES * SAMPLES_PER_FRAME
+        start = time.monotonic()
+        signal = self.scene.echo(samples, SAMPLING_FREQUENCY, direction_DEG, tiltAngle_DEG, ADC_RANGE_BITS/2)
+        # Unsigned ADC counts, around mid range
+        I_counts = np.clip(np.round(ADC_RANGE_BITS/2 + signal.real), 0, ADC_RANGE_BITS - 1).astype(np.uint16)
+        Q_counts = np.clip(np.round(ADC_RANGE_BITS/2 + signal.imag), 0, ADC_RANGE_BITS - 1).astype(np.uint16)
+        if onSamples is not None:
+            for frameStart in range(0, samples, SAMPLES_PER_FRAME):
+                frameStop = min(frameStart + SAMPLES_PER_FRAME, samples)
+                if self.realTime:
+                    time.sleep(max(frameStop / SAMPLING_FREQUENCY - (time.monotonic() - start), 0))
+                # Labelled as by the firmware (see _write_txt())
+                onSamples(frameStart, Q_counts[frameStart:frameStop], I_counts[frameStart:frameStop])
+        label = acquisition_label(tiltAngle_DEG_str, episode, EPISODES, direction_DEG_str)
+        if RAW_DATA_FORMAT == 'bin':
+            completeFileName = write_capture(os.path.join(self.outputPath, label + CAPTURE_EXTENSION), I_counts, Q_counts, SAMPLING_FREQUENCY, ADC_RANGE_BITS, ADC_RANGE_V, ADC_RANGE_V,
+                                             tiltAngle_DEG=tiltAngle_DEG, direction_DEG=direction_DEG, episode=episode, episodes=EPISODES, label=label)
+        else:
+            completeFileName = os.path.join(self.outputPath, label + '.txt')
+            self._write_txt(completeFileName, I_counts, Q_counts, SAMPLES_PER_FRAME)
+        if self.realTime:
+            time.sleep(max(samples / SAMPLING_FREQUENCY - (time.monotonic() - start), 0))
+        return completeFileName
+
+    @staticmethod
+    def _write_txt(fileName, I_counts, Q_counts, SAMPLES_PER_FRAME):
+        # Same layout as the serial dump. As in the firmware, the "I" block carries Q and vice versa (see txt_extract()).
+        from custom_modules.sense2gol import I_SAMPLES_MARKER, Q_SAMPLES_MARKER
+        with open(fileName, 'wb') as f:
+            f.write(b'Simulated Sense2GoL\n')
+            for frameStart in range(0, len(I_counts), SAMPLES_PER_FRAME):
+                for marker, counts in ((I_SAMPLES_MARKER, Q_counts), (Q_SAMPLES_MARKER, I_counts)):
+                    f.write(marker)
+                    f.write(('\n'.join(str(value) for value in counts[frameStart:frameStart+SAMPLES_PER_FRAME]) + '\n').encode('ascii'))
+
+class RPiServo:
+    '''
+    SG90 servo motor on a Raspberry Pi PWM pin (custom_modules/servo_motor.py).
+    '''
+    def __init__(self, pwmPin: int, pwmFrequency_Hz: float):
+        from custom_modules import servo_motor
+        self.servo_motor = servo_motor
+        self.pwm = servo_motor.define_PWM_pin(pwmPin, pwmFrequency_Hz)
+
+    def rotate(self, beamAngle_DEG: float):
+        self.servo_motor.rotate_servo_to_angle(self.pwm, beamAngle_DEG)
+
+    def sleep(self):
+        self.servo_motor.sleep_servo(self.pwm)
+
+    def wake_up(self):
+        self.servo_motor.wake_up_servo(self.pwm)
+
+    def close(self):
+        self.servo_motor.shut_down_servo(self.pwm)
+
+class SimulatedServo:
+    '''
+    No-op servo motor: only remembers the last angle.
+    '''
+    def __init__(self, *args):
+        self.angle_DEG = None
+
+    def rotate(self, beamAngle_DEG: float):
+        self.angle_DEG = beamAngle_DEG
+
+    def sleep(self):
+        pass
+
+    def wake_up(self):
+        pass
+
+    def close(self):
+        pass
+
+class ADXL345Accelerometer:
+    '''
+    Tilt angle from the Adafruit ADXL345 (custom_modules/tilt_sensor_adafruit_ADXL345.py), kept in sleep mode between measurements.
+    '''
+    def __init__(self, accelerometerSettings):
+        import custom_modules.tilt_sensor_adafruit_ADXL345 as ADXL345
+        self.ADXL345 = ADXL345
+        self.settings = accelerometerSettings
+        self.device = ADXL345.setup_ADX345()
+        ADXL345.sleep_mode(self.device)
+
+    def tilt_angle(self):
+        calibration = self.settings
+        self.ADXL345.wake_up(self.device)
+        try:
+            return self.ADXL345.tilt_angle(self.device, calibration.xMin, calibration.xMax, calibration.yMin, calibration.yMax, calibration.zMin, calibration.zMax, calibration.averages, calibration.repeatMeasurement) # Degrees.
+        finally:
+            self.ADXL345.sleep_mode(self.device)
+
+    def close(self):
+        self.ADXL345.sleep_mode(self.device)
+
+class FixedTiltAccelerometer:
+    '''
+    Simulated accelerometer: always the same tilt angle.
+    '''
+    def __init__(self, tiltAngle_DEG: float):
+        self.tiltAngle_DEG = tiltAngle_DEG
+
+    def tilt_angle(self):
+        return self.tiltAngle_DEG
+
+    def close(self):
+        pass
+
+def _simulated(settings, device):
+    return settings.devices is not None and getattr(settings.devices, device) == 'simulated'
+
+def open_radar(settings, simulated: bool = None):
+    '''
+    Radar of the settings layout: Sense2GoL (serial) or PicoScope, real or simulated (None: as set in the settings). Opened.
+    :return: Sense2GoLSession, SimulatedSense2GoL or custom_modules.picoscope.PicoScope.
+    '''
+    if simulated is None:
+        simulated = _simulated(settings, 'radar')
+    if settings.layout == 'picoscope':
+        from custom_modules.picoscope import PicoScope, SimulatedPicoScope
+        device = SimulatedPicoScope(SimulatedScene.from_settings(settings.devices)) if simulated else None
+        return PicoScope.from_settings(settings, device).open()
+    if simulated:
+        radar = SimulatedSense2GoL(SimulatedScene.from_settings(settings.devices), settings.devices.simulatedRealTime)
+    else:
+        from custom_modules.sense2gol import Sense2GoLSession
+        radar = Sense2GoLSession(settings.radar.serialPorts, settings.radar.usbIds, settings.radar.baudRate)
+    radar.open()
+    return radar
+
+def open_servo(settings):
+    if _simulated(settings, 'servo'):
+        return SimulatedServo()
+    return RPiServo(settings.platform.pwmPin, settings.platform.pwmFrequency_Hz)
+
+def open_accelerometer(settings):
+    if _simulated(settings, 'accelerometer'):
+        return FixedTiltAccelerometer(settings.devices.simulatedTiltAngle_DEG)
+    return ADXL345Accelerometer(settings.accelerometer)
+
+if __name__ == "__main__":
+    print("Standalone script not yet developed.")
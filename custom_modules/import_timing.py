@@ -0,0 +1,36 @@
+# Import cost of the optional dependencies (plots, statistics...), imported only when the settings need them.
+# For a complete breakdown of the imports, run the script with "python -X importtime".
+import importlib
+import logging
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+IMPORT_TIMES = {} # Seconds spent importing, by name, in import order.
+
+def record_import_time(name: str, seconds: float):
+    IMPORT_TIMES[name] = IMPORT_TIMES.get(name, 0) + seconds
+
+def timed_import(moduleName: str):
+    '''
+    Import a module (if not imported yet) and record how long it took.
+    :return: The module.
+    '''
+    alreadyImported = moduleName in sys.modules
+    start = time.perf_counter()
+    module = importlib.import_module(moduleName)
+    if not alreadyImported:
+        record_import_time(moduleName, time.perf_counter() - start)
+    return module
+
+def print_import_report():
+    # One log record for the whole table
+    lines = ['Startup import times:']
+    for name, seconds in IMPORT_TIMES.items():
+        lines.append('\t{:.3f} s\t{}'.format(seconds, name))
+    lines.append('\t{:.3f} s\ttotal'.format(sum(IMPORT_TIMES.values())))
+    logger.info('\n'.join(lines))
+
+if __name__ == "__main__":
+    print("Standalone script not yet developed.")
@@ -0,0 +1,251 @@
+# Timing and resource instrumentation of the monitoring loop
+#
+# Each stage (servo, serial wait, parsing, FFT, plots, report...) is wrapped in a span: wall time, CPU time of the
+# calling thread and resident memory at the end of the span are aggregated per stage (latency histogram, sums,
+# extremes). Aggregates are exported once per measurement cycle to a size-rotated JSON-lines file and, optionally,
+# served in the Prometheus text format on a local HTTP endpoint (e.g. http://127.0.0.1:9101/metrics).
+# A span costs a few microseconds: stages are always measured, exporters are optional.
+import functools
+import json
+import logging
+import math
+import os
+import sys
+import threading
+import time
+sys.path.insert(1, ".")
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the latency histogram buckets (s), as in Prometheus histograms (plus +Inf)
+LATENCY_BUCKETS_S = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+METRICS_PREFIX = 'radar'
+DEFAULT_METRICS_FILE_MAX_BYTES = 1_000_000
+DEFAULT_METRICS_FILE_BACKUPS = 3
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+def resident_memory_bytes():
+    # Current RSS (Linux), otherwise peak RSS
+    try:
+        with open('/proc/self/statm', 'rb') as statm:
+            return int(statm.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        if resource is None:
+            return 0
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if sys.platform == 'darwin' else maxrss * 1024 # Bytes on macOS, KiB elsewhere.
+
+class StageMetrics:
+    '''
+    Aggregates of the spans of one stage: count, wall time (sum, extremes, histogram), CPU time, maximum RSS.
+    '''
+    __slots__ = ('count', 'wall_s', 'minimum_s', 'maximum_s', 'cpu_s', 'rss_bytes', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.wall_s = 0.0
+        self.minimum_s = math.inf
+        self.maximum_s = 0.0
+        self.cpu_s = 0.0
+        self.rss_bytes = 0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_S) + 1) # Not cumulative; last one: +Inf.
+
+    def add(self, wall_s: float, cpu_s: float, rss_bytes: int):
+        self.count += 1
+        self.wall_s += wall_s
+        self.minimum_s = min(self.minimum_s, wall_s)
+        self.maximum_s = max(self.maximum_s, wall_s)
+        self.cpu_s += cpu_s
+        self.rss_bytes = max(self.rss_bytes, rss_bytes)
+        bucket = 0
+        while bucket < len(LATENCY_BUCKETS_S) and wall_s > LATENCY_BUCKETS_S[bucket]:
+            bucket += 1
+        self.buckets[bucket] += 1
+
+    def as_dict(self):
+        return {'count': self.count, 'wall_s': self.wall_s, 'min_s': self.minimum_s if self.count else None, 'max_s': self.maximum_s, 'mean_s': self.wall_s / self.count if self.count else None,
+                'cpu_s': self.cpu_s, 'rss_MiB': self.rss_bytes / 2**20, 'histogram': self.buckets[:]}
+
+class JsonLinesExporter:
+    '''
+    One JSON object per line, appended to fileName. When the file exceeds maxBytes it is renamed fileName.1
+    (fileName.1 to fileName.2, and so on), keeping at most "backups" old files.
+    '''
+    def __init__(self, fileName: str, maxBytes: int = DEFAULT_METRICS_FILE_MAX_BYTES, backups: int = DEFAULT_METRICS_FILE_BACKUPS):
+        self.fileName = fileName
+        self.maxBytes = maxBytes
+        self.backups = backups
+
+    def _rotate(self):
+        if self.backups <= 0:
+            os.remove(self.fileName)
+            return
+        for index in range(self.backups - 1, 0, -1):
+            if os.path.exists('{}.{:d}'.format(self.fileName, index)):
+                os.replace('{}.{:d}'.format(self.fileName, index), '{}.{:d}'.format(self.fileName, index + 1))
+        os.replace(self.fileName, self.fileName + '.1')
+
+    def write(self, record: dict):
+        line = json.dumps(record, separators=(',', ':')) + '\n'
+        if os.path.exists(self.fileName) and os.path.getsize(self.fileName) + len(line) > self.maxBytes:
+            self._rotate()
+        with open(self.fileName, 'a') as f:
+            f.write(line)
+
+class Instrumentation:
+    '''
+    Registry of the stage metrics: cumulative since start (Prometheus endpoint) and for the current cycle (JSON lines).
+    Spans can be recorded from any thread (e.g. the stages of the scan pipeline).
+    '''
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.totals = {}
+        self.cycle = {}
+        self.cycles = 0
+        self.cycleStart = time.time()
+        self.exporter = None
+        self.server = None
+        self.serverAddress = None
+
+    def record(self, stage: str, wall_s: float, cpu_s: float, rss_bytes: int):
+        with self.lock:
+            for metrics in (self.totals, self.cycle):
+                stageMetrics = metrics.get(stage)
+                if stageMetrics is None:
+                    stageMetrics = metrics[stage] = StageMetrics()
+                stageMetrics.add(wall_s, cpu_s, rss_bytes)
+
+    def span(self, stage: str):
+        return _Span(self, stage)
+
+    def instrumented(self, stage: str):
+        '''
+        Decorator: every call of the function is a span of the given stage.
+        '''
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with _Span(self, stage):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def configure(self, metricsFile: str = '', maxBytes: int = DEFAULT_METRICS_FILE_MAX_BYTES, backups: int = DEFAULT_METRICS_FILE_BACKUPS, port: int = 0, address: str = '127.0.0.1'):
+        '''
+        Exporters: JSON-lines file (empty name: none) and Prometheus endpoint (port 0: none).
+        The endpoint is restarted only if its address changed.
+        '''
+        self.exporter = JsonLinesExporter(metricsFile, maxBytes, backups) if metricsFile else None
+        serverAddress = (address, port) if port else None
+        if serverAddress != self.serverAddress:
+            self._stop_server()
+            if serverAddress is not None:
+                self._start_server(serverAddress)
+
+    def _start_server(self, serverAddress):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        instrumentation = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = instrumentation.prometheus_text().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass # No console line for each scrape.
+
+        self.server = ThreadingHTTPServer(serverAddress, MetricsHandler)
+        self.serverAddress = serverAddress
+        threading.Thread(target=self.server.serve_forever, name='metrics-endpoint', daemon=True).start()
+        logger.info("Metrics served on http://%s:%d/metrics", *self.server.server_address[:2])
+
+    def _stop_server(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+            self.serverAddress = None
+
+    def close(self):
+        self._stop_server()
+        self.exporter = None
+
+    def end_cycle(self, **fields):
+        '''
+        Close the current measurement cycle: its metrics (plus the given fields) are written to the JSON-lines file, then reset.
+        :return: The cycle record.
+        '''
+        now = time.time()
+        with self.lock:
+            self.cycles += 1
+            record = dict(time=now, cycle=self.cycles, duration_s=now - self.cycleStart, rss_MiB=resident_memory_bytes() / 2**20, **fields)
+            record['histogram_buckets_s'] = LATENCY_BUCKETS_S # Upper bounds; histogram counts have one more bucket (+Inf).
+            record['stages'] = {stage: metrics.as_dict() for stage, metrics in self.cycle.items()}
+            self.cycle = {}
+            self.cycleStart = now
+        if self.exporter is not None:
+            try:
+                self.exporter.write(record)
+            except OSError as error:
+                logger.warning("metrics not written (%s).", error)
+        return record
+
+    def prometheus_text(self):
+        '''
+        Cumulative metrics in the Prometheus text exposition format.
+        '''
+        with self.lock:
+            totals = {stage: (metrics.count, metrics.wall_s, metrics.cpu_s, metrics.rss_bytes, metrics.buckets[:]) for stage, metrics in self.totals.items()}
+            cycles = self.cycles
+        name = METRICS_PREFIX + '_stage_duration_seconds'
+        lines = ['# HELP {} Wall time of the monitoring stages.'.format(name), '# TYPE {} histogram'.format(name)]
+        for stage, (count, wall_s, cpu_s, rss_bytes, buckets) in sorted(totals.items()):
+            cumulative = 0
+            for upperBound, bucketCount in zip(LATENCY_BUCKETS_S + ('+Inf',), buckets):
+                cumulative += bucketCount
+                lines.append('{}_bucket{{stage="{}",le="{}"}} {:d}'.format(name, stage, upperBound, cumulative))
+            lines.append('{}_sum{{stage="{}"}} {:.6f}'.format(name, stage, wall_s))
+            lines.append('{}_count{{stage="{}"}} {:d}'.format(name, stage, count))
+        for metric, help, metricType, index, form in (('_stage_cpu_seconds_total', 'CPU time of the monitoring stages (calling thread).', 'counter', 2, '{:.6f}'),
+                                                      ('_stage_resident_memory_max_bytes', 'Maximum resident memory at the end of the stages.', 'gauge', 3, '{:d}')):
+            lines += ['# HELP {}{} {}'.format(METRICS_PREFIX, metric, help), '# TYPE {}{} {}'.format(METRICS_PREFIX, metric, metricType)]
+            lines += [('{}{}{{stage="{}"}} ' + form).format(METRICS_PREFIX, metric, stage, values[index]) for stage, values in sorted(totals.items())]
+        lines += ['# HELP {}_cycles_total Measurement cycles completed.'.format(METRICS_PREFIX), '# TYPE {}_cycles_total counter'.format(METRICS_PREFIX), '{}_cycles_total {:d}'.format(METRICS_PREFIX, cycles)]
+        lines += ['# HELP {}_resident_memory_bytes Resident memory of the monitoring process.'.format(METRICS_PREFIX), '# TYPE {}_resident_memory_bytes gauge'.format(METRICS_PREFIX),
+                  '{}_resident_memory_bytes {:d}'.format(METRICS_PREFIX, resident_memory_bytes())]
+        return '\n'.join(lines) + '\n'
+
+class _Span:
+    __slots__ = ('instrumentation', 'stage', 'start', 'startCPU')
+
+    def __init__(self, instrumentation, stage):
+        self.instrumentation = instrumentation
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.startCPU = time.thread_time()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.instrumentation.record(self.stage, time.perf_counter() - self.start, time.thread_time() - self.startCPU, resident_memory_bytes())
+
+# Instrumentation of this process, shared by all the modules
+METRICS = Instrumentation()
+span = METRICS.span
+instrumented = METRICS.instrumented
+
+if __name__ == "__main__":
+    print("Standalone script not yet developed.")
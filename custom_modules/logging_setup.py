@@ -0,0 +1,85 @@
+# Logging of the monitoring scripts
+#
+# Modules log through logging.getLogger(__name__). Per-measurement diagnostics are DEBUG records: with the default
+# INFO level they are discarded before any formatting. Enabled records are handed to a queue (QueueHandler), so the
+# measurement threads never wait for the console (slow over SSH or a serial console) or the log file: a listener
+# thread writes them. Levels can be set for each module, e.g. "custom_modules.signal_processing=DEBUG".
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+
+LOG_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
+DEFAULT_LOG_LEVEL = 'INFO'
+DEFAULT_LOG_FILE_MAX_BYTES = 1_000_000
+DEFAULT_LOG_FILE_BACKUPS = 3
+FILE_FORMAT = '%(asctime)s %(levelname)s %(threadName)s %(name)s: %(message)s'
+
+_listener = None
+_moduleLevels = {} # Modules whose level has been set, reset at the next configuration.
+
+class _ConsoleFormatter(logging.Formatter):
+    # Same console output as before the logging layer: bare messages, level prefix for warnings and errors
+    def format(self, record):
+        message = super().format(record)
+        if record.levelno >= logging.WARNING:
+            return record.levelname + ": " + message
+        return message
+
+def parse_module_levels(moduleLevels):
+    '''
+    Per-module levels from "module=LEVEL" strings (e.g. "custom_modules.sense2gol=DEBUG").
+    :return: Dictionary, module: level. ValueError if an entry is invalid.
+    '''
+    levels = {}
+    for entry in moduleLevels:
+        module, separator, level = entry.partition('=')
+        module, level = module.strip(), level.strip().upper()
+        if not separator or not module or level not in LOG_LEVELS:
+            raise ValueError("invalid module level {!r}: expected \"module=LEVEL\", LEVEL one of {}".format(entry, ", ".join(LOG_LEVELS)))
+        levels[module] = level
+    return levels
+
+def configure_logging(level: str = DEFAULT_LOG_LEVEL, moduleLevels=(), logFile: str = '', logFileMaxBytes: int = DEFAULT_LOG_FILE_MAX_BYTES, logFileBackups: int = DEFAULT_LOG_FILE_BACKUPS):
+    '''
+    Root level, per-module levels ("module=LEVEL" strings), console output and optional rotating log file,
+    written by a queue listener thread. Can be called again, e.g. after a settings reload.
+    '''
+    global _listener
+    stop_logging()
+    handlers = [logging.StreamHandler(sys.stdout)]
+    handlers[0].setFormatter(_ConsoleFormatter())
+    if logFile:
+        fileHandler = logging.handlers.RotatingFileHandler(logFile, maxBytes=logFileMaxBytes, backupCount=logFileBackups)
+        fileHandler.setFormatter(logging.Formatter(FILE_FORMAT))
+        handlers.append(fileHandler)
+    logQueue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        if isinstance(handler, logging.handlers.QueueHandler):
+            root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(logQueue))
+    root.setLevel(level)
+    for module in _moduleLevels:
+        logging.getLogger(module).setLevel(logging.NOTSET)
+    _moduleLevels.clear()
+    for module, moduleLevel in parse_module_levels(moduleLevels).items():
+        logging.getLogger(module).setLevel(moduleLevel)
+        _moduleLevels[module] = moduleLevel
+    _listener = logging.handlers.QueueListener(logQueue, *handlers)
+    _listener.start()
+
+def stop_logging():
+    # Write the queued records, then stop the listener thread (at exit, or before a new configuration)
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+atexit.register(stop_logging)
+
+if __name__ == "__main__":
+    print("Standalone script not yet developed.")
@@ -0,0 +1,163 @@
+# Online statistics of the surface velocity, updated in O(1) for each new measurement
+#
+# Mean and variance: Welford's algorithm. Quantiles: P² algorithm (Jain & Chlamtac, 1985), five markers
+# for each quantile, no sample stored. Normality: Shapiro-Wilk test on the most recent measurements only
+# (bounded window, small: the test costs O(n log n) at every request), computed on request. The final report
+# tests every measurement of the campaign instead (see shapiro_test()).
+import math
+import numpy as np
+
+DEFAULT_QUANTILES = (0.05, 0.5, 0.95)
+DEFAULT_NORMALITY_WINDOW = 30 # Measurements for the live normality test. 0: no live test.
+
+def shapiro_test(values):
+    '''
+    Shapiro-Wilk test of the values, NaN (no target detected) ignored.
+    :return: (statistic, p-value), NaN if less than 3 values.
+    '''
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    if len(values) < 3:
+        return float('nan'), float('nan')
+    from scipy import stats
+    result = stats.shapiro(values)
+    return result.statistic, result.pvalue
+
+class P2Quantile:
+    '''
+    Streaming estimate of the p-quantile. Exact up to 5 observations.
+    '''
+    def __init__(self, p: float):
+        assert 0 < p < 1, "Quantile should be between 0 and 1 (excluded)."
+        self.p = p
+        self.heights = [] # Marker heights (first 5 observations, then the P² markers).
+        self.positions = [0, 1, 2, 3, 4]
+        self.desired = [0, 2*p, 4*p, 2 + 2*p, 4]
+        self.increments = [0, p/2, p, (1 + p)/2, 1]
+
+    def update(self, value: float):
+        heights, positions = self.heights, self.positions
+        if len(heights) < 5:
+            heights.append(value)
+            heights.sort()
+            return
+        if value < heights[0]:
+            heights[0] = value
+            k = 0
+        elif value >= heights[4]:
+            heights[4] = value
+            k = 3
+        else:
+            k = 0
+            while value >= heights[k+1]:
+                k += 1
+        for i in range(k+1, 5):
+            positions[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+        # Adjust the three middle markers
+        for i in (1, 2, 3):
+            d = self.desired[i] - positions[i]
+            if (d >= 1 and positions[i+1] - positions[i] > 1) or (d <= -1 and positions[i-1] - positions[i] < -1):
+                d = 1 if d > 0 else -1
+                height = self._parabolic(i, d)
+                if not heights[i-1] < height < heights[i+1]:
+                    height = heights[i] + d * (heights[i+d] - heights[i]) / (positions[i+d] - positions[i])
+                heights[i] = height
+                positions[i] += d
+
+    def _parabolic(self, i, d):
+        q, n = self.heights, self.positions
+        return q[i] + d / (n[i+1] - n[i-1]) * ((n[i] - n[i-1] + d) * (q[i+1] - q[i]) / (n[i+1] - n[i]) + (n[i+1] - n[i] - d) * (q[i] - q[i-1]) / (n[i] - n[i-1]))
+
+    def value(self):
+        if len(self.heights) == 0:
+            return float('nan')
+        if len(self.heights) < 5:
+            return float(np.quantile(self.heights, self.p))
+        return self.heights[2]
+
+class RunningStatistics:
+    '''
+    Count, mean, variance, extremes and quantiles of a stream of values, plus a bounded window of the most
+    recent values for the normality test. NaN values (no target detected) are ignored.
+    '''
+    def __init__(self, quantiles=DEFAULT_QUANTILES, normalityWindow: int = DEFAULT_NORMALITY_WINDOW):
+        self.count = 0
+        self.mean = 0.0
+        self._M2 = 0.0 # Sum of squared deviations from the mean.
+        self.minimum = math.inf
+        self.maximum = -math.inf
+        self.quantiles = {p: P2Quantile(p) for p in quantiles}
+        self.window = np.empty(normalityWindow)
+        self.windowLength = 0
+        self._windowNext = 0 # Ring buffer: index of the next value.
+
+    def update(self, value: float):
+        value = float(value)
+        if math.isnan(value):
+            return
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._M2 += delta * (value - self.mean)
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+        for estimator in self.quantiles.values():
+            estimator.update(value)
+        if len(self.window) > 0:
+            self.window[self._windowNext] = value
+            self._windowNext = (self._windowNext + 1) % len(self.window)
+            self.windowLength = min(self.windowLength + 1, len(self.window))
+
+    def variance(self, ddof: int = 1):
+        return self._M2 / (self.count - ddof) if self.count > ddof else float('nan')
+
+    def std(self, ddof: int = 1):
+        return math.sqrt(self.variance(ddof))
+
+    def quantile(self, p: float):
+        return self.quantiles[p].value()
+
+    def recent(self):
+        '''
+        :return: The values in the normality window, oldest first.
+        '''
+        if self.windowLength < len(self.window):
+            return self.window[:self.windowLength].copy()
+        return np.roll(self.window, -self._windowNext)
+
+    def shapiro(self):
+        '''
+        Shapiro-Wilk test on the values in the normality window (3 values at least).
+        :return: (statistic, p-value), NaN if not enough values or no window.
+        '''
+        return shapiro_test(self.recent())
+
+class DirectionStatistics:
+    '''
+    RunningStatistics for each scanning direction.
+    '''
+    def __init__(self, directions: int, quantiles=DEFAULT_QUANTILES, normalityWindow: int = DEFAULT_NORMALITY_WINDOW):
+        self.directions = [RunningStatistics(quantiles, normalityWindow) for _ in range(directions)]
+
+    @classmethod
+    def from_table(cls, table, quantiles=DEFAULT_QUANTILES, normalityWindow: int = DEFAULT_NORMALITY_WINDOW):
+        # From an (EPISODES, DIRECTIONS) table, in episode order
+        statistics = cls(table.shape[1], quantiles, normalityWindow)
+        for episodeValues in table:
+            for direction, value in enumerate(episodeValues):
+                statistics.update(direction, value)
+        return statistics
+
+    def __getitem__(self, direction: int):
+        return self.directions[direction]
+
+    def __len__(self):
+        return len(self.directions)
+
+    def update(self, direction: int, value: float):
+        self.directions[direction].update(value)
+
+if __name__ == "__main__":
+    print("Standalone script not yet developed.")
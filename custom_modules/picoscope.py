@@ -1,22 +1,323 @@
+# PicoScope 2206B acquisition (channel A: IFI, channel B: IFQ)
+#
+# PicoScope drives the acquisition: block mode (samples stored in the scope memory, then transferred) for
+# short captures, streaming mode (samples transferred while acquiring) for captures that do not fit in the
+# scope memory. Samples are written straight into a preallocated (2, samples) int16 array, or into a binary
+# capture file (custom_modules/raw_capture.py) mapped in memory.
+# The hardware is reached through a device object: PS2000aDevice (picosdk, imported only when the scope is
+# opened: https://github.com/picotech/picosdk-python-wrappers) or SimulatedPicoScope (no hardware needed).
+import ctypes
+import logging
+import sys
+import time
 from math import log
-import string
+import numpy as np
+sys.path.insert(1, ".")
+from custom_modules.instrumentation import instrumented
+
+logger = logging.getLogger(__name__)
+
+# ps2000a channel ranges (V) and their PS2000A_RANGE values
+CHANNEL_RANGE_IDS = {20e-3: 1, 50e-3: 2, 100e-3: 3, 200e-3: 4, 500e-3: 5, 1: 6, 2: 7, 5: 8, 10: 9, 20: 10}
+MAX_ADC_VALUE = 32512 # ADC counts at full scale (PicoScope 2206B, 8-bit ADC scaled to 16 bits).
+BLOCK_MODE_MAX_SAMPLES = 16_000_000 # Per channel: 32 MS of scope memory, shared by the two channels.
+STREAMING_CHUNK_SAMPLES = 100_000 # Per channel: size of the driver buffers in streaming mode.
+STREAMING_POLL_INTERVAL = 0.01 # s
+BLOCK_READY_TIMEOUT = 10.0 # s, on top of the acquisition time.
+STREAMING_TIMEOUT = 10.0 # s, on top of the acquisition time.
 
 def conform_sampling_frequency(samplingFrequency: float):
+    return sampling_timebase(samplingFrequency)[1]
+
+def sampling_timebase(samplingFrequency: float):
+    '''
+    PicoScope 2206B timebase closest to the requested sampling frequency.
+    :return: Timebase and the corresponding sampling frequency (Hz).
+    '''
     if samplingFrequency >= 125e6:
         timebase = round(log(500e6/samplingFrequency,2))
         samplingFrequency = 1/(2**timebase/5)*1e8
     else:
         timebase=round(62.5e6/samplingFrequency+2)
         samplingFrequency = 62.5e6/(timebase-2)
-    return samplingFrequency
+    return timebase, samplingFrequency
 
 def invalid_channel_range():
     raise ValueError("The channel range specified in settings.json is not valid.")
 
-def get_channel_range_id(channelRange: str):
-    channelRanges = {'20e-3': 1, '50e-3': 2, '100e-3': 3, '200e-3': 4, '500e-3': 5, '1': 6, '2': 7, '5': 8, '10': 9, '20': 10}
-    channel_range_id = channelRanges.get(channelRange, invalid_channel_range)
-    return channel_range_id
+def get_channel_range_id(channelRange: float):
+    '''
+    :return: PS2000A_RANGE value of a channel range, in volts (e.g. 500e-3).
+    '''
+    for range_V, channel_range_id in CHANNEL_RANGE_IDS.items():
+        if abs(float(channelRange) - range_V) <= 1e-9 * range_V:
+            return channel_range_id
+    invalid_channel_range()
+
+class _StreamingSink:
+    '''
+    Destination of streaming mode: chunks handed over by the driver (or by the simulator) are copied into
+    the (2, samples) output array, after skipping the first "skip" samples (trigger delay).
+    '''
+    def __init__(self, out, skip: int = 0):
+        self.out = out
+        self.skip = skip
+        self.received = 0 # Samples received, skipped ones included.
+        self.overflow = False
+        self.autoStopped = False # Driver stopped streaming (streaming mode of the real device).
+
+    @property
+    def complete(self):
+        return self.received >= self.skip + self.out.shape[1]
+
+    def write(self, chunkA, chunkB, overflow=False):
+        self.overflow |= bool(overflow)
+        start = self.received
+        self.received += len(chunkA)
+        first = max(self.skip - start, 0) # First useful sample of the chunk
+        if first >= len(chunkA):
+            return
+        destination = start + first - self.skip
+        length = min(len(chunkA) - first, self.out.shape[1] - destination)
+        self.out[0, destination:destination+length] = chunkA[first:first+length]
+        self.out[1, destination:destination+length] = chunkB[first:first+length]
+
+class PS2000aDevice:
+    '''
+    PicoScope 2000 series (A API), through the picosdk ctypes wrappers.
+    '''
+    def __init__(self):
+        self.handle = None
+        self.ps = None
+        self.maxADC = MAX_ADC_VALUE
+
+    def _check(self, status):
+        from picosdk.functions import assert_pico_ok
+        assert_pico_ok(status)
+
+    def open(self):
+        from picosdk.ps2000a import ps2000a
+        self.ps = ps2000a
+        self.handle = ctypes.c_int16()
+        self._check(self.ps.ps2000aOpenUnit(ctypes.byref(self.handle), None))
+        maxADC = ctypes.c_int16()
+        self._check(self.ps.ps2000aMaximumValue(self.handle, ctypes.byref(maxADC)))
+        self.maxADC = maxADC.value
+
+    def close(self):
+        if self.handle is not None:
+            self.ps.ps2000aStop(self.handle)
+            self.ps.ps2000aCloseUnit(self.handle)
+            self.handle = None
+
+    def set_channels(self, channelARangeId: int, channelBRangeId: int):
+        DC_COUPLING = self.ps.PS2000A_COUPLING['PS2000A_DC']
+        for channel, rangeId in (('PS2000A_CHANNEL_A', channelARangeId), ('PS2000A_CHANNEL_B', channelBRangeId)):
+            self._check(self.ps.ps2000aSetChannel(self.handle, self.ps.PS2000A_CHANNEL[channel], 1, DC_COUPLING, rangeId, 0.0))
+        self._check(self.ps.ps2000aSetSimpleTrigger(self.handle, 0, 0, 0, 0, 0, 0)) # No trigger: acquisition starts immediately.
+
+    def set_geometry(self, direction_DEG: float, tiltAngle_DEG: float):
+        pass # Only the simulator needs to know where the beam points.
+
+    def _set_buffers(self, bufferA, bufferB):
+        NO_DOWNSAMPLING = self.ps.PS2000A_RATIO_MODE['PS2000A_RATIO_MODE_NONE']
+        for channel, buffer in (('PS2000A_CHANNEL_A', bufferA), ('PS2000A_CHANNEL_B', bufferB)):
+            self._check(self.ps.ps2000aSetDataBuffers(self.handle, self.ps.PS2000A_CHANNEL[channel], buffer.ctypes.data_as(ctypes.POINTER(ctypes.c_int16)), None, len(buffer), 0, NO_DOWNSAMPLING))
+
+    def block(self, timebase: int, out, skip: int = 0):
+        # skip + samples acquired in the scope memory, then samples transferred straight into out (2, samples)
+        samples = out.shape[1]
+        timeInterval_ns = ctypes.c_float()
+        maxSamples = ctypes.c_int32()
+        self._check(self.ps.ps2000aGetTimebase2(self.handle, timebase, skip + samples, ctypes.byref(timeInterval_ns), 0, ctypes.byref(maxSamples), 0))
+        self._check(self.ps.ps2000aRunBlock(self.handle, 0, skip + samples, timebase, 0, None, 0, None, None))
+        deadline = time.monotonic() + (skip + samples) * timeInterval_ns.value * 1e-9 + BLOCK_READY_TIMEOUT
+        ready = ctypes.c_int16(0)
+        while ready.value == 0:
+            if time.monotonic() > deadline:
+                raise TimeoutError("PicoScope block acquisition not completed.")
+            time.sleep(STREAMING_POLL_INTERVAL)
+            self._check(self.ps.ps2000aIsReady(self.handle, ctypes.byref(ready)))
+        self._set_buffers(out[0], out[1])
+        transferred = ctypes.c_uint32(samples)
+        overflow = ctypes.c_int16()
+        self._check(self.ps.ps2000aGetValues(self.handle, skip, ctypes.byref(transferred), 1, self.ps.PS2000A_RATIO_MODE['PS2000A_RATIO_MODE_NONE'], 0, ctypes.byref(overflow)))
+        self._check(self.ps.ps2000aStop(self.handle))
+        return transferred.value, bool(overflow.value)
+
+    def streaming(self, samplingFrequency: float, out, skip: int = 0, chunkSamples: int = STREAMING_CHUNK_SAMPLES):
+        # New samples are copied into out by the callback, chunk by chunk, within ps2000aGetStreamingLatestValues().
+        # One pair of driver buffers is enough: the driver keeps the samples in its own memory and writes
+        # them to the application buffers only inside that call, just before the callback, which copies
+        # them out before returning. The application buffers are never written while the callback reads them.
+        # TimeoutError if the samples are not all received within the acquisition time plus STREAMING_TIMEOUT.
+        sink = _StreamingSink(out, skip)
+        driverBuffers = np.empty((2, chunkSamples), dtype=np.int16)
+        self._set_buffers(driverBuffers[0], driverBuffers[1])
+
+        def streaming_ready(handle, noOfSamples, startIndex, overflow, triggerAt, triggered, autoStop, parameter):
+            sink.write(driverBuffers[0, startIndex:startIndex+noOfSamples], driverBuffers[1, startIndex:startIndex+noOfSamples], overflow)
+            sink.autoStopped |= bool(autoStop)
+
+        from picosdk.constants import PICO_STATUS
+        callback = self.ps.StreamingReadyType(streaming_ready) # Kept referenced until the end of the acquisition.
+        sampleInterval_ns = ctypes.c_int32(round(1e9 / samplingFrequency))
+        self._check(self.ps.ps2000aRunStreaming(self.handle, ctypes.byref(sampleInterval_ns), self.ps.PS2000A_TIME_UNITS['PS2000A_NS'], 0, skip + out.shape[1], 1, 1, self.ps.PS2000A_RATIO_MODE['PS2000A_RATIO_MODE_NONE'], chunkSamples))
+        startTime = time.monotonic()
+        deadline = startTime + (skip + out.shape[1]) / samplingFrequency + STREAMING_TIMEOUT
+        try:
+            while not sink.complete and not sink.autoStopped:
+                if time.monotonic() > deadline:
+                    raise TimeoutError("PicoScope streaming acquisition not completed: {:d} of {:d} samples received in {:.1f} s.".format(sink.received, skip + out.shape[1], time.monotonic() - startTime))
+                status = self.ps.ps2000aGetStreamingLatestValues(self.handle, callback, None)
+                if status != PICO_STATUS['PICO_BUSY']:
+                    self._check(status)
+                time.sleep(STREAMING_POLL_INTERVAL)
+        finally:
+            self.ps.ps2000aStop(self.handle)
+        return min(sink.received - skip, out.shape[1]), sink.overflow
+
+class SimulatedPicoScope:
+    '''
+    Stand-in for PS2000aDevice: I/Q of a simulated river surface (custom_modules/devices.py), quantized as the real scope does.
+    The Doppler frequency follows the beam direction and tilt angle of each acquisition (set_geometry()).
+    Streaming mode goes through the same chunked copy as the real device.
+    '''
+    def __init__(self, scene=None, seed: int = None):
+        from custom_modules.devices import SimulatedScene
+        self.maxADC = MAX_ADC_VALUE
+        self.scene = SimulatedScene(seed=seed) if scene is None else scene
+        self.direction_DEG = 0.0
+        self.tiltAngle_DEG = 0.0
+        self.ranges_V = (1, 1)
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def set_channels(self, channelARangeId: int, channelBRangeId: int):
+        rangesById = {rangeId: range_V for range_V, rangeId in CHANNEL_RANGE_IDS.items()}
+        self.ranges_V = (rangesById[channelARangeId], rangesById[channelBRangeId])
+
+    def set_geometry(self, direction_DEG: float, tiltAngle_DEG: float):
+        if not np.isnan(direction_DEG):
+            self.direction_DEG = direction_DEG
+        if not np.isnan(tiltAngle_DEG):
+            self.tiltAngle_DEG = tiltAngle_DEG
+
+    def _generate(self, samples: int, samplingFrequency: float):
+        # Echo level relative to the full scale of each channel
+        signal = self.scene.echo(samples, samplingFrequency, self.direction_DEG, self.tiltAngle_DEG, self.maxADC)
+        return [np.clip(np.round(component), -self.maxADC, self.maxADC).astype(np.int16) for component in (signal.real, signal.imag)]
+
+    def block(self, timebase: int, out, skip: int = 0):
+        samplingFrequency = 62.5e6/(timebase-2) if timebase >= 3 else 5e8/2**timebase
+        out[0], out[1] = self._generate(out.shape[1], samplingFrequency)
+        return out.shape[1], False
+
+    def streaming(self, samplingFrequency: float, out, skip: int = 0, chunkSamples: int = STREAMING_CHUNK_SAMPLES):
+        # Samples generated at once (one realization of the echo), then delivered chunk by chunk after the skipped ones
+        sink = _StreamingSink(out, skip)
+        I_counts, Q_counts = self._generate(out.shape[1], samplingFrequency)
+        skipped = np.zeros(chunkSamples, dtype=np.int16)
+        while not sink.complete:
+            if sink.received < skip:
+                sink.write(skipped[:skip-sink.received], skipped[:skip-sink.received])
+            else:
+                start = sink.received - skip
+                sink.write(I_counts[start:start+chunkSamples], Q_counts[start:start+chunkSamples])
+        return out.shape[1], sink.overflow
+
+class PicoScope:
+    '''
+    I/Q acquisitions with a PicoScope 2206B (or a simulated one, see SimulatedPicoScope).
+    Block mode when trigger delay and capture fit in the scope memory, streaming mode otherwise.
+    '''
+    def __init__(self, samplingFrequency: float, channelARange_V: float, channelBRange_V: float, device=None, blockModeMaxSamples: int = BLOCK_MODE_MAX_SAMPLES, streamingChunkSamples: int = STREAMING_CHUNK_SAMPLES):
+        self.timebase, self.samplingFrequency = sampling_timebase(samplingFrequency)
+        self.channelRanges_V = (channelARange_V, channelBRange_V)
+        self.channelRangeIds = (get_channel_range_id(channelARange_V), get_channel_range_id(channelBRange_V))
+        self.device = PS2000aDevice() if device is None else device
+        self.blockModeMaxSamples = blockModeMaxSamples
+        self.streamingChunkSamples = streamingChunkSamples
+        self.opened = False
+        self._mV = None # Reused by to_mV().
+
+    @classmethod
+    def from_settings(cls, settings, device=None):
+        # settings: custom_modules.settings.Settings, PicoScope layout
+        return cls(settings.samplingFrequency, settings.radar.channelARange_V, settings.radar.channelBRange_V, device)
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def open(self):
+        if not self.opened:
+            self.device.open()
+            self.device.set_channels(*self.channelRangeIds)
+            self.opened = True
+        return self
+
+    def close(self):
+        if self.opened:
+            self.device.close()
+            self.opened = False
+
+    @instrumented('picoscope')
+    def acquire(self, samples: int, triggerDelay_samples: int = 0, out=None, direction_DEG: float = float('nan'), tiltAngle_DEG: float = float('nan')):
+        '''
+        Acquire I (channel A) and Q (channel B), after discarding triggerDelay_samples samples.
+        Beam direction and tilt angle are only used by the simulated scope.
+        :return: ADC counts, (2, samples) int16 array (out, if given).
+        '''
+        self.device.set_geometry(direction_DEG, tiltAngle_DEG)
+        if out is None:
+            out = np.empty((2, samples), dtype=np.int16)
+        assert out.shape == (2, samples) and out.dtype == np.int16, "Output array should be (2, samples), int16."
+        if triggerDelay_samples + samples <= self.blockModeMaxSamples:
+            acquired, overflow = self.device.block(self.timebase, out, triggerDelay_samples)
+        else:
+            acquired, overflow = self.device.streaming(self.samplingFrequency, out, triggerDelay_samples, self.streamingChunkSamples)
+        if acquired < samples:
+            raise RuntimeError("PicoScope acquisition incomplete: {:d} of {:d} samples.".format(acquired, samples))
+        if overflow:
+            logger.warning("PicoScope input over range.")
+        return out
+
+    def acquire_capture(self, fileName: str, samples: int, triggerDelay_samples: int = 0, tiltAngle_DEG: float = float('nan'), direction_DEG: float = float('nan'), episode: int = 0, episodes: int = 1, label: str = ''):
+        '''
+        Acquire straight into a binary capture file (see custom_modules/raw_capture.py).
+        :return: Name of the capture file.
+        '''
+        from custom_modules.raw_capture import create_capture
+        samplesMap = create_capture(fileName, samples, self.samplingFrequency, self.device.maxADC, self.channelRanges_V[0], self.channelRanges_V[1], '<i2', tiltAngle_DEG, direction_DEG, episode, episodes, label)
+        if samples > 0:
+            self.acquire(samples, triggerDelay_samples, samplesMap, direction_DEG, tiltAngle_DEG)
+            samplesMap.flush()
+        del samplesMap
+        return fileName
+
+    def to_mV(self, counts, out=None):
+        '''
+        Convert ADC counts to mV, into a float64 (2, samples) array reused from one call to the next (or out).
+        :return: I (mV), Q (mV) rows of the converted array.
+        '''
+        if out is None:
+            if self._mV is None or self._mV.shape != counts.shape:
+                self._mV = np.empty(counts.shape)
+            out = self._mV
+        np.multiply(counts, np.reshape(self.scales_mV(), (2, 1)), out=out)
+        return out[0], out[1]
+
+    def scales_mV(self):
+        # mV per ADC count of I (channel A) and Q (channel B)
+        return tuple(channelRange_V * 1000 / self.device.maxADC for channelRange_V in self.channelRanges_V)
 
 if __name__ == "__main__":
-    print("Standalone script not yet delevoped.")
\ No newline at end of file
+    print("Standalone script not yet delevoped.")
@@ -0,0 +1,273 @@
+# Plots rendered in a separate process (Agg backend), off the measurement path
+import logging
+import multiprocessing
+import queue
+import sys
+import threading
+from datetime import datetime
+sys.path.insert(1, ".")
+
+logger = logging.getLogger(__name__)
+
+PLOT_BACKLOG_POLICIES = ('block', 'drop', 'coalesce')
+DEFAULT_PLOT_QUEUE_SIZE = 4 # Plot jobs waiting for the worker.
+_STOP = None
+
+def _plot_paths(plotPath, timestamp, png_plot, pdf_plot):
+    # Same file names as plots_readytouse
+    prefix = timestamp if plotPath is None else plotPath + timestamp
+    return ([prefix + '.png'] if png_plot else []) + ([prefix + '.pdf'] if pdf_plot else [])
+
+class _FigureRenderer:
+    '''
+    One Figure/Axes for each kind of plot, created at the first job and then updated in place:
+    only line data, limits and markers change from one plot to the next.
+    '''
+    def __init__(self):
+        import matplotlib
+        matplotlib.use('Agg')
+        from custom_modules.plots_readytouse import LINE_WIDTH, FONT_CHOICE
+        matplotlib.rcParams['font.family'] = FONT_CHOICE
+        matplotlib.rcParams['axes.linewidth'] = LINE_WIDTH
+        self.figures = {}
+
+    def _figure(self, kind, x_axis_label, y_axis_label):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from custom_modules.plots_readytouse import FIG_SIZE_X_INCHES, FIG_SIZE_Y_INCHES
+        figure = Figure(figsize=(FIG_SIZE_X_INCHES, FIG_SIZE_Y_INCHES))
+        FigureCanvasAgg(figure)
+        axes = figure.add_subplot()
+        axes.set_xlabel(x_axis_label)
+        axes.set_ylabel(y_axis_label)
+        return {'figure': figure, 'axes': axes}
+
+    def render(self, job):
+        kind, timestamp, data, options = job
+        cached = self.figures.get(kind)
+        if cached is None:
+            cached = self._figure(kind, options['x_axis_label'], options['y_axis_label'])
+            getattr(self, '_create_' + kind)(cached, data, options)
+            cached['figure'].tight_layout() # Once: the layout does not change between updates.
+            self.figures[kind] = cached # Only once complete: a failed first plot is created again at the next job.
+        else:
+            getattr(self, '_update_' + kind)(cached, data, options)
+        for fileName in _plot_paths(options['plotPath'], timestamp, options['png_plot'], options['pdf_plot']):
+            cached['figure'].savefig(fileName)
+
+    @staticmethod
+    def _rescale(axes):
+        axes.relim()
+        axes.autoscale_view()
+
+    def _create_signal(self, cached, data, options):
+        cached['lines'] = cached['axes'].plot(data['x'], data['y'])
+        cached['axes'].grid(True)
+
+    def _update_signal(self, cached, data, options):
+        cached['lines'][0].set_data(data['x'], data['y'])
+        self._rescale(cached['axes'])
+
+    def _create_IFI_IFQ(self, cached, data, options):
+        cached['lines'] = cached['axes'].plot(data['x'], data['I'], data['x'], data['Q'])
+        cached['axes'].legend(['IFI', 'IFQ'])
+        cached['axes'].grid(True)
+
+    def _update_IFI_IFQ(self, cached, data, options):
+        cached['lines'][0].set_data(data['x'], data['I'])
+        cached['lines'][1].set_data(data['x'], data['Q'])
+        self._rescale(cached['axes'])
+
+    def _create_doppler_centroid(self, cached, data, options):
+        axes = cached['axes']
+        cached['lines'] = axes.plot(data['x'], data['FFT'], data['x'], data['FFT_smoothed'])
+        cached['threshold'] = axes.axhline(y=data['centroid_threshold'], color='r', linestyle='-')
+        cached['start'] = axes.axvline(x=data['centroid_start'], color='k', linestyle=':')
+        cached['stop'] = axes.axvline(x=data['centroid_stop'], color='k', linestyle=':')
+        axes.grid(True)
+        axes.legend(['initial', 'smoothed'])
+        self._limits_doppler_centroid(axes, options)
+
+    def _update_doppler_centroid(self, cached, data, options):
+        cached['lines'][0].set_data(data['x'], data['FFT'])
+        cached['lines'][1].set_data(data['x'], data['FFT_smoothed'])
+        cached['threshold'].set_ydata([data['centroid_threshold']] * 2)
+        cached['start'].set_xdata([data['centroid_start']] * 2)
+        cached['stop'].set_xdata([data['centroid_stop']] * 2)
+        self._rescale(cached['axes'])
+        self._limits_doppler_centroid(cached['axes'], options)
+
+    @staticmethod
+    def _limits_doppler_centroid(axes, options):
+        if options['zeroForcing'] == True:
+            axes.set_xlim(options['frequency_min'], options['frequency_max'])
+        else:
+            axes.autoscale(axis='x')
+
+    def _create_spectrogram(self, cached, data, options):
+        # Equivalent of pcolormesh(..., shading='nearest') on a regular grid, with data that can be replaced
+        cached['image'] = cached['axes'].imshow(data['Sxx'], aspect='auto', origin='lower', interpolation='nearest', extent=self._extent(data))
+
+    def _update_spectrogram(self, cached, data, options):
+        cached['image'].set_data(data['Sxx'])
+        cached['image'].set_extent(self._extent(data))
+        cached['image'].autoscale()
+
+    @staticmethod
+    def _extent(data):
+        f, t = data['f'], data['t']
+        df = f[1] - f[0] if len(f) > 1 else 1
+        dt = t[1] - t[0] if len(t) > 1 else 2 * t[0]
+        return (t[0] - dt/2, t[-1] + dt/2, f[0] - df/2, f[-1] + df/2)
+
+def _plot_process(jobQueue, policy, logLevel):
+    # Fresh interpreter: console logging at the level of the parent process
+    from custom_modules.logging_setup import configure_logging, stop_logging
+    configure_logging(logLevel)
+    try:
+        _render_jobs(jobQueue, policy)
+    finally:
+        stop_logging()
+
+def _render_jobs(jobQueue, policy):
+    renderer = _FigureRenderer()
+    coalesced = 0
+    stopping = False
+    while not stopping:
+        jobs = [jobQueue.get()]
+        if policy == 'coalesce':
+            # Behind schedule: render only the most recent job of each kind
+            while True:
+                try:
+                    jobs.append(jobQueue.get_nowait())
+                except queue.Empty:
+                    break
+        if _STOP in jobs:
+            stopping = True
+            jobs = jobs[:jobs.index(_STOP)]
+        if policy == 'coalesce':
+            latest = {job[0]: job for job in jobs}
+            coalesced += len(jobs) - len(latest)
+            jobs = list(latest.values())
+        for job in jobs:
+            try:
+                renderer.render(job)
+            except Exception as error:
+                logger.warning("plot %s not rendered (%r).", job[0], error)
+    if coalesced > 0:
+        logger.info("Plot worker: %d plots skipped to keep up with acquisitions.", coalesced)
+
+class PlotWorker:
+    '''
+    Renders plots in a separate process with the Agg backend, so that plotting never blocks acquisitions.
+    Jobs (arrays and plot options) are queued by the plot_*() methods, same arguments as plots_readytouse.
+    When the worker falls behind and the queue is full, policy decides:
+    "block" waits (no plot lost), "drop" discards the new plot, "coalesce" keeps the new plot aside,
+    in place of the older plot of the same kind still waiting there, and queues it as soon as there is room
+    (or at flush()); the worker also renders only the latest queued plot of each kind.
+    '''
+    def __init__(self, policy: str = 'coalesce', queueSize: int = DEFAULT_PLOT_QUEUE_SIZE):
+        assert policy in PLOT_BACKLOG_POLICIES, "Plot backlog policy should be one of: " + ", ".join(PLOT_BACKLOG_POLICIES)
+        self.policy = policy
+        context = multiprocessing.get_context('spawn') # Fresh interpreter: no pyplot state or threads inherited.
+        self.jobQueue = context.Queue(maxsize=queueSize)
+        self.process = context.Process(target=_plot_process, args=(self.jobQueue, policy, logging.getLogger().getEffectiveLevel()), name="plots", daemon=True)
+        self.dropped = 0
+        self.coalesced = 0
+        self._waiting = {} # "coalesce": latest plot of each kind not queued yet (queue full).
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def start(self):
+        self.process.start()
+
+    def submit(self, kind, data, options):
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f") # Time of the request, not of the rendering.
+        job = (kind, timestamp, data, options)
+        if self.policy == 'block':
+            self._put(job)
+            return True
+        if self.policy == 'coalesce':
+            with self._lock:
+                self._queue_waiting()
+                if kind in self._waiting: # Older plot of the same kind, never queued: replaced
+                    self.coalesced += 1
+                    self._waiting[kind] = job
+                    return True
+                try:
+                    self.jobQueue.put_nowait(job)
+                except queue.Full:
+                    self._waiting[kind] = job
+                return True
+        try:
+            self.jobQueue.put_nowait(job)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _put(self, job):
+        # Wait for room in the queue, as long as the worker is alive
+        while True:
+            try:
+                self.jobQueue.put(job, timeout=1)
+                return
+            except queue.Full:
+                if not self.process.is_alive():
+                    raise RuntimeError("Plot worker stopped unexpectedly.")
+
+    def _queue_waiting(self):
+        # Queue the plots kept aside, while there is room
+        for kind, job in list(self._waiting.items()):
+            try:
+                self.jobQueue.put_nowait(job)
+            except queue.Full:
+                return
+            del self._waiting[kind]
+
+    def flush(self):
+        # Queue the plots kept aside by the "coalesce" policy, waiting for room (e.g. at the end of a scan)
+        with self._lock:
+            while self._waiting:
+                kind, job = next(iter(self._waiting.items()))
+                self._put(job)
+                del self._waiting[kind]
+
+    def close(self):
+        # Render the pending plots, then stop the worker
+        if self.process.is_alive():
+            self.flush()
+            self.jobQueue.put(_STOP)
+            self.process.join()
+        if self.dropped > 0:
+            logger.warning("Plot worker: %d plots dropped (queue full).", self.dropped)
+        if self.coalesced > 0:
+            logger.info("Plot worker: %d plots replaced by newer ones of the same kind (queue full).", self.coalesced)
+
+    def plot_signal(self, x_axis_data, y_axis_data, x_axis_label='X axis data (adim.)', y_axis_label='Y axis data (adim.)', savePlot=True, pdf_plot=True, png_plot=True, plotPath=None):
+        if savePlot:
+            return self.submit('signal', {'x': x_axis_data, 'y': y_axis_data}, {'x_axis_label': x_axis_label, 'y_axis_label': y_axis_label, 'pdf_plot': pdf_plot, 'png_plot': png_plot, 'plotPath': plotPath})
+
+    def plot_IFI_IFQ(self, ifiq_x_axis_data, ifi_y_axis_data, ifq_y_axis_data, x_axis_label='X axis data (adim.)', y_axis_label='Y axis data (adim.)', savePlot=True, pdf_plot=True, png_plot=True, plotPath=None):
+        if savePlot:
+            return self.submit('IFI_IFQ', {'x': ifiq_x_axis_data, 'I': ifi_y_axis_data, 'Q': ifq_y_axis_data}, {'x_axis_label': x_axis_label, 'y_axis_label': y_axis_label, 'pdf_plot': pdf_plot, 'png_plot': png_plot, 'plotPath': plotPath})
+
+    def plot_doppler_centroid(self, FFT_x_axis_data, FFT_y_axis_data, FFT_smoothed_y_axis_data, centroid_start, centroid_stop, centroid_threshold, x_axis_label='X axis data (adim.)', y_axis_label='Y axis data (adim.)', zeroForcing=False, frequency_min=-1000, frequency_max=1000, savePlot=True, pdf_plot=True, png_plot=True, plotPath=None):
+        if savePlot:
+            return self.submit('doppler_centroid', {'x': FFT_x_axis_data, 'FFT': FFT_y_axis_data, 'FFT_smoothed': FFT_smoothed_y_axis_data, 'centroid_start': centroid_start, 'centroid_stop': centroid_stop, 'centroid_threshold': centroid_threshold},
+                               {'x_axis_label': x_axis_label, 'y_axis_label': y_axis_label, 'zeroForcing': zeroForcing, 'frequency_min': frequency_min, 'frequency_max': frequency_max, 'pdf_plot': pdf_plot, 'png_plot': png_plot, 'plotPath': plotPath})
+
+    def plot_spectrogram(self, spectrogram, x_axis_label='X axis data (adim.)', y_axis_label='Y axis data (adim.)', savePlot=True, pdf_plot=True, png_plot=True, plotPath=None):
+        # spectrogram: (f, t, Sxx) with frequencies in ascending order, e.g. from StreamingSTFT.spectrogram()
+        f, t, Sxx = spectrogram
+        if savePlot and len(t) > 0:
+            return self.submit('spectrogram', {'f': f, 't': t, 'Sxx': Sxx}, {'x_axis_label': x_axis_label, 'y_axis_label': y_axis_label, 'pdf_plot': pdf_plot, 'png_plot': png_plot, 'plotPath': plotPath})
+
+if __name__ == "__main__":
+    print("Standalone script not yet developed.")
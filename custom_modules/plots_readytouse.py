@@ -1,7 +1,5 @@
 import matplotlib.pyplot as plt
 from datetime import datetime
-from scipy import signal
-from scipy.fft import fftshift
 
 # Figure Width (inches)
 FIG_SIZE_X_INCHES = 3.5
@@ -112,7 +110,8 @@ def plot_doppler_centroid(FFT_x_axis_data, FFT_y_axis_data, FFT_smoothed_y_axis_
     # Clear figure
     plt.clf()
 
-def plot_spectrogram(complexSignal, SAMPLING_FREQUENCY, OVERLAPPING_SAMPLES: int, SAMPLES_IN_SEGMENT: int, STFT_BINS: int, x_axis_label='X axis data (adim.)', y_axis_label='Y axis data (adim.)', showFigure=False, savePlot=True, pdf_plot=True, png_plot=True, plotPath=None):
+def plot_spectrogram(complexSignal, SAMPLING_FREQUENCY, OVERLAPPING_SAMPLES: int, SAMPLES_IN_SEGMENT: int, STFT_BINS: int, x_axis_label='X axis data (adim.)', y_axis_label='Y axis data (adim.)', showFigure=False, savePlot=True, pdf_plot=True, png_plot=True, plotPath=None, spectrogram=None):
+    # spectrogram: (f, t, Sxx) already computed, e.g. by StreamingSTFT.spectrogram() (frequencies in ascending order).
     # Output File Paths for Plot
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
     if plotPath == None: # e.g. when standalone script
@@ -127,8 +126,14 @@ def plot_spectrogram(complexSignal, SAMPLING_FREQUENCY, OVERLAPPING_SAMPLES: int
     plt.rcParams['axes.linewidth'] = LINE_WIDTH
     plt.rcParams["figure.figsize"] = (FIG_SIZE_X_INCHES, FIG_SIZE_Y_INCHES)
 
-    f, t, Sxx = signal.spectrogram(complexSignal, fs = SAMPLING_FREQUENCY, noverlap=OVERLAPPING_SAMPLES, nperseg = SAMPLES_IN_SEGMENT, nfft = STFT_BINS, scaling = 'spectrum', return_onesided=False, detrend=False)
-    plt.pcolormesh(t, fftshift(f), fftshift(Sxx, axes=0), shading='nearest')
+    if spectrogram is None:
+        from scipy import signal
+        from scipy.fft import fftshift
+        f, t, Sxx = signal.spectrogram(complexSignal, fs = SAMPLING_FREQUENCY, noverlap=OVERLAPPING_SAMPLES, nperseg = SAMPLES_IN_SEGMENT, nfft = STFT_BINS, scaling = 'spectrum', return_onesided=False, detrend=False)
+        f, Sxx = fftshift(f), fftshift(Sxx, axes=0)
+    else:
+        f, t, Sxx = spectrogram
+    plt.pcolormesh(t, f, Sxx, shading='nearest')
     plt.ylabel(y_axis_label)
     plt.xlabel(x_axis_label)
     plt.tight_layout()
@@ -0,0 +1,216 @@
+# Binary container for raw I/Q captures.
+#
+# Layout (little-endian):
+#   fixed header (see _HEADER), label (UTF-8), zero padding up to "header length",
+#   I samples (N values), Q samples (N values).
+# The header length is stored in the header itself, so the sample block can be
+# mapped with a single np.memmap/np.fromfile call at that offset.
+import argparse
+import glob
+import logging
+import os
+import re
+import struct
+import sys
+import numpy as np
+sys.path.insert(1, ".")
+from custom_modules.instrumentation import instrumented
+
+logger = logging.getLogger(__name__)
+
+CAPTURE_MAGIC = b'RDRCAP'
+CAPTURE_VERSION = 1
+CAPTURE_EXTENSION = '.bin'
+STREAM_CHUNK_SAMPLES = 65_536 # Per channel: samples converted at a time by CaptureStream.
+# magic, version, header length, sampling frequency (Hz), ADC full scale (counts), ADC range I (V), ADC range Q (V),
+# sample dtype (numpy code, e.g. 'u2'), tilt angle (deg), direction (deg), episode (0-based), episodes, samples per channel, label length
+_HEADER = struct.Struct('<6sHHdIdd2sddIIQH')
+_HEADER_ALIGNMENT = 8
+# Label produced by serialPort_acquisition(), e.g. "20221005_101010_123456__tilt45.0deg__episode1of3__dir-30.0deg"
+_LABEL_PATTERN = re.compile(r'(?P<timestamp>\d{8}_\d{6}_\d{6})__tilt(?P<tilt>-?\d+(?:\.\d+)?)deg__episode(?P<episode>\d+)of(?P<episodes>\d+)__dir(?P<direction>-?\d+(?:\.\d+)?)deg')
+
+def parse_capture_label(fileName: str):
+    '''
+    Parse timestamp, tilt angle, episode and direction from a raw capture file name.
+    :return: Dictionary with the labels, or None if the name does not follow the acquisition naming scheme.
+    '''
+    match = _LABEL_PATTERN.search(os.path.basename(fileName))
+    if match is None:
+        return None
+    return {'timestamp': match.group('timestamp'),
+            'label': match.group(0),
+            'tilt_DEG': float(match.group('tilt')),
+            'episode': int(match.group('episode')) - 1,
+            'episodes': int(match.group('episodes')),
+            'direction_DEG': float(match.group('direction'))}
+
+def create_capture(fileName: str, samples: int, samplingFrequency: float, adcFullScale: int, adcRangeI_V: float, adcRangeQ_V: float, dtype='<u2', tiltAngle_DEG: float = float('nan'), direction_DEG: float = float('nan'), episode: int = 0, episodes: int = 1, label: str = ''):
+    '''
+    Write the capture header and allocate the sample block on disk.
+    :return: Writable memory map of shape (2, samples): row 0 is I, row 1 is Q.
+    '''
+    dtype = np.dtype(dtype).newbyteorder('<')
+    labelBytes = label.encode('utf-8')
+    headerLength = _HEADER.size + len(labelBytes)
+    headerLength += -headerLength % _HEADER_ALIGNMENT
+    header = _HEADER.pack(CAPTURE_MAGIC, CAPTURE_VERSION, headerLength, samplingFrequency, adcFullScale, adcRangeI_V, adcRangeQ_V, dtype.str[1:].encode('ascii'), tiltAngle_DEG, direction_DEG, episode, episodes, samples, len(labelBytes))
+    with open(fileName, 'wb') as f:
+        f.write(header)
+        f.write(labelBytes)
+        f.write(bytes(headerLength - f.tell()))
+        f.truncate(headerLength + 2 * samples * dtype.itemsize)
+    if samples == 0:
+        return np.zeros((2, 0), dtype=dtype)
+    return np.memmap(fileName, dtype=dtype, mode='r+', offset=headerLength, shape=(2, samples))
+
+def write_capture(fileName: str, I_counts, Q_counts, samplingFrequency: float, adcFullScale: int, adcRangeI_V: float, adcRangeQ_V: float, dtype='<u2', tiltAngle_DEG: float = float('nan'), direction_DEG: float = float('nan'), episode: int = 0, episodes: int = 1, label: str = ''):
+    '''
+    Store I and Q ADC counts (same length) in a binary capture file.
+    :return: Name of the written file.
+    '''
+    assert len(I_counts) == len(Q_counts), "I and Q arrays must have the same length."
+    samplesMap = create_capture(fileName, len(I_counts), samplingFrequency, adcFullScale, adcRangeI_V, adcRangeQ_V, dtype, tiltAngle_DEG, direction_DEG, episode, episodes, label)
+    if len(I_counts) > 0:
+        samplesMap[0] = I_counts
+        samplesMap[1] = Q_counts
+        samplesMap.flush()
+    del samplesMap
+    return fileName
+
+def read_capture_header(fileName: str):
+    '''
+    Read the header of a binary capture file.
+    :return: Dictionary with the header fields.
+    '''
+    with open(fileName, 'rb') as f:
+        fixed = f.read(_HEADER.size)
+        if len(fixed) < _HEADER.size or fixed[:len(CAPTURE_MAGIC)] != CAPTURE_MAGIC:
+            raise ValueError("Not a raw capture file: " + fileName)
+        magic, version, headerLength, samplingFrequency, adcFullScale, adcRangeI_V, adcRangeQ_V, dtypeCode, tiltAngle_DEG, direction_DEG, episode, episodes, samples, labelLength = _HEADER.unpack(fixed)
+        if version > CAPTURE_VERSION:
+            raise ValueError("Raw capture version {:d} not supported (max {:d}).".format(version, CAPTURE_VERSION))
+        label = f.read(labelLength).decode('utf-8')
+    return {'version': version,
+            'header_length': headerLength,
+            'sampling_frequency_Hz': samplingFrequency,
+            'adc_full_scale': adcFullScale,
+            'adc_range_I_V': adcRangeI_V,
+            'adc_range_Q_V': adcRangeQ_V,
+            'dtype': np.dtype('<' + dtypeCode.decode('ascii')),
+            'tilt_DEG': tiltAngle_DEG,
+            'direction_DEG': direction_DEG,
+            'episode': episode,
+            'episodes': episodes,
+            'samples': samples,
+            'label': label}
+
+def load_capture(fileName: str, mmap: bool = True):
+    '''
+    Load a binary capture file.
+    :return: Header dictionary and array of ADC counts with shape (2, samples): row 0 is I, row 1 is Q.
+    '''
+    header = read_capture_header(fileName)
+    if mmap and header['samples'] > 0:
+        samples = np.memmap(fileName, dtype=header['dtype'], mode='r', offset=header['header_length'], shape=(2, header['samples']))
+    else:
+        samples = np.fromfile(fileName, dtype=header['dtype'], count=2*header['samples'], offset=header['header_length']).reshape(2, header['samples'])
+    return header, samples
+
+@instrumented('parse')
+def capture_extract(fileName: str):
+    '''
+    Counterpart of txt_extract() for binary captures: sampling frequency and ADC scaling are read from the header.
+    '''
+    header, samples = load_capture(fileName, mmap=False)
+    IQ_arrays_length = header['samples']
+    logger.debug("Raw data extracted from binary file.")
+    logger.debug("Processed signals length: %d", IQ_arrays_length)
+    # Convert V to mV
+    I_array_mV = samples[0] * (header['adc_range_I_V'] / header['adc_full_scale']) * 1000 # mV
+    Q_array_mV = samples[1] * (header['adc_range_Q_V'] / header['adc_full_scale']) * 1000 # mV
+    # Convert to complex
+    complexSignal_mV = np.add(I_array_mV, 1j*Q_array_mV)
+    timeAxis_s = np.linspace(start=0, num=IQ_arrays_length, stop=IQ_arrays_length, endpoint=False) / header['sampling_frequency_Hz']
+    return I_array_mV, Q_array_mV, complexSignal_mV, timeAxis_s, IQ_arrays_length
+
+class CaptureStream:
+    '''
+    Signal of a capture (ADC counts, e.g. a capture file mapped in memory) converted to mV in chunks of chunkSamples:
+    I + jQ, or a single channel (channel 'I' or 'Q') with complexSignal False. Each chunk is converted into the
+    same buffer, overwritten by the next one: memory does not depend on the capture length. Can be iterated more than once.
+    '''
+    def __init__(self, counts, scales_mV, complexSignal: bool = True, channel: str = 'I', chunkSamples: int = STREAM_CHUNK_SAMPLES):
+        self.counts = counts # (2, samples): row 0 is I, row 1 is Q.
+        self.scales_mV = scales_mV # mV per count of I and Q.
+        self.complexSignal = complexSignal
+        self.channel = channel
+        self.chunkSamples = max(int(chunkSamples), 1)
+        self._buffer = np.empty(min(self.chunkSamples, counts.shape[1]), dtype=complex if complexSignal else float)
+
+    @classmethod
+    def from_file(cls, fileName: str, complexSignal: bool = True, channel: str = 'I', chunkSamples: int = STREAM_CHUNK_SAMPLES):
+        # Binary capture mapped in memory: samples are read from disk chunk by chunk
+        header, counts = load_capture(fileName)
+        scales_mV = (header['adc_range_I_V'] / header['adc_full_scale'] * 1000, header['adc_range_Q_V'] / header['adc_full_scale'] * 1000)
+        return cls(counts, scales_mV, complexSignal, channel, chunkSamples)
+
+    def __len__(self):
+        return self.counts.shape[1]
+
+    def __iter__(self):
+        for start in range(0, len(self), self.chunkSamples):
+            stop = min(start + self.chunkSamples, len(self))
+            chunk = self._buffer[:stop-start]
+            if self.complexSignal:
+                np.multiply(self.counts[0, start:stop], self.scales_mV[0], out=chunk.real)
+                np.multiply(self.counts[1, start:stop], self.scales_mV[1], out=chunk.imag)
+            else:
+                row = 0 if self.channel == 'I' else 1
+                np.multiply(self.counts[row, start:stop], self.scales_mV[row], out=chunk)
+            yield chunk
+
+def txt_to_capture(txtFileName: str, SAMPLING_FREQUENCY: float, ADC_RANGE_BITS: int, ADC_RANGE_V: float, captureFileName=None):
+    '''
+    Convert a legacy Sense2GoL *.txt capture into a binary capture file.
+    Labels (tilt, episode, direction) are taken from the file name, when available.
+    :return: Name of the binary capture file.
+    '''
+    from custom_modules.sense2gol import _iq_samples, txt_parse
+    if captureFileName is None:
+        captureFileName = os.path.splitext(txtFileName)[0] + CAPTURE_EXTENSION
+    with open(txtFileName, 'rb') as text_file:
+        I_samples, Q_samples = _iq_samples(*txt_parse(text_file))
+    labels = parse_capture_label(txtFileName) or {}
+    # Seems that Q and I needs to be inverted (same as txt_extract)
+    return write_capture(captureFileName, Q_samples, I_samples, SAMPLING_FREQUENCY, ADC_RANGE_BITS, ADC_RANGE_V, ADC_RANGE_V,
+                         tiltAngle_DEG=labels.get('tilt_DEG', float('nan')), direction_DEG=labels.get('direction_DEG', float('nan')),
+                         episode=labels.get('episode', 0), episodes=labels.get('episodes', 1), label=labels.get('label', os.path.splitext(os.path.basename(txtFileName))[0]))
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert Sense2GoL *.txt captures into binary capture files.")
+    parser.add_argument('paths', nargs='+', help="*.txt files, or folders containing them.")
+    parser.add_argument('--settings', default='sense2gol_pizero/settings.json', help="Settings file used for the acquisition (sampling frequency and ADC range).")
+    parser.add_argument('--delete', action='store_true', help="Delete each *.txt file after a successful conversion.")
+    args = parser.parse_args()
+
+    import json
+    with open(args.settings) as f:
+        settings = json.load(f)
+    SAMPLING_FREQUENCY = float(settings["sense2gol"]["sampling-frequency-Hz"]) # Hz
+    ADC_RANGE_BITS = int(2**settings["sense2gol"]["adc-resolution-bits"]) # Bits.
+    ADC_RANGE_V = settings["sense2gol"]["adc-range-v"] # Volts.
+
+    txtFileNames = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            txtFileNames.extend(sorted(glob.glob(os.path.join(path, '*.txt'))))
+        else:
+            txtFileNames.append(path)
+    for txtFileName in txtFileNames:
+        captureFileName = txt_to_capture(txtFileName, SAMPLING_FREQUENCY, ADC_RANGE_BITS, ADC_RANGE_V)
+        print("{} --> {} ({:.1f}% of original size)".format(txtFileName, captureFileName, 100 * os.path.getsize(captureFileName) / max(os.path.getsize(txtFileName), 1)))
+        if args.delete:
+            os.remove(txtFileName)
+
+if __name__ == "__main__":
+    main()
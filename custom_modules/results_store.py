@@ -0,0 +1,153 @@
+# Surface velocity results store: append-only SQLite database (WAL mode), one row per acquisition.
+#
+# Rows are committed one at a time, as soon as each direction is processed: a crash loses at most
+# the acquisition in progress, and the database is readable (e.g. by this module's CLI) while the
+# monitoring is running. Timestamps are UNIX times (s, UTC). Acquisitions without a target (FFT peak under the
+# target threshold) keep their FFT peak, with no centroid, band or surface velocity (NULL).
+import argparse
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+import numpy as np
+sys.path.insert(1, ".")
+from custom_modules.instrumentation import instrumented
+
+RESULTS_TABLE_VERSION = 1
+RESULT_FIELDS = ('timestamp', 'campaign', 'episode', 'direction_DEG', 'tilt_DEG', 'FFT_dBV_peak', 'centroid_Hz', 'band_start_Hz', 'band_stop_Hz', 'surface_velocity')
+RESULT_DTYPE = np.dtype([('timestamp', 'f8'), ('campaign', 'U32'), ('episode', 'i4'), ('direction_DEG', 'f8'), ('tilt_DEG', 'f8'), ('FFT_dBV_peak', 'f8'),
+                         ('centroid_Hz', 'f8'), ('band_start_Hz', 'f8'), ('band_stop_Hz', 'f8'), ('surface_velocity', 'f8')])
+ROLLUP_DTYPE = np.dtype([('timestamp', 'f8'), ('direction_DEG', 'f8'), ('count', 'i4'), ('surface_velocity_mean', 'f8'), ('surface_velocity_min', 'f8'),
+                         ('surface_velocity_max', 'f8'), ('FFT_dBV_peak_mean', 'f8'), ('centroid_Hz_mean', 'f8')])
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    timestamp REAL NOT NULL,
+    campaign TEXT NOT NULL,
+    episode INTEGER NOT NULL,
+    direction_DEG REAL NOT NULL,
+    tilt_DEG REAL,
+    FFT_dBV_peak REAL,
+    centroid_Hz REAL,
+    band_start_Hz REAL,
+    band_stop_Hz REAL,
+    surface_velocity REAL
+);
+CREATE INDEX IF NOT EXISTS results_by_time ON results (timestamp);
+CREATE INDEX IF NOT EXISTS results_by_direction ON results (direction_DEG, timestamp);
+'''
+
+def _unix_time(time):
+    # datetime (local time if naive) or UNIX time
+    if time is None or isinstance(time, (int, float)):
+        return time
+    return time.timestamp()
+
+def _nullable(value):
+    # NaN (e.g. no target detected) stored as NULL
+    value = float(value)
+    return None if np.isnan(value) else value
+
+class ResultsStore:
+    '''
+    Append-only results database. append() can be called from any thread (e.g. the processing
+    stage of the scan pipeline); each row is committed immediately.
+    '''
+    def __init__(self, fileName: str):
+        self.fileName = fileName
+        self.connection = None
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def open(self):
+        if self.connection is not None:
+            return self
+        connection = sqlite3.connect(self.fileName, timeout=30, check_same_thread=False, isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL') # Readers never block the writer.
+        connection.execute('PRAGMA synchronous=FULL') # Committed rows survive a power loss, too.
+        connection.executescript(_SCHEMA)
+        connection.execute('PRAGMA user_version={:d}'.format(RESULTS_TABLE_VERSION))
+        self.connection = connection
+        return self
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    @instrumented('results_store')
+    def append(self, timestamp, campaign: str, episode: int, direction_DEG: float, tiltAngle_DEG: float, FFT_dBV_peak: float, centroid_frequency: float, centroid_start: float, centroid_stop: float, surface_velocity: float, detected: bool = True):
+        # detected: FFT peak above the target threshold. Otherwise the centroid (0 Hz, as set by FFTPlan) is not a measurement.
+        if not detected:
+            centroid_frequency = centroid_start = centroid_stop = surface_velocity = np.nan
+        row = (_unix_time(timestamp), campaign, int(episode), float(direction_DEG), _nullable(tiltAngle_DEG), _nullable(FFT_dBV_peak), _nullable(centroid_frequency), _nullable(centroid_start), _nullable(centroid_stop), _nullable(surface_velocity))
+        with self.lock:
+            self.connection.execute('INSERT INTO results (' + ', '.join(RESULT_FIELDS) + ') VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', row)
+
+    @staticmethod
+    def _where(start, stop, direction_DEG):
+        conditions, parameters = [], []
+        if direction_DEG is not None:
+            conditions.append('direction_DEG BETWEEN ? AND ?') # Directions are linspace() values: compared with a tolerance.
+            parameters += [direction_DEG - 1e-6, direction_DEG + 1e-6]
+        if start is not None:
+            conditions.append('timestamp >= ?')
+            parameters.append(_unix_time(start))
+        if stop is not None:
+            conditions.append('timestamp < ?')
+            parameters.append(_unix_time(stop))
+        return (' WHERE ' + ' AND '.join(conditions) if conditions else ''), parameters
+
+    def query(self, start=None, stop=None, direction_DEG: float = None):
+        '''
+        Results with start <= timestamp < stop (datetime or UNIX time, None: unbounded), optionally for one direction only.
+        :return: Structured array (RESULT_DTYPE), in time order. Missing values are NaN.
+        '''
+        where, parameters = self._where(start, stop, direction_DEG)
+        rows = self.connection.execute('SELECT ' + ', '.join(RESULT_FIELDS) + ' FROM results' + where + ' ORDER BY timestamp, id', parameters).fetchall()
+        return np.array([tuple(np.nan if value is None else value for value in row) for row in rows], dtype=RESULT_DTYPE)
+
+    def rollup(self, interval_s: float, start=None, stop=None, direction_DEG: float = None):
+        '''
+        Downsampled results for long-term trends: statistics of each direction over time buckets of interval_s seconds
+        (e.g. 3600: hourly), aligned to UTC. Bucket timestamps are the start of each bucket. Acquisitions without a target are not counted.
+        :return: Structured array (ROLLUP_DTYPE), by bucket and direction.
+        '''
+        where, parameters = self._where(start, stop, direction_DEG)
+        where += (' AND ' if where else ' WHERE ') + 'surface_velocity IS NOT NULL'
+        rows = self.connection.execute('SELECT CAST(timestamp / ? AS INTEGER) * ? AS bucket, direction_DEG, COUNT(*), AVG(surface_velocity), MIN(surface_velocity), MAX(surface_velocity), AVG(FFT_dBV_peak), AVG(centroid_Hz)'
+                                       ' FROM results' + where + ' GROUP BY bucket, direction_DEG ORDER BY bucket, direction_DEG', [interval_s, interval_s] + parameters).fetchall()
+        return np.array([tuple(np.nan if value is None else value for value in row) for row in rows], dtype=ROLLUP_DTYPE)
+
+def _parse_time(text):
+    return None if text is None else datetime.fromisoformat(text)
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the surface velocity results database.")
+    parser.add_argument('database', help="Results database (*.sqlite).")
+    parser.add_argument('--start', default=None, help="First time, ISO format (e.g. 2022-10-05 or 2022-10-05T10:00).")
+    parser.add_argument('--stop', default=None, help="Last time (excluded), ISO format.")
+    parser.add_argument('--direction', type=float, default=None, help="Beam direction (deg).")
+    parser.add_argument('--rollup', type=float, default=None, help="Bucket length (s) of the downsampled results, e.g. 3600.")
+    args = parser.parse_args()
+
+    with ResultsStore(args.database) as store:
+        if args.rollup is None:
+            results = store.query(_parse_time(args.start), _parse_time(args.stop), args.direction)
+            print('time,campaign,episode,direction (deg),tilt (deg),peak (dBV),centroid (Hz),band start (Hz),band stop (Hz),velocity (m/s)')
+            for row in results:
+                print('{},{},{:d},{:.1f},{:.1f},{:.1f},{:.1f},{:.1f},{:.1f},{:.3f}'.format(datetime.fromtimestamp(row['timestamp']).isoformat(sep=' '), row['campaign'], row['episode']+1, *(row[field] for field in RESULT_FIELDS[3:])))
+        else:
+            results = store.rollup(args.rollup, _parse_time(args.start), _parse_time(args.stop), args.direction)
+            print('time,direction (deg),count,mean velocity (m/s),min velocity (m/s),max velocity (m/s),mean peak (dBV),mean centroid (Hz)')
+            for row in results:
+                print('{},{:.1f},{:d},{:.3f},{:.3f},{:.3f},{:.1f},{:.1f}'.format(datetime.fromtimestamp(row['timestamp']).isoformat(sep=' '), row['direction_DEG'], row['count'], *(row[field] for field in ROLLUP_DTYPE.names[3:])))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# Pipelined scan: acquisition, processing and plotting overlapped in time
+import queue
+import threading
+
+DEFAULT_QUEUE_SIZE = 2 # Jobs waiting between two stages. A full queue blocks the previous stage.
+_STOP = object()
+
+class ScanPipeline:
+    '''
+    Three-stage pipeline. The first stage (servo motion and acquisition) runs in the calling
+    thread and feeds jobs with submit(); processing and output (plots) run in two worker
+    threads, connected by bounded queues. Jobs are handled in submission order.
+    Call check() before starting each job of the first stage: a failure of the later stages stops the scan
+    before the next acquisition, instead of after it.
+    '''
+    def __init__(self, process_stage, output_stage, queueSize: int = DEFAULT_QUEUE_SIZE):
+        self.process_stage = process_stage
+        self.output_stage = output_stage
+        self.processQueue = queue.Queue(maxsize=queueSize)
+        self.outputQueue = queue.Queue(maxsize=queueSize)
+        self.error = None
+        self.failed = threading.Event()
+        self.threads = [threading.Thread(target=self._worker, args=(self.processQueue, self.process_stage, self.outputQueue), name="processing", daemon=True),
+                        threading.Thread(target=self._worker, args=(self.outputQueue, self.output_stage, None), name="output", daemon=True)]
+        self.started = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(raise_error=exc_type is None)
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+        self.started = True
+
+    def _worker(self, inputQueue, stage, outputQueue):
+        while True:
+            job = inputQueue.get()
+            if job is _STOP:
+                if outputQueue is not None:
+                    outputQueue.put(_STOP)
+                return
+            if self.failed.is_set():
+                continue # Drain the queue, so that the previous stage never blocks.
+            try:
+                result = stage(job)
+            except BaseException as error:
+                self.error = error
+                self.failed.set()
+                continue
+            if outputQueue is not None:
+                outputQueue.put(result)
+
+    def check(self):
+        # Raise the error of a failed processing or output stage, if any
+        if self.failed.is_set():
+            raise self.error
+
+    def submit(self, job):
+        # Blocks while the processing stage is behind
+        self.check()
+        self.processQueue.put(job)
+
+    def close(self, raise_error=True):
+        # Wait for all the submitted jobs to be processed and plotted
+        if self.started:
+            self.processQueue.put(_STOP)
+            for thread in self.threads:
+                thread.join()
+            self.started = False
+        if raise_error and self.error is not None:
+            raise self.error
+
+if __name__ == "__main__":
+    print("Standalone script not yet developed.")
@@ -0,0 +1,182 @@
+# Measurement schedules for the daemon mode: fixed interval, or cron-like expression
+import logging
+import signal
+import threading
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+MAX_WAIT_STEP_S = 60 # Sleeps are split in steps, so that clock adjustments (NTP) are followed.
+_CRON_FIELDS = (('minute', 0, 59), ('hour', 0, 23), ('day of month', 1, 31), ('month', 1, 12), ('day of week', 0, 7))
+
+class IntervalSchedule:
+    '''
+    One cycle every interval_s seconds, aligned to multiples of the interval (e.g. 900 s: at :00, :15, :30, :45).
+    '''
+    def __init__(self, interval_s: float):
+        if interval_s <= 0:
+            raise ValueError("Schedule interval should be greater than 0 s.")
+        self.interval_s = interval_s
+
+    def next_run(self, after: datetime):
+        '''
+        :return: First time of the schedule strictly after "after".
+        '''
+        elapsed_s = after.timestamp()
+        return datetime.fromtimestamp((elapsed_s // self.interval_s + 1) * self.interval_s)
+
+    def __str__(self):
+        return "every {:g} s".format(self.interval_s)
+
+def _cron_field(text: str, name: str, minimum: int, maximum: int):
+    # "*", "5", "1-5", "*/15", "0-30/10", and comma-separated lists of them
+    values = set()
+    for item in text.split(','):
+        rangeText, _, stepText = item.partition('/')
+        try:
+            step = int(stepText) if stepText else 1
+            if rangeText == '*':
+                start, stop = minimum, maximum
+            elif '-' in rangeText:
+                start, stop = (int(value) for value in rangeText.split('-', 1))
+            else:
+                start = int(rangeText)
+                stop = maximum if stepText else start
+        except ValueError:
+            raise ValueError("Invalid cron {} field: \"{}\".".format(name, text)) from None
+        if not (minimum <= start <= stop <= maximum) or step < 1:
+            raise ValueError("Invalid cron {} field: \"{}\" (allowed values: {:d}-{:d}).".format(name, text, minimum, maximum))
+        values.update(range(start, stop + 1, step))
+    return frozenset(values)
+
+class CronSchedule:
+    '''
+    Cron-like schedule: "minute hour day-of-month month day-of-week", e.g. "*/15 6-20 * * *".
+    Fields accept *, values, ranges, steps and lists. Day of week: 0 (or 7) is Sunday.
+    As in cron, when both day fields are restricted a day matching either of them is scheduled.
+    '''
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != len(_CRON_FIELDS):
+            raise ValueError("Cron expression \"{}\" should have 5 fields (minute hour day-of-month month day-of-week).".format(expression))
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, weekdays = (_cron_field(text, *field) for text, field in zip(fields, _CRON_FIELDS))
+        self.weekdays = frozenset(weekday % 7 for weekday in weekdays)
+        self.anyDay, self.anyWeekday = fields[2] == '*', fields[4] == '*'
+        self.next_run(datetime(2000, 1, 1)) # Never-matching expressions (e.g. 30th of February) fail here.
+
+    def _day_matches(self, time: datetime):
+        dayMatches = time.day in self.days
+        weekdayMatches = (time.weekday() + 1) % 7 in self.weekdays # Python: Monday is 0.
+        if self.anyDay or self.anyWeekday:
+            return dayMatches and weekdayMatches
+        return dayMatches or weekdayMatches
+
+    def next_run(self, after: datetime):
+        '''
+        :return: First time of the schedule strictly after "after" (whole minutes).
+        '''
+        time = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = time.replace(year=time.year + 5, day=1) # Leap days included.
+        while time < limit:
+            if time.month not in self.months:
+                time = (time.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(time):
+                time = time.replace(hour=0, minute=0) + timedelta(days=1)
+            elif time.hour not in self.hours:
+                time = time.replace(minute=0) + timedelta(hours=1)
+            elif time.minute not in self.minutes:
+                time += timedelta(minutes=1)
+            else:
+                return time
+        raise ValueError("Cron expression \"{}\" never matches.".format(self.expression))
+
+    def __str__(self):
+        return "cron \"{}\"".format(self.expression)
+
+def make_schedule(interval_s: float, cron: str = ''):
+    # The cron expression, if any, wins over the interval
+    if cron:
+        return CronSchedule(cron)
+    return IntervalSchedule(interval_s)
+
+class StopRequest:
+    '''
+    SIGTERM/SIGINT handling for a daemon: the first signal asks to stop after the current cycle
+    (the sleep between cycles is interrupted immediately), a second one interrupts the cycle as well.
+    '''
+    def __init__(self):
+        self.event = threading.Event()
+        self._previousHandlers = {}
+
+    def __enter__(self):
+        for signalNumber in (signal.SIGTERM, signal.SIGINT):
+            self._previousHandlers[signalNumber] = signal.signal(signalNumber, self._handler)
+        return self
+
+    def __exit__(self, *exc_info):
+        for signalNumber, handler in self._previousHandlers.items():
+            signal.signal(signalNumber, handler)
+        self._previousHandlers.clear()
+
+    def _handler(self, signalNumber, frame):
+        if self.event.is_set():
+            raise KeyboardInterrupt
+        logger.info("Stop requested (signal %d): exiting after the current cycle.", signalNumber)
+        self.event.set()
+
+    def is_set(self):
+        return self.event.is_set()
+
+    def wait_until(self, time: datetime):
+        '''
+        Sleep until the given (wall clock) time.
+        :return: False if a stop has been requested meanwhile.
+        '''
+        while not self.event.is_set():
+            remaining_s = (time - datetime.now()).total_seconds()
+            if remaining_s <= 0:
+                return True
+            self.event.wait(min(remaining_s, MAX_WAIT_STEP_S))
+        return False
+
+def run_forever(schedule, cycle, between_cycles=None, stopRequest=None, runNow=False):
+    '''
+    Run cycle() at every time of the schedule, until SIGTERM/SIGINT.
+    A failed cycle is reported and the daemon goes on with the next one. Cycles missed because
+    the previous one took too long are skipped, not queued.
+    between_cycles(), if given, runs after every cycle and may return a new schedule (e.g. after a settings reload).
+    If it fails, the failure is reported and the previous schedule is kept.
+    :return: Number of completed cycles.
+    '''
+    cycles = 0
+    with (stopRequest or StopRequest()) as stopRequest:
+        nextRun = datetime.now() if runNow else schedule.next_run(datetime.now())
+        while True:
+            logger.info("Next measurement cycle: %s (%s)", nextRun.strftime("%Y-%m-%d %H:%M:%S"), schedule)
+            if not stopRequest.wait_until(nextRun):
+                break
+            try:
+                cycle()
+                cycles += 1
+            except Exception:
+                logger.exception("measurement cycle failed.")
+            if between_cycles is not None:
+                try:
+                    schedule = between_cycles() or schedule
+                except Exception:
+                    logger.exception("reconfiguration between cycles failed: previous schedule kept.")
+            if stopRequest.is_set():
+                break
+            now = datetime.now()
+            missed = 0
+            nextRun = schedule.next_run(nextRun)
+            while nextRun <= now:
+                missed += 1
+                nextRun = schedule.next_run(nextRun)
+            if missed > 0:
+                logger.warning("%d scheduled cycle(s) skipped: the last cycle took longer than the schedule interval.", missed)
+    return cycles
+
+if __name__ == "__main__":
+    print("Standalone script not yet developed.")
@@ -1,132 +1,161 @@
 import numpy as np
-import itertools
-import re
+import io
+import logging
 import os
-import easygui
+import time
 import serial
 import sys
 sys.path.insert(1, ".")
 sys.path.insert(1, "../..")
-from custom_modules.signal_processing import FFT_parameters
-import json
+from custom_modules.instrumentation import instrumented
+from custom_modules.online_statistics import DirectionStatistics, shapiro_test
+from custom_modules.raw_capture import CAPTURE_EXTENSION, capture_extract, write_capture
 from datetime import datetime
 
-def load_settings():
-    # Load settings from *.json file.
-    with open('sense2gol_pizero/settings.json') as f:
-        settings = json.load(f)
-    
-    # Radar installation settings
-    HEIGHT_FROM_WATER_LEVEL = settings["radar-installation"]["height-from-water-level"] # meters.
-    TILT_ANGLE_DEG = settings["radar-installation"]["tilt-angle-deg"] # Degree.
-    tiltAngle_DEG_str = "tilt" + str("{0:.1f}".format(TILT_ANGLE_DEG)) + "deg"
-    ANTENNA_BEAM_WIDTH_ELEVATION = settings["radar-installation"]["antenna-beam-width-elevation"] # Degree.
-    ANTENNA_BEAM_WIDTH_AZIMUTH = settings["radar-installation"]["antenna-beam-width-azimuth"] # Degree.
-
-    # Sense2GoL settings
-    SAMPLING_FREQUENCY = float(settings["sense2gol"]["sampling-frequency-Hz"]) # Hz
-    print('Sampling frequency: {:.3e}'.format(SAMPLING_FREQUENCY) + ' Hz')
-    time_resolution = 1/SAMPLING_FREQUENCY # s
-    print('Time resolution: {:.3e}'.format(time_resolution) + ' s')
-    FRAMES = int(settings["sense2gol"]["number-of-frames"])
-    print("Number of frames (for each direction): ", FRAMES)
-    SAMPLES_PER_FRAME = int(settings["sense2gol"]["samples-per-frame"]) # To change this value, you must reprogram the Sense2GoL board.
-    print("Samples per frame (for each direction): ", SAMPLES_PER_FRAME)
-    EQ_ACQUISITION_TIME = 1/SAMPLING_FREQUENCY*SAMPLES_PER_FRAME*FRAMES
-    print("Equivalent acquisition time (for each direction): {:.3e} s".format(EQ_ACQUISITION_TIME))
-    OVERHEAD = int(settings["sense2gol"]["overhead"])
-    lines_to_be_read = int((FRAMES * 8 + 1 + 1) * 2 + OVERHEAD)
-    ADC_RANGE_BITS = int(2**settings["sense2gol"]["adc-resolution-bits"]) # Bits.
-    ADC_RANGE_V = settings["sense2gol"]["adc-range-v"] # Volts.
-
-    # Signal processing settings
-    COMPLEX_FFT = settings["signal-processing"]["complex-fft"] # Boolean. If True, the FFT of a complex signal (two-sided spectrum) is computed.
-    FFT_RESOL = settings["signal-processing"]["fft-resolution-Hz"] # Hz
-    SMOOTHING = settings["signal-processing"]["fft-smoothing"] # Boolean.
-    SMOOTHING_WINDOW = settings["signal-processing"]["smoothing-window-Hz"] # Hz. Smoothing of FFT spectrum done with moving average.
-    BANDWIDTH_THRESHOLD = settings["signal-processing"]["bandwidth-threshold-dB"] # dB. Parameter that defines the bandwidth of the Doppler centroid, with respect to the maximum value.
-    HANNING_WINDOWING = settings["signal-processing"]["hanning-windowing"] # Boolean. Enable Hanning windowing on samples before FFT computation.
-    ZERO_FORCING = settings["signal-processing"]["zero-forcing"] # Boolean. Enable forcing FFT to zero, everywhere except between FREQUENCY_MIN and FREQUENCY_MAX.
-    FREQUENCY_MIN = settings["signal-processing"]["frequency-min-Hz"] # Hz. Before that frequency, FFT forced to zero.
-    FREQUENCY_MAX = settings["signal-processing"]["frequency-max-Hz"] # Hz. After that frequency, FFT forced to zero.
-    PRINT_FFT_INFO = settings["signal-processing"]["print-fft-info"] # Boolean.
-    FFT_initialized, freqBins_FFT, smoothingBins, minBin, frequencyMin_fixed, maxBin, frequencyMax_fixed = FFT_parameters(COMPLEX_FFT, SAMPLING_FREQUENCY, FFT_RESOL, SMOOTHING, SMOOTHING_WINDOW, FREQUENCY_MIN, FREQUENCY_MAX, PRINT_FFT_INFO)
-    OFFSET_REMOVAL = settings["signal-processing"]["offset-removal"] # Boolean.
-    SPECTROGRAM_ENABLED = settings["signal-processing"]["spectrogram-enabled"] # Boolean.
-    STFT_OVERLAPPING_SAMPLES = settings["signal-processing"]["stft-overlapping-samples"] # Number of samples.
-    STFT_SAMPLES_IN_SEGMENT = settings["signal-processing"]["stft-samples-in-segment"] # Number of samples.
-    STFT_BINS = settings["signal-processing"]["stft-bins"] # Number of bins.
-
-    # Raspberry Pi Zero settings
-    PWM_PIN = settings["raspberry-pi-zero"]["pwm-board-pin"] # Board pin number.
-    PWM_FREQUENCY = settings["raspberry-pi-zero"]["pwm-frequency"] # 50 Hz default.
-    RAW_DATA = settings["raspberry-pi-zero"]["raw-data"] # Boolean. Data stored in *.txt files.
-    SHOW_FIGURE = settings["raspberry-pi-zero"]["show-figure"] # Boolean. Disable if running on Raspberry Pi Zero without GUI.
-    SAVE_PLOTS = settings["raspberry-pi-zero"]["save-plots"] # Boolean. For each acquisition, the plots saved in PNG or PDF format.
-    PNG_PLOT = settings["raspberry-pi-zero"]["png-plot"] # Boolean.
-    PDF_PLOT = settings["raspberry-pi-zero"]["pdf-plot"] # Boolean. 
-    PLOT_PATH = settings["raspberry-pi-zero"]["plot-path"]
-    REALTIME_MEAS = settings["raspberry-pi-zero"]["realtime-measurements"] # Boolean. Real-time measurements of Doppler velocity.
-    TARGET_THRESHOLD = settings["raspberry-pi-zero"]["target-threshold-dBV"] # dBV. If FFT maximum is under this value, target not detected.
-    MIN_BEAM_ANGLE = settings["raspberry-pi-zero"]["min-beam-angle"] # Degree. Angle between broadside direction and beam direction.
-    MAX_BEAM_ANGLE = settings["raspberry-pi-zero"]["max-beam-angle"] # Degree. Angle between broadside direction and beam direction.
-    DIRECTIONS = settings["raspberry-pi-zero"]["directions"]
-    if DIRECTIONS == 1: # Only broadside direction
-        antennaBeamDirections_DEG = np.array([0])
-    else:
-        antennaBeamDirections_DEG = np.linspace(start=MIN_BEAM_ANGLE, stop=MAX_BEAM_ANGLE, num=DIRECTIONS, endpoint=True) # Degrees.
-
-    # Statistical analysis settings
-    STATISTICAL_ANALYSIS = settings["statistical-analysis"]["enabling"] # Boolean. Enable/disable statystical analysis.
-    EPISODES = int(settings["statistical-analysis"]["episodes-number"]) # Number of episodes for the statystical analysis.
-    if STATISTICAL_ANALYSIS == True:
-        assert (EPISODES>=3), "Number of episodes should be 3 at least. Please edit \"settings.json\"."
-    
-    return HEIGHT_FROM_WATER_LEVEL, ANTENNA_BEAM_WIDTH_ELEVATION, ANTENNA_BEAM_WIDTH_AZIMUTH, SAMPLING_FREQUENCY, lines_to_be_read, ADC_RANGE_BITS, ADC_RANGE_V, COMPLEX_FFT, SMOOTHING, BANDWIDTH_THRESHOLD, HANNING_WINDOWING, ZERO_FORCING, FFT_initialized, freqBins_FFT, smoothingBins, minBin, frequencyMin_fixed, maxBin, frequencyMax_fixed, OFFSET_REMOVAL, SPECTROGRAM_ENABLED, STFT_OVERLAPPING_SAMPLES, STFT_SAMPLES_IN_SEGMENT, STFT_BINS, PWM_PIN, PWM_FREQUENCY, RAW_DATA, SHOW_FIGURE, SAVE_PLOTS, PNG_PLOT, PDF_PLOT, PLOT_PATH, REALTIME_MEAS, TARGET_THRESHOLD, DIRECTIONS, antennaBeamDirections_DEG, TILT_ANGLE_DEG, tiltAngle_DEG_str, STATISTICAL_ANALYSIS, EPISODES
+logger = logging.getLogger(__name__)
+
+def load_settings(settingsFile='sense2gol_pizero/settings.json'):
+    # Legacy interface: same values as custom_modules.settings.get_settings(), as a tuple.
+    from custom_modules.settings import get_settings
+    settings = get_settings(settingsFile)
+    settings.print_summary()
+    installation, radar, platform = settings.installation, settings.radar, settings.platform
+    signalProcessing, statistics = settings.signalProcessing, settings.statistics
+    return (installation.heightFromWaterLevel_m, installation.antennaBeamWidthElevation_DEG, installation.antennaBeamWidthAzimuth_DEG, settings.samplingFrequency, radar.frames, radar.samplesPerFrame, settings.serialBufferSize, radar.serialTimeout_s, radar.serialPorts, radar.usbIds, radar.baudRate, settings.adcRangeBits, radar.adcRange_V,
+            settings.fftPlan, signalProcessing.spectrogramEnabled, signalProcessing.stftOverlappingSamples, signalProcessing.stftSamplesInSegment, signalProcessing.stftBins, platform.pwmPin, platform.pwmFrequency_Hz, platform.rawData, platform.rawDataFormat, platform.showFigure, platform.savePlots, platform.pngPlot, platform.pdfPlot, platform.plotPath,
+            platform.pipelinedScan, platform.asyncPlots, platform.plotBacklogPolicy, platform.importTimingReport, platform.realtimeMeasurements, platform.targetThreshold_dBV, platform.directions, settings.antennaBeamDirections_DEG, settings.tiltAngle_DEG, settings.tiltAngle_DEG_str, statistics.enabled, statistics.episodes)
+
+@instrumented('report')
+def write_report(completeFileName, FFT_dBV_peaks, centroid_frequencies, surface_velocities_table, antennaBeamDirections_DEG, REALTIME_MEAS, STATISTICAL_ANALYSIS, velocityStatistics=None):
+    # Report on *.txt file. Tables are (EPISODES, DIRECTIONS) arrays.
+    # velocityStatistics: DirectionStatistics updated during the scan; computed from the table if not given.
+    # The Shapiro-Wilk test covers every episode of the table, whatever the live normality window.
+    EPISODES, DIRECTIONS = surface_velocities_table.shape
+    with open(completeFileName,'w') as file:
+        if REALTIME_MEAS == True:
+            file.write('### SURFACE VELOCITY TABLE ###\n')
+            file.write('[EP.,\tDEG,\tdBV,\tHz,\tm/s]\n')
+            for episode in range(EPISODES):
+                for direction in range(DIRECTIONS):
+                    file.write('[{:d},\t'.format(episode+1))
+                    file.write('{:.1f},\t'.format(antennaBeamDirections_DEG[direction]))
+                    file.write('{:.1f},\t'.format(FFT_dBV_peaks[episode,direction]))
+                    file.write('{:.1f},\t'.format(centroid_frequencies[episode,direction]))
+                    file.write('{:.3f}]\n'.format(surface_velocities_table[episode,direction]))
+            if STATISTICAL_ANALYSIS == True:
+                if velocityStatistics is None:
+                    velocityStatistics = DirectionStatistics.from_table(surface_velocities_table, normalityWindow=0)
+                file.write('### STATISTICAL ANALYSIS (@ episode {:d} of {:d}) ###\n'.format(EPISODES, EPISODES))
+                file.write('[scanning angle, mean value, std.dev., S.W. test statistic, S.W. test p-value]\n')
+                file.write('[DEG,\tm/s,\tm/s,\tS.W.,\tp-value]\n')
+                for direction in range(DIRECTIONS):
+                    statistics = velocityStatistics[direction]
+                    shapiro_statistic, shapiro_pvalue = shapiro_test(surface_velocities_table[:, direction])
+                    file.write('[{:.1f},\t'.format(antennaBeamDirections_DEG[direction]))
+                    file.write('{:.3f},\t'.format(statistics.mean))
+                    file.write('{:.3f},\t'.format(statistics.std()))
+                    file.write('{:.3f},\t'.format(shapiro_statistic))
+                    file.write('{:.3f}]\n'.format(shapiro_pvalue))
+                file.write('### SURFACE VELOCITY QUANTILES ###\n')
+                file.write('[DEG,\tmin,\t' + ',\t'.join('P{:g}'.format(100*p) for p in velocityStatistics[0].quantiles) + ',\tmax] (m/s)\n')
+                for direction in range(DIRECTIONS):
+                    statistics = velocityStatistics[direction]
+                    file.write('[{:.1f},\t{:.3f},\t'.format(antennaBeamDirections_DEG[direction], statistics.minimum))
+                    for p in statistics.quantiles:
+                        file.write('{:.3f},\t'.format(statistics.quantile(p)))
+                    file.write('{:.3f}]\n'.format(statistics.maximum))
+    return completeFileName
+
+# Serial connection defaults
+DEFAULT_SERIAL_PORTS = ['/dev/ttyACM0']
+DEFAULT_BAUD_RATE = 128000
+# Serial reading: bytes requested for each bulk read, and maximum blocking time of each read
+SERIAL_CHUNK_BYTES = 4096
+SERIAL_READ_TIMEOUT = 0.5 # s
+# Upper bounds used to size the serial buffer
+MAX_BYTES_PER_SAMPLE = 6 # Up to 4 digits (12-bit ADC) plus separators.
+MAX_BYTES_PER_LINE = 80
+# Marker lines written by the Sense2GoL firmware before each block of samples
+I_SAMPLES_MARKER = b'  ------------- I raw samples ------------- \n'
+Q_SAMPLES_MARKER = b'  ------------- Q raw samples ------------- \n'
+# Every byte that is not a decimal digit is turned into a separator
+_NON_DIGITS_TO_SPACE = bytes(byte if 48 <= byte <= 57 else 32 for byte in range(256))
+
+class AcquisitionIncomplete(RuntimeError):
+    '''
+    Samples of some frames not received (serial timeout, buffer full or garbled dump): the acquisition should not be
+    processed as a valid one. fileName is the raw data file, saved anyway (None if no sample was received); report is
+    the acquisition report of serial_read().
+    '''
+    def __init__(self, fileName, report):
+        super().__init__("{:d} of {:d} frames lost or incomplete ({:d} I and {:d} Q samples of {:d}).".format(report['frames_lost'], report['frames_expected'], report['I_samples'], report['Q_samples'], report['expected_samples']))
+        self.fileName = fileName
+        self.report = report
+
+def _block_to_array(block):
+    # All the decimal numbers in a block of text, converted with a single NumPy call
+    return np.array(block.translate(_NON_DIGITS_TO_SPACE).split(), dtype=np.bytes_).astype(np.int64)
+
+@instrumented('parse')
+def txt_parse(text_file):
+    # Extract raw samples (ADC counts) from a Sense2GoL text dump, opened in binary mode.
+    # Samples are returned as labelled by the firmware ("I raw samples" blocks first).
+    # The first line is discarded (may be incomplete); everything before the first I marker is ignored.
+    # As in the original line-by-line parser, the line right after a Q marker always belongs to the Q block.
+    content = text_file.read()
+    firstLineEnd = content.find(b'\n')
+    # A leading newline lets every marker be searched as a full line
+    content = b'\n' + (content[firstLineEnd+1:] if firstLineEnd >= 0 else b'')
+    I_marker = b'\n' + I_SAMPLES_MARKER
+    Q_marker = b'\n' + Q_SAMPLES_MARKER
+    start = content.find(I_marker)
+    if start < 0:
+        raise ValueError("No I raw samples found in Sense2GoL text dump.")
+    I_blocks = []
+    Q_blocks = []
+    position = start + len(I_marker) - 1 # On the newline ending the I marker.
+    while True:
+        Q_start = content.find(Q_marker, position)
+        if Q_start < 0:
+            I_blocks.append(content[position:])
+            break
+        I_blocks.append(content[position:Q_start])
+        position = Q_start + len(Q_marker) # Start of the line after the Q marker.
+        I_start = content.find(I_marker, position)
+        if I_start < 0:
+            Q_blocks.append(content[position:])
+            break
+        Q_blocks.append(content[position:I_start])
+        position = I_start + len(I_marker) - 1
+    I_samples = _block_to_array(b' '.join(I_blocks))
+    Q_samples = _block_to_array(b' '.join(Q_blocks))
+    return I_samples, Q_samples
+
+def _iq_samples(I_samples, Q_samples):
+    '''
+    I and Q samples cut to the same length. Single-channel dump (real FFT): the missing channel is zero.
+    :return: I and Q samples, same length. ValueError if no sample of either channel was decoded.
+    '''
+    IQ_arrays_length = min(len(I_samples), len(Q_samples))
+    if IQ_arrays_length == 0:
+        IQ_arrays_length = max(len(I_samples), len(Q_samples))
+        if IQ_arrays_length == 0:
+            raise ValueError("No I nor Q samples decoded.")
+        I_samples = I_samples if len(I_samples) else np.zeros(IQ_arrays_length, dtype=np.int64)
+        Q_samples = Q_samples if len(Q_samples) else np.zeros(IQ_arrays_length, dtype=np.int64)
+    return I_samples[0:IQ_arrays_length], Q_samples[0:IQ_arrays_length]
 
 def txt_extract(file_name, ADC_RANGE_BITS, ADC_RANGE_V, SAMPLING_FREQUENCY):
     # Extract raw samples from txt file
-    text_file = open(file_name, 'rb')
-    temp_line = text_file.readline()
-    done = False
-    I_samples = []
-    Q_samples = []
-    # Locate I samples
-    temp_line = text_file.readline()
-    temp_line = temp_line.decode('ascii')
-    while temp_line != '  ------------- I raw samples ------------- \n':
-        temp_line = text_file.readline()
-        temp_line = temp_line.decode('ascii')
-
-    while not done:
-        if temp_line == '  ------------- I raw samples ------------- \n':
-            temp_line = text_file.readline()
-            temp_line = temp_line.decode('ascii')
-            while temp_line != '  ------------- Q raw samples ------------- \n':
-                temp_line_int = list(map(int, re.findall(r'\d+', temp_line)))
-                if temp_line_int != '\r\n':
-                    I_samples = list(itertools.chain(I_samples, temp_line_int))
-                temp_line = text_file.readline()
-                temp_line = temp_line.decode('ascii')
-                if temp_line == '':
-                    done = True
-                    break
-            if temp_line == '  ------------- Q raw samples ------------- \n':
-                temp_line = text_file.readline()
-                temp_line = temp_line.decode('ascii')
-        temp_line_int = list(map(int, re.findall(r'\d+', temp_line)))
-        if temp_line_int != '\r\n' and temp_line != '':
-            Q_samples = list(itertools.chain(Q_samples, temp_line_int))
-        temp_line = text_file.readline()
-        temp_line = temp_line.decode('ascii')
-        if temp_line == '':
-            done = True
-    print("Raw data extracted from .txt file.")
-    print("Number of IFI samples: ", len(I_samples))
-    print("Number of IFQ samples: ", len(Q_samples))
+    with open(file_name, 'rb') as text_file:
+        I_samples, Q_samples = txt_parse(text_file)
+    logger.debug("Raw data extracted from .txt file.")
+    logger.debug("Number of IFI samples: %d", len(I_samples))
+    logger.debug("Number of IFQ samples: %d", len(Q_samples))
 
-    IQ_arrays_length = min(len(I_samples), len(Q_samples))
-    print("Processed signals length: ", IQ_arrays_length)
+    I_samples, Q_samples = _iq_samples(I_samples, Q_samples)
+    IQ_arrays_length = len(I_samples)
+    logger.debug("Processed signals length: %d", IQ_arrays_length)
 
     # Seems that Q and I needs to be inverted
     Q_array = np.array(I_samples[0:IQ_arrays_length])
@@ -142,53 +171,228 @@ def txt_extract(file_name, ADC_RANGE_BITS, ADC_RANGE_V, SAMPLING_FREQUENCY):
 
     return I_array_mV, Q_array_mV, complexSignal_mV, timeAxis_s, IQ_arrays_length
 
-def txt_generate(serialDevice, lines_to_be_read, timestamp):
+def raw_extract(file_name, ADC_RANGE_BITS, ADC_RANGE_V, SAMPLING_FREQUENCY):
+    # Extract raw samples from either a binary capture or a legacy *.txt file
+    if file_name.endswith(CAPTURE_EXTENSION):
+        return capture_extract(file_name)
+    return txt_extract(file_name, ADC_RANGE_BITS, ADC_RANGE_V, SAMPLING_FREQUENCY)
+
+def serial_buffer_size(FRAMES, SAMPLES_PER_FRAME, OVERHEAD):
+    # Upper bound of the bytes sent by the Sense2GoL for one acquisition
+    return 2 * FRAMES * SAMPLES_PER_FRAME * MAX_BYTES_PER_SAMPLE + (4 + OVERHEAD) * MAX_BYTES_PER_LINE
+
+@instrumented('serial_wait')
+def serial_read(serialDevice, FRAMES, SAMPLES_PER_FRAME, serialBufferSize, SERIAL_TIMEOUT, onSamples=None):
+    '''
+    Read one acquisition from the serial port, blocking on bulk reads (no busy waiting).
+    Reading stops as soon as I and Q samples of all the frames have been received,
+    when the buffer is full, or after SERIAL_TIMEOUT seconds.
+    onSamples(firstSample, I_samples, Q_samples), if given, is called with the new I/Q pairs each time
+    the received lines are parsed, while the acquisition is still in progress.
+    :return: Received bytes, I and Q samples (ADC counts, as labelled by the firmware) and acquisition report.
+    '''
+    expectedSamples = FRAMES * SAMPLES_PER_FRAME
+    serialBuffer = bytearray(serialBufferSize)
+    bufferView = memoryview(serialBuffer)
+    received = 0
+    nextCheck = 0
+    Q_markerFound = False
+    complete = False
+    I_samples = Q_samples = np.zeros(0, dtype=np.int64)
+    delivered = 0 # I/Q pairs passed to onSamples
+    previousTimeout = serialDevice.timeout
+    startTime = time.monotonic()
+    deadline = startTime + SERIAL_TIMEOUT
+    try:
+        while received < serialBufferSize:
+            remainingTime = deadline - time.monotonic()
+            if remainingTime <= 0:
+                break
+            serialDevice.timeout = min(remainingTime, SERIAL_READ_TIMEOUT)
+            chunk = serialDevice.read(min(SERIAL_CHUNK_BYTES, serialBufferSize - received))
+            if chunk:
+                bufferView[received:received+len(chunk)] = chunk
+                searchStart = max(0, received - len(Q_SAMPLES_MARKER))
+                received += len(chunk)
+                if not Q_markerFound:
+                    Q_markerFound = serialBuffer.find(Q_SAMPLES_MARKER, searchStart, received) >= 0
+            # Samples are counted only once the Q block has started, and with a growing stride
+            # (or when the device goes quiet), so that the cost of parsing stays linear.
+            if Q_markerFound and (received >= nextCheck or not chunk):
+                I_samples, Q_samples = _parse_complete_lines(serialBuffer, received)
+                delivered = _deliver_samples(onSamples, I_samples, Q_samples, delivered)
+                if min(len(I_samples), len(Q_samples)) >= expectedSamples:
+                    complete = True
+                    break
+                nextCheck = received + max(SERIAL_CHUNK_BYTES, received // 4)
+    finally:
+        serialDevice.timeout = previousTimeout
+    if not complete:
+        I_samples, Q_samples = _parse_complete_lines(serialBuffer, received)
+        _deliver_samples(onSamples, I_samples, Q_samples, delivered)
+    elapsedTime = time.monotonic() - startTime
+
+    receivedSamples = min(len(I_samples), len(Q_samples))
+    completeFrames = min(receivedSamples // SAMPLES_PER_FRAME, FRAMES)
+    report = {'bytes': received,
+              'elapsed_s': elapsedTime,
+              'expected_samples': expectedSamples,
+              'I_samples': len(I_samples),
+              'Q_samples': len(Q_samples),
+              'frames_expected': FRAMES,
+              'frames_complete': completeFrames,
+              'frames_lost': FRAMES - completeFrames,
+              'short_frame_samples': receivedSamples - completeFrames * SAMPLES_PER_FRAME if completeFrames < FRAMES else 0,
+              'timed_out': not complete and received < serialBufferSize,
+              'buffer_full': not complete and received >= serialBufferSize}
+    logger.debug("Raw data acquisition completed: %d bytes in %.3f s.", received, elapsedTime)
+    if report['frames_lost'] > 0:
+        logger.warning("%d of %d frames lost or incomplete (%d samples in the last short frame).", report['frames_lost'], FRAMES, report['short_frame_samples'])
+        if report['timed_out']:
+            logger.warning("serial timeout (%.1f s) expired.", SERIAL_TIMEOUT)
+        if report['buffer_full']:
+            logger.warning("serial buffer full (%d bytes).", serialBufferSize)
+    return bufferView[:received], I_samples, Q_samples, report
+
+def _deliver_samples(onSamples, I_samples, Q_samples, delivered):
+    # Pass the I/Q pairs parsed since the last call to onSamples. :return: pairs delivered so far.
+    available = min(len(I_samples), len(Q_samples))
+    if onSamples is not None and available > delivered:
+        onSamples(delivered, I_samples[delivered:available], Q_samples[delivered:available])
+        return available
+    return delivered
+
+def _parse_complete_lines(serialBuffer, received):
+    # Parse samples up to the last complete line (a number may still be arriving)
+    lastLineEnd = serialBuffer.rfind(b'\n', 0, received)
+    try:
+        return txt_parse(io.BytesIO(memoryview(serialBuffer)[:lastLineEnd+1]))
+    except ValueError: # I samples not received yet
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+def txt_generate(serialDevice, FRAMES, SAMPLES_PER_FRAME, serialBufferSize, SERIAL_TIMEOUT, timestamp, onSamples=None):
     samplesFileName = timestamp + ".txt"
     completeFileName = os.path.join('sense2gol_pizero/output',samplesFileName)
-    # open text file to store the current
-    text_file = open(completeFileName, 'wb')
-    # read serial data and write it to the text file
-    index = 0
-    print("Acquisition started...")
-    while index <= lines_to_be_read:
-        if serialDevice.inWaiting():
-            x=serialDevice.readline()
-            text_file.write(x)
-            if x=="\n":
-                text_file.seek(0)
-                text_file.truncate()
-            text_file.flush()
-        index += 1
-    print("Raw data acquisition completed.")
-    # close the serial connection and text file
-    text_file.close()
+    logger.debug("Acquisition started...")
+    serialData, I_samples, Q_samples, report = serial_read(serialDevice, FRAMES, SAMPLES_PER_FRAME, serialBufferSize, SERIAL_TIMEOUT, onSamples)
+    # write serial data to the text file
+    with open(completeFileName, 'wb') as text_file:
+        text_file.write(serialData)
+    if report['frames_lost'] > 0:
+        raise AcquisitionIncomplete(completeFileName, report)
     return completeFileName
 
-def serialPort_acquisition(tiltAngle_DEG_str, episode, EPISODES, direction_DEG_str, lines_to_be_read):
-    # Boolean variable that will represent 
-    # whether or not the Sense2GoL is connected
-    connected = False
-    # Establish connection to the serial port that your Sense2GoL 
-    # is connected to.
-    LOCATIONS=['/dev/ttyACM0']
-    for device in LOCATIONS:
-        try:
-            print("Trying...",device)
-            S2GL = serial.Serial(device, 128000)
-            break
-        except:
-            print("Failed to connect on ", device)
+def bin_generate(serialDevice, FRAMES, SAMPLES_PER_FRAME, serialBufferSize, SERIAL_TIMEOUT, timestamp, SAMPLING_FREQUENCY, ADC_RANGE_BITS, ADC_RANGE_V, tiltAngle_DEG=float('nan'), direction_DEG=float('nan'), episode=0, EPISODES=1, onSamples=None):
+    samplesFileName = timestamp + CAPTURE_EXTENSION
+    completeFileName = os.path.join('sense2gol_pizero/output',samplesFileName)
+    logger.debug("Acquisition started...")
+    serialData, I_samples, Q_samples, report = serial_read(serialDevice, FRAMES, SAMPLES_PER_FRAME, serialBufferSize, SERIAL_TIMEOUT, onSamples)
+    if len(I_samples) == 0 and len(Q_samples) == 0:
+        raise AcquisitionIncomplete(None, report)
+    I_samples, Q_samples = _iq_samples(I_samples, Q_samples)
+    # Seems that Q and I needs to be inverted (same as txt_extract)
+    write_capture(completeFileName, Q_samples, I_samples, SAMPLING_FREQUENCY, ADC_RANGE_BITS, ADC_RANGE_V, ADC_RANGE_V,
+                  tiltAngle_DEG=tiltAngle_DEG, direction_DEG=direction_DEG, episode=episode, episodes=EPISODES, label=timestamp)
+    if report['frames_lost'] > 0:
+        raise AcquisitionIncomplete(completeFileName, report)
+    return completeFileName
 
-    # Loop until the Sense2GoL tells us it is ready
-    while not connected:
-        serin = S2GL.read()
-        connected = True
+def acquisition_label(tiltAngle_DEG_str, episode, EPISODES, direction_DEG_str):
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
     episode_str = "episode" + str(episode+1) + "of" + str(EPISODES)
-    raw_data_label = timestamp + "__" + tiltAngle_DEG_str + "__" + episode_str + "__" + direction_DEG_str
-    completeFileName = txt_generate(S2GL, lines_to_be_read, raw_data_label)
-    S2GL.close()
-    return completeFileName
+    return timestamp + "__" + tiltAngle_DEG_str + "__" + episode_str + "__" + direction_DEG_str
+
+class Sense2GoLSession:
+    '''
+    Long-lived serial connection to the Sense2GoL.
+    The device is discovered once (USB VID:PID first, then the list of ports), the port stays
+    open for the whole scan, and it is reopened automatically after a disconnection.
+    '''
+    def __init__(self, SERIAL_PORTS=DEFAULT_SERIAL_PORTS, USB_IDS=(), BAUD_RATE=DEFAULT_BAUD_RATE, HANDSHAKE_TIMEOUT=5.0, RECONNECT_ATTEMPTS=3, RECONNECT_DELAY=1.0):
+        self.SERIAL_PORTS = list(SERIAL_PORTS)
+        self.USB_IDS = [tuple(int(value, 16) for value in usbId.split(':')) for usbId in USB_IDS] # "VID:PID" strings, hexadecimal.
+        self.BAUD_RATE = BAUD_RATE
+        self.HANDSHAKE_TIMEOUT = HANDSHAKE_TIMEOUT
+        self.RECONNECT_ATTEMPTS = RECONNECT_ATTEMPTS
+        self.RECONNECT_DELAY = RECONNECT_DELAY
+        self.device = None
+        self.port = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def discover(self):
+        # Candidate ports: devices matching the USB IDs, then the configured list
+        candidates = []
+        if self.USB_IDS:
+            from serial.tools import list_ports
+            for portInfo in list_ports.comports():
+                if (portInfo.vid, portInfo.pid) in self.USB_IDS:
+                    candidates.append(portInfo.device)
+        if self.port is not None and self.port not in candidates:
+            candidates.insert(0, self.port) # Last port that worked.
+        candidates.extend(port for port in self.SERIAL_PORTS if port not in candidates)
+        return candidates
+
+    def open(self):
+        if self.device is not None:
+            return self.device
+        for port in self.discover():
+            try:
+                logger.info("Trying... %s", port)
+                device = serial.Serial(port, self.BAUD_RATE, timeout=self.HANDSHAKE_TIMEOUT)
+            except (serial.SerialException, OSError):
+                logger.info("Failed to connect on %s", port)
+                continue
+            # Wait until the Sense2GoL tells us it is ready
+            if len(device.read()) == 0:
+                logger.info("No data from %s", port)
+                device.close()
+                continue
+            logger.info("Connected to Sense2GoL on %s", port)
+            self.device = device
+            self.port = port
+            return device
+        raise serial.SerialException("Sense2GoL not found. Tried: " + ", ".join(self.discover()))
+
+    def close(self):
+        if self.device is not None:
+            try:
+                self.device.close()
+            except (serial.SerialException, OSError):
+                pass
+            self.device = None
+
+    def acquire(self, tiltAngle_DEG_str, episode, EPISODES, direction_DEG_str, FRAMES, SAMPLES_PER_FRAME, serialBufferSize, SERIAL_TIMEOUT, RAW_DATA_FORMAT='txt', SAMPLING_FREQUENCY=None, ADC_RANGE_BITS=None, ADC_RANGE_V=None, tiltAngle_DEG=float('nan'), direction_DEG=float('nan'), onSamples=None):
+        # Raw data file name. AcquisitionIncomplete if frames were lost (not retried: the device answered).
+        # onSamples: see serial_read(). A reconnection restarts it from the first sample.
+        for attempt in range(self.RECONNECT_ATTEMPTS + 1):
+            try:
+                S2GL = self.open()
+                # Discard what the Sense2GoL sent while the servo was moving
+                S2GL.reset_input_buffer()
+                raw_data_label = acquisition_label(tiltAngle_DEG_str, episode, EPISODES, direction_DEG_str)
+                if RAW_DATA_FORMAT == 'bin':
+                    return bin_generate(S2GL, FRAMES, SAMPLES_PER_FRAME, serialBufferSize, SERIAL_TIMEOUT, raw_data_label, SAMPLING_FREQUENCY, ADC_RANGE_BITS, ADC_RANGE_V, tiltAngle_DEG, direction_DEG, episode, EPISODES, onSamples)
+                return txt_generate(S2GL, FRAMES, SAMPLES_PER_FRAME, serialBufferSize, SERIAL_TIMEOUT, raw_data_label, onSamples)
+            except (serial.SerialException, OSError) as error:
+                logger.warning("serial connection error (%s).", error)
+                self.close()
+                if attempt == self.RECONNECT_ATTEMPTS:
+                    raise
+                logger.info("Reconnecting in %.1f s (attempt %d of %d)...", self.RECONNECT_DELAY, attempt+1, self.RECONNECT_ATTEMPTS)
+                time.sleep(self.RECONNECT_DELAY)
+
+def serialPort_acquisition(tiltAngle_DEG_str, episode, EPISODES, direction_DEG_str, FRAMES, SAMPLES_PER_FRAME, serialBufferSize, SERIAL_TIMEOUT, RAW_DATA_FORMAT='txt', SAMPLING_FREQUENCY=None, ADC_RANGE_BITS=None, ADC_RANGE_V=None, tiltAngle_DEG=float('nan'), direction_DEG=float('nan'), session=None):
+    # Single acquisition. Without a session, the port is opened and closed just for this acquisition.
+    if session is not None:
+        return session.acquire(tiltAngle_DEG_str, episode, EPISODES, direction_DEG_str, FRAMES, SAMPLES_PER_FRAME, serialBufferSize, SERIAL_TIMEOUT, RAW_DATA_FORMAT, SAMPLING_FREQUENCY, ADC_RANGE_BITS, ADC_RANGE_V, tiltAngle_DEG, direction_DEG)
+    with Sense2GoLSession(RECONNECT_ATTEMPTS=0) as session:
+        return session.acquire(tiltAngle_DEG_str, episode, EPISODES, direction_DEG_str, FRAMES, SAMPLES_PER_FRAME, serialBufferSize, SERIAL_TIMEOUT, RAW_DATA_FORMAT, SAMPLING_FREQUENCY, ADC_RANGE_BITS, ADC_RANGE_V, tiltAngle_DEG, direction_DEG)
 
 if __name__ == "__main__":
     print("Standalone script not yet developed.")
@@ -20,6 +20,13 @@ def rotate_servo_to_angle(servoMotor, beamAngle: float):
     servoMotor.ChangeDutyCycle(0) # To avoid servo jitter.
     
 
+def sleep_servo(servoMotor):
+    # Between measurement cycles (daemon mode): PWM thread stopped, pin kept.
+    servoMotor.stop()
+
+def wake_up_servo(servoMotor):
+    servoMotor.start(0)
+
 def shut_down_servo(servoMotor):
     servoMotor.stop()
     # GPIO.cleanup() # Execute only once servo motor has been disconnected.
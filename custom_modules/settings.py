@@ -0,0 +1,536 @@
+# Settings (*.json) loaded into typed, validated sections, with the derived quantities computed once.
+#
+# Two layouts are supported: Sense2GoL (sense2gol_pizero/settings.json) and PicoScope (unipg_prototype/settings.json).
+# Every section is a frozen dataclass; the schema of each section lists, for every field, the JSON key, the type,
+# the default value (for keys added after the first release, missing in older snapshots) and an optional check.
+import logging
+import os
+import sys
+from dataclasses import dataclass
+import numpy as np
+sys.path.insert(1, ".")
+from custom_modules.instrumentation import DEFAULT_METRICS_FILE_BACKUPS, DEFAULT_METRICS_FILE_MAX_BYTES
+from custom_modules.logging_setup import DEFAULT_LOG_LEVEL, LOG_LEVELS, parse_module_levels
+from custom_modules.online_statistics import DEFAULT_NORMALITY_WINDOW
+from custom_modules.plot_worker import PLOT_BACKLOG_POLICIES
+from custom_modules.scheduler import CronSchedule
+from custom_modules.signal_processing import CENTROID_METHODS, FFT_CHANNELS, SPECTRUM_MODES, WELCH_WINDOWS, FFTPlan
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS_FILE = 'sense2gol_pizero/settings.json'
+RAW_DATA_FORMATS = ('bin', 'txt')
+PICOSCOPE_CHANNEL_RANGES_V = (20e-3, 50e-3, 100e-3, 200e-3, 500e-3, 1, 2, 5, 10, 20)
+_REQUIRED = object()
+
+class SettingsError(ValueError):
+    '''
+    Invalid settings file. The message lists every problem found.
+    '''
+
+def _at_least(minimum):
+    return lambda value: None if value >= minimum else "should be at least {}".format(minimum)
+
+def _greater_than(minimum):
+    return lambda value: None if value > minimum else "should be greater than {}".format(minimum)
+
+def _in_range(minimum, maximum):
+    return lambda value: None if minimum <= value <= maximum else "should be between {} and {}".format(minimum, maximum)
+
+def _one_of(*values):
+    return lambda value: None if value in values else "should be one of: " + ", ".join(str(value) for value in values)
+
+def _cron_expression(value):
+    if value == '':
+        return None
+    try:
+        CronSchedule(value)
+    except ValueError as error:
+        return str(error)
+
+def _module_levels(value):
+    try:
+        parse_module_levels(value)
+    except ValueError as error:
+        return str(error)
+
+def _type_error(value, expectedType):
+    # bool is a subclass of int: never accepted as a number
+    if expectedType is float:
+        valid = isinstance(value, (int, float)) and not isinstance(value, bool)
+    elif expectedType is int:
+        valid = isinstance(value, int) and not isinstance(value, bool)
+    elif expectedType is list:
+        valid = isinstance(value, list) and all(isinstance(item, str) for item in value)
+    else:
+        valid = isinstance(value, expectedType)
+    if valid:
+        return None
+    return "expected {}, found {!r}".format('list of strings' if expectedType is list else expectedType.__name__, value)
+
+def _load_section(sectionClass, settings: dict, sectionKey: str, errors: list, optional: bool = False):
+    '''
+    Build a section from its JSON block, following sectionClass._SCHEMA.
+    Problems are appended to errors. Keys ending with "comment" or "info" are notes, not settings.
+    An optional section may be missing: defaults are used.
+    :return: The section, or None if the block is missing or invalid.
+    '''
+    block = settings.get(sectionKey, {} if optional else None)
+    if not isinstance(block, dict):
+        errors.append("\"{}\": section missing".format(sectionKey))
+        return None
+    values = {}
+    for fieldName, key, expectedType, default, check in sectionClass._SCHEMA:
+        value = block.get(key, default)
+        if value is _REQUIRED:
+            errors.append("\"{}\" / \"{}\": missing".format(sectionKey, key))
+            continue
+        if value is None and default is None: # Optional setting, not used by this platform
+            values[fieldName] = None
+            continue
+        message = _type_error(value, expectedType)
+        if message is None and check is not None:
+            message = check(value)
+        if message is not None:
+            errors.append("\"{}\" / \"{}\": {}".format(sectionKey, key, message))
+            continue
+        values[fieldName] = float(value) if expectedType is float else value
+    knownKeys = set(entry[1] for entry in sectionClass._SCHEMA)
+    for key in block:
+        if key not in knownKeys and not key.endswith(('comment', 'info')):
+            errors.append("\"{}\" / \"{}\": unknown setting".format(sectionKey, key))
+    if len(values) < len(sectionClass._SCHEMA):
+        return None
+    return sectionClass(**values)
+
+class _Section:
+    # Frozen dataclasses with __slots__ can't be unpickled through setattr (e.g. when sent to worker processes)
+    __slots__ = ()
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            object.__setattr__(self, name, value)
+
+@dataclass(frozen=True)
+class InstallationSettings(_Section):
+    __slots__ = ('heightFromWaterLevel_m', 'tiltAngle_DEG', 'antennaBeamWidthElevation_DEG', 'antennaBeamWidthAzimuth_DEG')
+    heightFromWaterLevel_m: float
+    tiltAngle_DEG: float
+    antennaBeamWidthElevation_DEG: float
+    antennaBeamWidthAzimuth_DEG: float
+    _SCHEMA = (('heightFromWaterLevel_m', 'height-from-water-level-m', float, _REQUIRED, _at_least(0)),
+               ('tiltAngle_DEG', 'tilt-angle-deg', float, _REQUIRED, _in_range(0, 90)),
+               ('antennaBeamWidthElevation_DEG', 'antenna-beam-width-elevation-deg', float, _REQUIRED, _in_range(0, 180)),
+               ('antennaBeamWidthAzimuth_DEG', 'antenna-beam-width-azimuth-deg', float, _REQUIRED, _in_range(0, 180)))
+
+@dataclass(frozen=True)
+class MountingSupportSettings(_Section):
+    __slots__ = ('pivotHeight_m', 'waterVerticalDistance_m', 'rxAntennaOffset_m')
+    pivotHeight_m: float
+    waterVerticalDistance_m: float
+    rxAntennaOffset_m: float
+    _SCHEMA = (('pivotHeight_m', 'pivot-height-m', float, _REQUIRED, _at_least(0)),
+               ('waterVerticalDistance_m', 'water-vertical-distance-m', float, _REQUIRED, _at_least(0)),
+               ('rxAntennaOffset_m', 'rx-antenna-offset-m', float, _REQUIRED, None))
+
+@dataclass(frozen=True)
+class AntennaSettings(_Section):
+    __slots__ = ('minSquintAngle_DEG', 'maxSquintAngle_DEG', 'freqMinSquint_Hz', 'freqMaxSquint_Hz')
+    minSquintAngle_DEG: float
+    maxSquintAngle_DEG: float
+    freqMinSquint_Hz: float
+    freqMaxSquint_Hz: float
+    _SCHEMA = (('minSquintAngle_DEG', 'min-squint-angle-deg', float, _REQUIRED, _in_range(-90, 90)),
+               ('maxSquintAngle_DEG', 'max-squint-angle-deg', float, _REQUIRED, _in_range(-90, 90)),
+               ('freqMinSquint_Hz', 'freq-min-squint-hz', float, _REQUIRED, _greater_than(0)),
+               ('freqMaxSquint_Hz', 'freq-max-squint-hz', float, _REQUIRED, _greater_than(0)))
+
+@dataclass(frozen=True)
+class AccelerometerSettings(_Section):
+    __slots__ = ('averages', 'xMin', 'xMax', 'yMin', 'yMax', 'zMin', 'zMax', 'repeatMeasurement')
+    averages: int
+    xMin: int
+    xMax: int
+    yMin: int
+    yMax: int
+    zMin: int
+    zMax: int
+    repeatMeasurement: bool
+    _SCHEMA = (('averages', 'averages', int, _REQUIRED, _at_least(1)),
+               ('xMin', 'x-min', int, _REQUIRED, None), ('xMax', 'x-max', int, _REQUIRED, None),
+               ('yMin', 'y-min', int, _REQUIRED, None), ('yMax', 'y-max', int, _REQUIRED, None),
+               ('zMin', 'z-min', int, _REQUIRED, None), ('zMax', 'z-max', int, _REQUIRED, None),
+               ('repeatMeasurement', 'repeat-measurement', bool, _REQUIRED, None))
+
+@dataclass(frozen=True)
+class Sense2GoLSettings(_Section):
+    __slots__ = ('samplingFrequency_Hz', 'frames', 'samplesPerFrame', 'overhead', 'serialTimeout_s', 'serialPorts', 'usbIds', 'baudRate', 'adcResolutionBits', 'adcRange_V')
+    samplingFrequency_Hz: float
+    frames: int
+    samplesPerFrame: int
+    overhead: int
+    serialTimeout_s: float
+    serialPorts: list
+    usbIds: list
+    baudRate: int
+    adcResolutionBits: int
+    adcRange_V: float
+    _SCHEMA = (('samplingFrequency_Hz', 'sampling-frequency-Hz', float, _REQUIRED, _greater_than(0)),
+               ('frames', 'number-of-frames', int, _REQUIRED, _at_least(1)),
+               ('samplesPerFrame', 'samples-per-frame', int, _REQUIRED, _at_least(1)),
+               ('overhead', 'overhead', int, _REQUIRED, _at_least(0)),
+               ('serialTimeout_s', 'serial-timeout-s', float, 5.0, _greater_than(0)),
+               ('serialPorts', 'serial-ports', list, ['/dev/ttyACM0'], None),
+               ('usbIds', 'usb-vid-pid', list, [], None),
+               ('baudRate', 'baud-rate', int, 128000, _greater_than(0)),
+               ('adcResolutionBits', 'adc-resolution-bits', int, _REQUIRED, _in_range(1, 16)),
+               ('adcRange_V', 'adc-range-v', float, _REQUIRED, _greater_than(0)))
+
+@dataclass(frozen=True)
+class PicoScopeSettings(_Section):
+    __slots__ = ('acquisitionTime_s', 'samplingFrequency_Hz', 'channelARange_V', 'channelBRange_V', 'triggerDelay_s')
+    acquisitionTime_s: float
+    samplingFrequency_Hz: float
+    channelARange_V: float
+    channelBRange_V: float
+    triggerDelay_s: float
+    _SCHEMA = (('acquisitionTime_s', 'acquisition-time-s', float, _REQUIRED, _greater_than(0)),
+               ('samplingFrequency_Hz', 'sampling-frequency-Hz', float, _REQUIRED, _greater_than(0)),
+               ('channelARange_V', 'channel-a-range-v', float, _REQUIRED, _one_of(*PICOSCOPE_CHANNEL_RANGES_V)),
+               ('channelBRange_V', 'channel-b-range-v', float, _REQUIRED, _one_of(*PICOSCOPE_CHANNEL_RANGES_V)),
+               ('triggerDelay_s', 'trigger-delay-s', float, _REQUIRED, _at_least(0)))
+
+@dataclass(frozen=True)
+class SignalProcessingSettings(_Section):
+    __slots__ = ('complexFFT', 'fftChannel', 'spectrumMode', 'welchSegmentSamples', 'welchOverlapSamples', 'welchWindow', 'streamChunkSamples', 'fftResolution_Hz', 'fftSmoothing', 'smoothingWindow_Hz', 'bandwidthThreshold_dB', 'centroidMethod', 'contiguousBand', 'hanningWindowing', 'zeroForcing',
+                 'frequencyMin_Hz', 'frequencyMax_Hz', 'printFFTInfo', 'offsetRemoval', 'spectrogramEnabled', 'stftOverlappingSamples', 'stftSamplesInSegment', 'stftBins')
+    complexFFT: bool
+    fftChannel: str
+    spectrumMode: str
+    welchSegmentSamples: int
+    welchOverlapSamples: int
+    welchWindow: str
+    streamChunkSamples: int
+    fftResolution_Hz: float
+    fftSmoothing: bool
+    smoothingWindow_Hz: float
+    bandwidthThreshold_dB: float
+    centroidMethod: str
+    contiguousBand: bool
+    hanningWindowing: bool
+    zeroForcing: bool
+    frequencyMin_Hz: float
+    frequencyMax_Hz: float
+    printFFTInfo: bool
+    offsetRemoval: bool
+    spectrogramEnabled: bool
+    stftOverlappingSamples: int
+    stftSamplesInSegment: int
+    stftBins: int
+    _SCHEMA = (('complexFFT', 'complex-fft', bool, _REQUIRED, None),
+               ('fftChannel', 'fft-channel', str, 'I', _one_of(*FFT_CHANNELS)),
+               ('spectrumMode', 'spectrum-mode', str, 'fft', _one_of(*SPECTRUM_MODES)),
+               ('welchSegmentSamples', 'welch-segment-samples', int, 1024, _at_least(2)),
+               ('welchOverlapSamples', 'welch-overlap-samples', int, 512, _at_least(0)),
+               ('welchWindow', 'welch-window', str, 'hamming', _one_of(*WELCH_WINDOWS)),
+               ('streamChunkSamples', 'stream-chunk-samples', int, 0, _at_least(0)),
+               ('fftResolution_Hz', 'fft-resolution-Hz', float, _REQUIRED, _greater_than(0)),
+               ('fftSmoothing', 'fft-smoothing', bool, _REQUIRED, None),
+               ('smoothingWindow_Hz', 'smoothing-window-Hz', float, _REQUIRED, _at_least(0)),
+               ('bandwidthThreshold_dB', 'bandwidth-threshold-dB', float, _REQUIRED, _greater_than(0)),
+               ('centroidMethod', 'centroid-method', str, 'band-center', _one_of(*CENTROID_METHODS)),
+               ('contiguousBand', 'centroid-contiguous-band', bool, False, None),
+               ('hanningWindowing', 'hanning-windowing', bool, _REQUIRED, None),
+               ('zeroForcing', 'zero-forcing', bool, _REQUIRED, None),
+               ('frequencyMin_Hz', 'frequency-min-Hz', float, _REQUIRED, None),
+               ('frequencyMax_Hz', 'frequency-max-Hz', float, _REQUIRED, None),
+               ('printFFTInfo', 'print-fft-info', bool, _REQUIRED, None),
+               ('offsetRemoval', 'offset-removal', bool, _REQUIRED, None),
+               ('spectrogramEnabled', 'spectrogram-enabled', bool, False, None),
+               ('stftOverlappingSamples', 'stft-overlapping-samples', int, 0, _at_least(0)),
+               ('stftSamplesInSegment', 'stft-samples-in-segment', int, 256, _at_least(1)),
+               ('stftBins', 'stft-bins', int, 1024, _at_least(1)))
+
+@dataclass(frozen=True)
+class PlatformSettings(_Section):
+    __slots__ = ('pwmPin', 'pwmFrequency_Hz', 'measureTiltAngle', 'rawData', 'rawDataFormat', 'showFigure', 'savePlots', 'pngPlot', 'pdfPlot', 'plotPath', 'pipelinedScan', 'asyncPlots', 'plotBacklogPolicy',
+                 'importTimingReport', 'realtimeMeasurements', 'targetThreshold_dBV', 'minBeamAngle_DEG', 'maxBeamAngle_DEG', 'directions', 'scheduleInterval_s', 'scheduleCron', 'resultsDatabase',
+                 'metricsFile', 'metricsFileMaxBytes', 'metricsFileBackups', 'metricsPort', 'metricsAddress', 'logLevel', 'logModuleLevels', 'logFile')
+    pwmPin: int
+    pwmFrequency_Hz: float
+    measureTiltAngle: bool
+    rawData: bool
+    rawDataFormat: str
+    showFigure: bool
+    savePlots: bool
+    pngPlot: bool
+    pdfPlot: bool
+    plotPath: str
+    pipelinedScan: bool
+    asyncPlots: bool
+    plotBacklogPolicy: str
+    importTimingReport: bool
+    realtimeMeasurements: bool
+    targetThreshold_dBV: float
+    minBeamAngle_DEG: float
+    maxBeamAngle_DEG: float
+    directions: int
+    scheduleInterval_s: float
+    scheduleCron: str
+    resultsDatabase: str
+    metricsFile: str
+    metricsFileMaxBytes: int
+    metricsFileBackups: int
+    metricsPort: int
+    metricsAddress: str
+    logLevel: str
+    logModuleLevels: list
+    logFile: str
+    _SCHEMA = (('pwmPin', 'pwm-board-pin', int, None, _in_range(1, 40)),
+               ('pwmFrequency_Hz', 'pwm-frequency', float, None, _greater_than(0)),
+               ('measureTiltAngle', 'measure-tilt-angle', bool, False, None),
+               ('rawData', 'raw-data', bool, _REQUIRED, None),
+               ('rawDataFormat', 'raw-data-format', str, 'txt', _one_of(*RAW_DATA_FORMATS)),
+               ('showFigure', 'show-figure', bool, _REQUIRED, None),
+               ('savePlots', 'save-plots', bool, _REQUIRED, None),
+               ('pngPlot', 'png-plot', bool, _REQUIRED, None),
+               ('pdfPlot', 'pdf-plot', bool, _REQUIRED, None),
+               ('plotPath', 'plot-path', str, _REQUIRED, None),
+               ('pipelinedScan', 'pipelined-scan', bool, False, None),
+               ('asyncPlots', 'async-plots', bool, False, None),
+               ('plotBacklogPolicy', 'plot-backlog-policy', str, 'block', _one_of(*PLOT_BACKLOG_POLICIES)),
+               ('importTimingReport', 'import-timing-report', bool, False, None),
+               ('realtimeMeasurements', 'realtime-measurements', bool, _REQUIRED, None),
+               ('targetThreshold_dBV', 'target-threshold-dBV', float, _REQUIRED, None),
+               ('minBeamAngle_DEG', 'min-beam-angle', float, _REQUIRED, _in_range(-90, 90)),
+               ('maxBeamAngle_DEG', 'max-beam-angle', float, _REQUIRED, _in_range(-90, 90)),
+               ('directions', 'directions', int, _REQUIRED, _at_least(1)),
+               ('scheduleInterval_s', 'schedule-interval-s', float, 900.0, _greater_than(0)),
+               ('scheduleCron', 'schedule-cron', str, '', _cron_expression),
+               ('resultsDatabase', 'results-database', str, '', None),
+               ('metricsFile', 'metrics-file', str, '', None),
+               ('metricsFileMaxBytes', 'metrics-file-max-bytes', int, DEFAULT_METRICS_FILE_MAX_BYTES, _at_least(1024)),
+               ('metricsFileBackups', 'metrics-file-backups', int, DEFAULT_METRICS_FILE_BACKUPS, _at_least(0)),
+               ('metricsPort', 'metrics-port', int, 0, _in_range(0, 65535)),
+               ('metricsAddress', 'metrics-address', str, '127.0.0.1', None),
+               ('logLevel', 'log-level', str, DEFAULT_LOG_LEVEL, _one_of(*LOG_LEVELS)),
+               ('logModuleLevels', 'log-module-levels', list, [], _module_levels),
+               ('logFile', 'log-file', str, '', None))
+
+@dataclass(frozen=True)
+class StatisticsSettings(_Section):
+    __slots__ = ('enabled', 'episodes', 'normalityWindow')
+    enabled: bool
+    episodes: int
+    normalityWindow: int
+    _SCHEMA = (('enabled', 'enabling', bool, _REQUIRED, None),
+               ('episodes', 'episodes-number', int, _REQUIRED, _at_least(1)),
+               ('normalityWindow', 'normality-window', int, DEFAULT_NORMALITY_WINDOW, _at_least(0)))
+
+DEVICE_BACKENDS = ('hardware', 'simulated')
+
+@dataclass(frozen=True)
+class DeviceSettings(_Section):
+    # Real or simulated devices (see custom_modules/devices.py), and the simulated scene
+    __slots__ = ('radar', 'servo', 'accelerometer', 'simulatedSurfaceVelocity_mps', 'simulatedSpectrumSpread_Hz', 'simulatedSNR_dB', 'simulatedSignalLevel_dBFS',
+                 'simulatedTiltAngle_DEG', 'simulatedRealTime', 'simulationSeed')
+    radar: str
+    servo: str
+    accelerometer: str
+    simulatedSurfaceVelocity_mps: float
+    simulatedSpectrumSpread_Hz: float
+    simulatedSNR_dB: float
+    simulatedSignalLevel_dBFS: float
+    simulatedTiltAngle_DEG: float
+    simulatedRealTime: bool
+    simulationSeed: int
+    _SCHEMA = (('radar', 'radar', str, 'hardware', _one_of(*DEVICE_BACKENDS)),
+               ('servo', 'servo', str, 'hardware', _one_of(*DEVICE_BACKENDS)),
+               ('accelerometer', 'accelerometer', str, 'hardware', _one_of(*DEVICE_BACKENDS)),
+               ('simulatedSurfaceVelocity_mps', 'simulated-surface-velocity-mps', float, 1.0, None),
+               ('simulatedSpectrumSpread_Hz', 'simulated-spectrum-spread-Hz', float, 20.0, _at_least(0)),
+               ('simulatedSNR_dB', 'simulated-snr-dB', float, 20.0, None),
+               ('simulatedSignalLevel_dBFS', 'simulated-signal-level-dBFS', float, -20.0, _in_range(-120, 0)),
+               ('simulatedTiltAngle_DEG', 'simulated-tilt-angle-deg', float, 45.0, _in_range(0, 90)),
+               ('simulatedRealTime', 'simulated-real-time', bool, False, None),
+               ('simulationSeed', 'simulation-seed', int, None, None))
+
+# Layouts: section key for each attribute of Settings
+_LAYOUTS = {'sense2gol': {'installation': ('radar-installation', InstallationSettings), 'radar': ('sense2gol', Sense2GoLSettings), 'platform': ('raspberry-pi-zero', PlatformSettings)},
+            'picoscope': {'installation': ('mounting-support', MountingSupportSettings), 'antennas': ('antennas', AntennaSettings), 'accelerometer': ('accelerometer', AccelerometerSettings),
+                          'radar': ('picoscope', PicoScopeSettings), 'platform': ('raspberry-pi-3bplus', PlatformSettings)}}
+_COMMON_SECTIONS = {'signalProcessing': ('signal-processing', SignalProcessingSettings), 'statistics': ('statistical-analysis', StatisticsSettings)}
+_OPTIONAL_SECTIONS = {'devices': ('devices', DeviceSettings)}
+
+class Settings:
+    '''
+    Validated settings, with the quantities derived from them:
+    sampling frequency (as set on the device), FFT plan, beam directions, buffer sizes, tilt angle label.
+    Sections not used by a layout (e.g. antennas for the Sense2GoL) are None.
+    '''
+    __slots__ = ('fileName', 'modificationTime', 'layout', 'raw', 'installation', 'antennas', 'accelerometer', 'radar', 'signalProcessing', 'platform', 'statistics', 'devices',
+                 'samplingFrequency', 'adcRangeBits', 'serialBufferSize', 'totalSamples', 'triggerDelay_samples', 'fftPlan', 'antennaBeamDirections_DEG', 'tiltAngle_DEG', 'tiltAngle_DEG_str')
+
+    def __init__(self, settings: dict, fileName: str = None, modificationTime: float = None):
+        self.fileName = fileName
+        self.modificationTime = modificationTime
+        self.raw = settings
+        self.layout = 'picoscope' if 'picoscope' in settings else 'sense2gol'
+        errors = []
+        sections = dict(_LAYOUTS[self.layout], **_COMMON_SECTIONS)
+        for attribute in ('installation', 'antennas', 'accelerometer', 'radar', 'signalProcessing', 'platform', 'statistics'):
+            if attribute in sections:
+                sectionKey, sectionClass = sections[attribute]
+                setattr(self, attribute, _load_section(sectionClass, settings, sectionKey, errors))
+            else:
+                setattr(self, attribute, None)
+        for attribute, (sectionKey, sectionClass) in _OPTIONAL_SECTIONS.items():
+            setattr(self, attribute, _load_section(sectionClass, settings, sectionKey, errors, optional=True))
+        if not errors:
+            self._check(errors)
+        if errors:
+            raise SettingsError("Invalid settings ({}):\n\t".format(fileName or 'dictionary') + "\n\t".join(errors))
+        try:
+            self._derive()
+        except Exception as error:
+            # Values accepted by the checks but not by the derived quantities (e.g. the FFT plan)
+            raise SettingsError("Invalid settings ({}): {}: {}".format(fileName or 'dictionary', type(error).__name__, error)) from error
+
+    def _check(self, errors: list):
+        # Checks across fields
+        signalProcessing, platform = self.signalProcessing, self.platform
+        if self.statistics.enabled and self.statistics.episodes < 3:
+            errors.append("\"statistical-analysis\" / \"episodes-number\": should be 3 at least, for the statistical analysis")
+        if signalProcessing.frequencyMin_Hz >= signalProcessing.frequencyMax_Hz:
+            errors.append("\"signal-processing\": frequency-min-Hz should be less than frequency-max-Hz")
+        elif not signalProcessing.complexFFT and signalProcessing.frequencyMax_Hz <= 0:
+            errors.append("\"signal-processing\": with complex-fft false (one-sided spectrum), frequency-max-Hz should be greater than 0")
+        nyquistFrequency = self._sampling_frequency() / 2
+        if signalProcessing.fftResolution_Hz >= nyquistFrequency:
+            errors.append("\"signal-processing\": fft-resolution-Hz should be less than half the sampling frequency ({:g} Hz)".format(nyquistFrequency))
+        if signalProcessing.frequencyMax_Hz > nyquistFrequency or (signalProcessing.complexFFT and signalProcessing.frequencyMin_Hz < -nyquistFrequency):
+            errors.append("\"signal-processing\": frequency-min-Hz and frequency-max-Hz should be within the Nyquist band (+/-{:g} Hz)".format(nyquistFrequency))
+        if signalProcessing.welchOverlapSamples >= signalProcessing.welchSegmentSamples:
+            errors.append("\"signal-processing\": welch-overlap-samples should be less than welch-segment-samples")
+        if signalProcessing.stftOverlappingSamples >= signalProcessing.stftSamplesInSegment:
+            errors.append("\"signal-processing\": stft-overlapping-samples should be less than stft-samples-in-segment")
+        if signalProcessing.stftBins < signalProcessing.stftSamplesInSegment:
+            errors.append("\"signal-processing\": stft-bins should be at least stft-samples-in-segment")
+        if platform.minBeamAngle_DEG > platform.maxBeamAngle_DEG:
+            errors.append("min-beam-angle should not exceed max-beam-angle")
+        if self.layout == 'sense2gol' and (platform.pwmPin is None or platform.pwmFrequency_Hz is None):
+            errors.append("\"raspberry-pi-zero\": pwm-board-pin and pwm-frequency are needed by the servo motor")
+        if self.antennas is not None and not (self.antennas.minSquintAngle_DEG <= platform.minBeamAngle_DEG and platform.maxBeamAngle_DEG <= self.antennas.maxSquintAngle_DEG):
+            errors.append("beam angles should agree with the beam squint limits")
+
+    def _sampling_frequency(self):
+        # Hz, as set on the device (the PicoScope rounds it to one of its timebases)
+        if self.layout == 'picoscope':
+            from custom_modules.picoscope import conform_sampling_frequency
+            return conform_sampling_frequency(self.radar.samplingFrequency_Hz)
+        return self.radar.samplingFrequency_Hz
+
+    def _derive(self):
+        radar = self.radar
+        self.samplingFrequency = self._sampling_frequency() # Hz
+        if self.layout == 'picoscope':
+            self.adcRangeBits = None
+            self.serialBufferSize = None
+            self.totalSamples = round(radar.acquisitionTime_s * self.samplingFrequency)
+            self.triggerDelay_samples = int(self.samplingFrequency * radar.triggerDelay_s)
+            self.tiltAngle_DEG = None # Measured by the accelerometer.
+            self.tiltAngle_DEG_str = None
+        else:
+            from custom_modules.sense2gol import serial_buffer_size
+            self.adcRangeBits = int(2**radar.adcResolutionBits) # ADC full scale, counts.
+            self.serialBufferSize = serial_buffer_size(radar.frames, radar.samplesPerFrame, radar.overhead) # Bytes.
+            self.totalSamples = radar.frames * radar.samplesPerFrame
+            self.triggerDelay_samples = None
+            self.tiltAngle_DEG = self.installation.tiltAngle_DEG
+            self.tiltAngle_DEG_str = "tilt" + str("{0:.1f}".format(self.tiltAngle_DEG)) + "deg"
+        self.fftPlan = FFTPlan.from_settings(self.signalProcessing, self.samplingFrequency, self.platform.targetThreshold_dBV)
+        if self.platform.directions == 1: # Only broadside direction
+            self.antennaBeamDirections_DEG = np.array([0])
+        else:
+            self.antennaBeamDirections_DEG = np.linspace(start=self.platform.minBeamAngle_DEG, stop=self.platform.maxBeamAngle_DEG, num=self.platform.directions, endpoint=True) # Degrees.
+        self.antennaBeamDirections_DEG.flags.writeable = False
+
+    @classmethod
+    def from_file(cls, fileName: str = DEFAULT_SETTINGS_FILE):
+        import json
+        modificationTime = os.stat(fileName).st_mtime_ns
+        with open(fileName) as f:
+            try:
+                settings = json.load(f)
+            except ValueError as error:
+                raise SettingsError("Invalid settings ({}): {}".format(fileName, error)) from None
+        return cls(settings, fileName, modificationTime)
+
+    def print_summary(self):
+        logger.info('Sampling frequency: %.3e Hz', self.samplingFrequency)
+        logger.info('Time resolution: %.3e s', 1/self.samplingFrequency)
+        if self.layout == 'sense2gol':
+            logger.info("Number of frames (for each direction): %d", self.radar.frames)
+            logger.info("Samples per frame (for each direction): %d", self.radar.samplesPerFrame)
+            logger.info("Equivalent acquisition time (for each direction): %.3e s", self.totalSamples / self.samplingFrequency)
+        else:
+            logger.info('Number of total samples (for each channel): %s', '{:,d}'.format(self.totalSamples))
+
+_cache = {}
+
+def get_settings(fileName: str = DEFAULT_SETTINGS_FILE):
+    '''
+    Settings from a *.json file. The result is cached, and reloaded only if the file has been modified.
+    :return: Settings.
+    '''
+    key = os.path.abspath(fileName)
+    cached = _cache.get(key)
+    if cached is not None and cached.modificationTime == os.stat(fileName).st_mtime_ns:
+        return cached
+    settings = Settings.from_file(fileName)
+    _cache[key] = settings
+    return settings
+
+class SettingsWatcher:
+    '''
+    Settings of a long-running process, reloaded when the file changes (see reload_if_changed()).
+    If the modified file is invalid, the previous settings are kept.
+    '''
+    def __init__(self, fileName: str = DEFAULT_SETTINGS_FILE):
+        self.fileName = fileName
+        self.settings = get_settings(fileName)
+        self._rejected = None # Modification time of the last invalid file, reported once.
+
+    def reload_if_changed(self):
+        '''
+        :return: True if new settings have been loaded.
+        '''
+        try:
+            modificationTime = os.stat(self.fileName).st_mtime_ns
+        except OSError as error:
+            logger.warning("settings file not readable (%s). Previous settings kept.", error)
+            return False
+        if modificationTime == self.settings.modificationTime or modificationTime == self._rejected:
+            return False
+        try:
+            self.settings = get_settings(self.fileName)
+        except (SettingsError, OSError) as error:
+            self._rejected = modificationTime
+            logger.warning("%s Previous settings kept.", error)
+            return False
+        logger.info("Settings reloaded from %s", self.fileName)
+        return True
+
+    def reject(self, previous):
+        '''
+        Go back to the previous settings, e.g. when the reloaded ones could not be applied.
+        The file is not reloaded again until it is modified.
+        '''
+        self._rejected = self.settings.modificationTime
+        self.settings = previous
+
+if __name__ == "__main__":
+    print("Standalone script not yet developed.")
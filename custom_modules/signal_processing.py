@@ -1,9 +1,26 @@
-# FFT evaluation of complex signal
+# FFT evaluation of complex signal (I + jQ), or of a single channel (real FFT, one-sided spectrum)
+from collections import namedtuple
+from dataclasses import dataclass, field
+import logging
 import numpy as np
+from custom_modules.instrumentation import instrumented
+
+logger = logging.getLogger(__name__)
+
+CENTROID_METHODS = ('band-center', 'power-weighted')
+FFT_CHANNELS = ('I', 'Q') # Channel processed by the real FFT.
+SPECTRUM_MODES = ('fft', 'zoom', 'welch') # Zero-padded FFT of the whole band, chirp-z transform of the frequency window only, or averaged periodogram of segments.
+WELCH_WINDOWS = ('hamming', 'hann', 'rectangular')
+WELCH_BATCH_SEGMENTS = 32 # Segments transformed together: bounds the memory of the welch mode for any signal length.
+FFTBatchResult = namedtuple('FFTBatchResult', ['FFT_dBV_peaks', 'centroid_frequencies', 'centroid_starts', 'centroid_stops', 'centroid_thresholds', 'surface_velocities', 'FFT_dBV', 'FFT_dBV_smoothed', 'freqAxis_Hz'])
+STFTColumns = namedtuple('STFTColumns', ['times_s', 'spectra', 'FFT_dBV_peaks', 'centroid_frequencies'])
+FFTResult = namedtuple('FFTResult', ['FFT_dBV_max', 'centroid_frequency', 'centroid_start', 'centroid_stop', 'centroid_threshold', 'surface_velocity', 'FFT_dBV', 'FFT_dBV_smoothed', 'freqAxis_Hz'])
 
 def FFT_parameters(complexFFT: bool, samplingFrequency: float, resolution: float, smoothing: bool, smoothingWindow: float, frequencyMin: float, frequencyMax: float, print_FFT_info=True):
     '''
-    Define FFT bins and resolution.
+    Define FFT bins and resolution. Complex FFT: bins over [-samplingFrequency/2, samplingFrequency/2).
+    Real FFT: one-sided bins over [0, samplingFrequency/2] (freqBins_FFT/2 + 1 of them). The DC bin is always excluded
+    (no Doppler information after offset removal): lower limits are clipped to the first bin above it.
     :return: Boolean flag (True) after FFT parameters are defined.
     '''
     freqBins_FFT = int(2**np.ceil(np.log2(abs(samplingFrequency/2/resolution))))
@@ -14,92 +31,689 @@ def FFT_parameters(complexFFT: bool, samplingFrequency: float, resolution: float
         maxBin = int(freqBins_FFT/2 + np.round(frequencyMax / (samplingFrequency/freqBins_FFT)))
         frequencyMax_fixed = -samplingFrequency/2 + maxBin * samplingFrequency/freqBins_FFT
     else:
-        minBin = int(np.round(FREQUENCY_MIN / (samplingFrequency/freqBins_FFT)))
-        FREQUENCY_MIN = minBin * samplingFrequency/freqBins_FFT
-        print("Minimum frequency of interest: {:.1f} Hz".format(FREQUENCY_MIN))
-        maxBin = int(np.round(FREQUENCY_MAX / (samplingFrequency/freqBins_FFT)))
-        FREQUENCY_MAX = maxBin * samplingFrequency/freqBins_FFT
-    if print_FFT_info==True:
-        print('FFT resolution: {:.3e} Hz'.format(samplingFrequency / freqBins_FFT))
-        print('FFT bins: {:,d}'.format(freqBins_FFT))
+        minBin = int(np.clip(np.round(frequencyMin / (samplingFrequency/freqBins_FFT)), 1, freqBins_FFT//2))
+        frequencyMin_fixed = minBin * samplingFrequency/freqBins_FFT
+        maxBin = int(np.clip(np.round(frequencyMax / (samplingFrequency/freqBins_FFT)), 1, freqBins_FFT//2))
+        frequencyMax_fixed = maxBin * samplingFrequency/freqBins_FFT
+    level = logging.INFO if print_FFT_info==True else logging.DEBUG
+    if logger.isEnabledFor(level):
+        logger.log(level, 'FFT resolution: %.3e Hz', samplingFrequency / freqBins_FFT)
+        logger.log(level, 'FFT bins: {:,d}'.format(freqBins_FFT))
         if smoothing == True:
-            print('Size of smoothing window (moving average): {:,d} bins, {:.1f} Hz'.format(smoothingBins, smoothingWindow))
-        print("Minimum frequency of interest: {:.1f} Hz".format(frequencyMin_fixed))
-        print("Maximum frequency of interest: {:.1f} Hz".format(frequencyMax_fixed))
+            logger.log(level, 'Size of smoothing window (moving average): {:,d} bins, {:.1f} Hz'.format(smoothingBins, smoothingWindow))
+        logger.log(level, "Minimum frequency of interest: %.1f Hz", frequencyMin_fixed)
+        logger.log(level, "Maximum frequency of interest: %.1f Hz", frequencyMax_fixed)
     return True, freqBins_FFT, smoothingBins, minBin, frequencyMin_fixed, maxBin, frequencyMax_fixed
 
-def centroid_estimation(inputArray, bandwidthThreshold, freqAxis_Hz, frequencyMin, FFT_dBV_max, freqBins_FFT):
+def centroid_estimation(inputArray, bandwidthThreshold, freqAxis_Hz, frequencyMin, FFT_dBV_max, freqBins_FFT, centroidMethod='band-center', contiguousBand=False):
+    '''
+    Doppler centroid from the bins within bandwidthThreshold (dB) of the spectrum maximum.
+    centroidMethod: 'band-center' (middle of the band) or 'power-weighted' (centre of mass of the power in the band).
+    contiguousBand: if True, the band is the run of bins around the peak; otherwise it spans from the first to the last bin above threshold.
+    :return: centroid frequency, band start, band stop, threshold.
+    '''
+    assert centroidMethod in CENTROID_METHODS, "Centroid method should be one of: " + ", ".join(CENTROID_METHODS)
     maxValue = np.amax(inputArray)
-    freqIndex = 0
-    stopIndex = 0
-    start_detected = False
-    startBand = 0
-    stopBand = 0
-    centroidDetected = False
-    while centroidDetected == False:
-        for element in inputArray:
-            if element >= (maxValue - bandwidthThreshold):
-                if start_detected == False:
-                    startBand = max(freqAxis_Hz[freqIndex], frequencyMin)
-                    start_detected = True
-                stopIndex = max(stopIndex,freqIndex)
-                stopBand = freqAxis_Hz[stopIndex]
-            freqIndex += 1
-            if freqIndex >= (freqBins_FFT+1):
-                centroidDetected = True
-                break
-    centroid_frequency = (stopBand + startBand)/2
-    print('Amplitude of FFT peak: {:.1f}'.format(FFT_dBV_max) + ' dBV')
+    centroid_frequency, startBand, stopBand = _centroid_bands(inputArray, maxValue, bandwidthThreshold, freqAxis_Hz, frequencyMin, centroidMethod, contiguousBand)
     centroid_threshold = FFT_dBV_max - bandwidthThreshold
-    print('Bandwidth threshold (norm.smooth.): {:.1f}'.format(centroid_threshold) + ' dB')
-    print('Bandwidth: {:.1f}'.format(stopBand - startBand) + ' Hz')
-    print('Bandwidth starts at {:.1f}'.format(startBand) + ' Hz')
-    print('Bandwidth stops at {:.1f}'.format(stopBand) + ' Hz')
-    print('Center frequency of Doppler centroid: {:.1f}'.format(centroid_frequency) + ' Hz')
+    logger.debug('Amplitude of FFT peak: %.1f dBV', FFT_dBV_max)
+    logger.debug('Bandwidth threshold (norm.smooth.): %.1f dB', centroid_threshold)
+    logger.debug('Bandwidth: %.1f Hz', stopBand - startBand)
+    logger.debug('Bandwidth starts at %.1f Hz', startBand)
+    logger.debug('Bandwidth stops at %.1f Hz', stopBand)
+    logger.debug('Center frequency of Doppler centroid: %.1f Hz', centroid_frequency)
     return centroid_frequency, startBand, stopBand, centroid_threshold
 
+def _centroid_bands(spectra_dB, maxValues, bandwidthThreshold, freqAxis_Hz, frequencyMin, centroidMethod, contiguousBand):
+    # Band edges and centroid along the last axis, for any number of spectra at once
+    maxValues = np.asarray(maxValues)
+    bins = spectra_dB.shape[-1]
+    aboveThreshold = spectra_dB >= (maxValues - bandwidthThreshold)[..., np.newaxis]
+    if contiguousBand:
+        peakIndex = np.argmax(spectra_dB, axis=-1)[..., np.newaxis]
+        indexes = np.arange(bins)
+        belowThreshold = ~aboveThreshold
+        startIndex = np.max(np.where(belowThreshold & (indexes < peakIndex), indexes, -1), axis=-1) + 1
+        stopIndex = np.min(np.where(belowThreshold & (indexes > peakIndex), indexes, bins), axis=-1) - 1
+    else:
+        startIndex = np.argmax(aboveThreshold, axis=-1)
+        stopIndex = bins - 1 - np.argmax(aboveThreshold[..., ::-1], axis=-1)
+    startBand = np.maximum(freqAxis_Hz[startIndex], frequencyMin)
+    stopBand = freqAxis_Hz[stopIndex]
+    if centroidMethod == 'power-weighted':
+        indexes = np.arange(bins)
+        inBand = aboveThreshold & (indexes >= startIndex[..., np.newaxis]) & (indexes <= stopIndex[..., np.newaxis])
+        bandPower = np.where(inBand, 10**((spectra_dB - maxValues[..., np.newaxis])/10), 0) # Relative to the peak, to avoid overflow.
+        centroid_frequency = np.sum(bandPower * freqAxis_Hz, axis=-1) / np.sum(bandPower, axis=-1)
+    else:
+        centroid_frequency = (stopBand + startBand)/2
+    return centroid_frequency, startBand, stopBand
+
+def _moving_average(spectra, smoothingBins: int):
+    # Same as np.convolve(spectrum, np.ones(smoothingBins), 'same') / smoothingBins, along the last axis
+    bins = spectra.shape[-1]
+    padding = [(0, 0)] * (spectra.ndim - 1) + [(smoothingBins//2, smoothingBins - 1 - smoothingBins//2)]
+    padded = np.pad(spectra, padding)
+    smoothed = np.zeros(spectra.shape)
+    for shift in range(smoothingBins):
+        smoothed += padded[..., shift:shift+bins]
+    smoothed /= smoothingBins
+    return smoothed
+
+def _fast_length(n: int):
+    # Smallest 2^a * 3^b * 5^c not less than n: an efficient np.fft size
+    best = 1 << max(n - 1, 0).bit_length()
+    power5 = 1
+    while power5 < best:
+        power35 = power5
+        while power35 < best:
+            best = min(best, power35 * (1 << (-(-n // power35) - 1).bit_length()))
+            power35 *= 3
+        power5 *= 5
+    return best
+
+def _surface_velocity(centroid_frequency, antennaBeamDirection_DEG, tiltAngle_DEG):
+    return (3e8 * centroid_frequency) / (2 * (24.125e9) * np.cos(np.deg2rad(antennaBeamDirection_DEG) * np.cos(np.deg2rad(tiltAngle_DEG))))
+
 def evaluate_surface_velocity(centroid_frequency, antennaBeamDirection_DEG, tiltAngle_DEG):
-    surface_velocity = (3e8 * centroid_frequency) / (2 * (24.125e9) * np.cos(np.deg2rad(antennaBeamDirection_DEG) * np.cos(np.deg2rad(tiltAngle_DEG))))
-    print('Resulting surface velocity: {:.3f}'.format((3e8 * centroid_frequency) / (2 * (24.125e9) * np.cos(np.deg2rad(antennaBeamDirection_DEG) * np.cos(tiltAngle_DEG)))), ' m/s')
+    surface_velocity = _surface_velocity(centroid_frequency, antennaBeamDirection_DEG, tiltAngle_DEG)
+    logger.debug('Resulting surface velocity: %.3f m/s', surface_velocity)
     return surface_velocity
 
-def FFT(signal_mV, complexFFT: bool, totalSamples: int, samplingFrequency: float, freqBins_FFT, offsetRemoval: bool, hanningWindowing: bool, zeroForcing: bool, minBin, maxBin, smoothing: bool, smoothingBins, targetThreshold: float, bandwidthThreshold: float, frequencyMin_fixed, antennaBeamDirection_DEG: float, tiltAngle_DEG: float, FFT_initialized=False):
-    assert FFT_initialized, "FFT not initialized. Use \'FFT_parameters()\' from signal_processing.py costum module."
-    if complexFFT == True: # FFT of complex signal
-        if offsetRemoval==True:
-            signal_mV = signal_mV - np.mean(signal_mV)
-        if hanningWindowing==True:
-            signal_mV = signal_mV * np.hamming(totalSamples)
-        FFT = np.fft.fftshift(np.fft.fft(signal_mV, n = freqBins_FFT)) # FFT of complex signal
-        FFT_mV = np.abs(1/(totalSamples)*FFT) # FFT magnitude
-        if zeroForcing == True:
-            FFT_mV[0:minBin] = 0
-            FFT_mV[maxBin:-1] = 0
+@dataclass(frozen=True, eq=False)
+class FFTPlan:
+    '''
+    FFT parameters and everything that depends only on them (frequency axis, smoothing kernel,
+    Hamming windows, work buffer), computed once and reused for every acquisition.
+    Without complexFFT, only one channel (I or Q, see channel) is processed, with a real FFT: one-sided spectrum,
+    about half the computation and memory of the complex FFT.
+    With spectrumMode 'zoom', only the bins between minBin and maxBin (the zero-forcing window) are computed, with a chirp-z
+    transform (Bluestein): same values on those bins, FFT size and memory set by signal length plus window bins instead
+    of freqBins_FFT. Spectra and frequency axis then cover the window only.
+    With spectrumMode 'welch', the spectrum is the average of the periodograms of overlapping windowed segments (Welch):
+    lower variance of the spectrum and of the centroid, resolution set by the segment length, bounded memory.
+    A plan holds a work buffer: use one plan per thread.
+    '''
+    complexFFT: bool
+    samplingFrequency: float
+    freqBins_FFT: int
+    smoothingBins: int
+    minBin: int
+    maxBin: int
+    frequencyMin_fixed: float
+    frequencyMax_fixed: float
+    offsetRemoval: bool
+    hanningWindowing: bool
+    zeroForcing: bool
+    smoothing: bool
+    targetThreshold: float
+    bandwidthThreshold: float
+    centroidMethod: str = 'band-center'
+    contiguousBand: bool = False
+    channel: str = 'I'
+    spectrumMode: str = 'fft'
+    welchSegmentSamples: int = 1024
+    welchOverlapSamples: int = 512
+    welchWindow: str = 'hamming'
+    freqAxis_Hz: np.ndarray = field(init=False, repr=False)
+    smoothingKernel: np.ndarray = field(init=False, repr=False)
+    _windows: dict = field(init=False, repr=False)
+    _workBuffer: np.ndarray = field(init=False, repr=False)
+    _firstBin: int = field(init=False, repr=False) # Index of minBin in freqAxis_Hz.
+    _oneSidedGain: np.ndarray = field(init=False, repr=False)
+    _zoomKernels: dict = field(init=False, repr=False)
+
+    def __post_init__(self):
+        assert self.channel in FFT_CHANNELS, "FFT channel should be one of: " + ", ".join(FFT_CHANNELS)
+        assert self.spectrumMode in SPECTRUM_MODES, "Spectrum mode should be one of: " + ", ".join(SPECTRUM_MODES)
+        if self.spectrumMode == 'welch':
+            assert self.welchWindow in WELCH_WINDOWS, "Welch window should be one of: " + ", ".join(WELCH_WINDOWS)
+            assert 0 <= self.welchOverlapSamples < self.welchSegmentSamples, "Welch overlap samples should be less than segment samples."
+            if self.welchSegmentSamples > self.freqBins_FFT:
+                logger.warning("Welch segments of %d samples truncated to the %d FFT bins.", self.welchSegmentSamples, self.freqBins_FFT)
+        if self.complexFFT:
+            freqAxis_Hz = np.fft.fftshift(np.fft.fftfreq(self.freqBins_FFT)) * self.samplingFrequency
+        else:
+            freqAxis_Hz = np.fft.rfftfreq(self.freqBins_FFT) * self.samplingFrequency
+        bins = np.arange(len(freqAxis_Hz))
+        if self.spectrumMode == 'zoom':
+            # Bins kept by the zero-forcing of the full spectrum
+            bins = bins[self.minBin:self.maxBin if self.complexFFT else self.maxBin+1]
+            freqAxis_Hz = freqAxis_Hz[bins]
+        freqAxis_Hz.flags.writeable = False
+        # One-sided spectrum: DC and Nyquist bins have no negative counterpart
+        oneSidedGain = None if self.complexFFT else np.where((bins == 0) | (bins == self.freqBins_FFT//2), 1.0, 2.0)
+        smoothingKernel = np.ones(max(self.smoothingBins, 1))
+        smoothingKernel.flags.writeable = False
+        object.__setattr__(self, 'freqAxis_Hz', freqAxis_Hz)
+        object.__setattr__(self, 'smoothingKernel', smoothingKernel)
+        object.__setattr__(self, '_windows', {})
+        object.__setattr__(self, '_workBuffer', np.zeros(self.freqBins_FFT if self.spectrumMode == 'fft' else 0, dtype=complex if self.complexFFT else float))
+        object.__setattr__(self, '_firstBin', 0 if self.spectrumMode == 'zoom' else self.minBin)
+        object.__setattr__(self, '_oneSidedGain', oneSidedGain)
+        object.__setattr__(self, '_zoomKernels', {})
+
+    @classmethod
+    def from_settings(cls, signalProcessing, samplingFrequency: float, targetThreshold: float):
+        '''
+        Build the plan from the validated "signal-processing" section (custom_modules/settings.py, SignalProcessingSettings):
+        defaults of the optional settings are set there.
+        '''
+        FFT_initialized, freqBins_FFT, smoothingBins, minBin, frequencyMin_fixed, maxBin, frequencyMax_fixed = FFT_parameters(signalProcessing.complexFFT, samplingFrequency, signalProcessing.fftResolution_Hz, signalProcessing.fftSmoothing, signalProcessing.smoothingWindow_Hz, signalProcessing.frequencyMin_Hz, signalProcessing.frequencyMax_Hz, signalProcessing.printFFTInfo)
+        return cls(signalProcessing.complexFFT, samplingFrequency, freqBins_FFT, smoothingBins, minBin, maxBin, frequencyMin_fixed, frequencyMax_fixed,
+                   signalProcessing.offsetRemoval, signalProcessing.hanningWindowing, signalProcessing.zeroForcing, signalProcessing.fftSmoothing,
+                   targetThreshold, signalProcessing.bandwidthThreshold_dB,
+                   signalProcessing.centroidMethod, signalProcessing.contiguousBand, signalProcessing.fftChannel, signalProcessing.spectrumMode,
+                   signalProcessing.welchSegmentSamples, signalProcessing.welchOverlapSamples, signalProcessing.welchWindow)
+
+    def window(self, totalSamples: int):
+        # Hamming window, cached for each signal length
+        window = self._windows.get(totalSamples)
+        if window is None:
+            window = np.hamming(totalSamples)
+            window.flags.writeable = False
+            self._windows[totalSamples] = window
+        return window
+
+    def welch_window(self, samples: int):
+        # Window of the Welch segments, cached with the Hamming windows
+        window = self._windows.get((self.welchWindow, samples))
+        if window is None:
+            if self.welchWindow == 'hamming':
+                window = np.hamming(samples)
+            elif self.welchWindow == 'hann':
+                window = np.hanning(samples)
+            else:
+                window = np.ones(samples)
+            window.flags.writeable = False
+            self._windows[(self.welchWindow, samples)] = window
+        return window
+
+    def select(self, I_array_mV, Q_array_mV):
+        # Signal to process: I + jQ for the complex FFT, otherwise the selected channel only (no complex array)
+        if self.complexFFT:
+            return I_array_mV + 1j*Q_array_mV
+        return I_array_mV if self.channel == 'I' else Q_array_mV
+
+    def _real_signal(self, signal_mV):
+        # Selected channel of a complex signal (I + jQ), or a single-channel signal as it is
+        signal_mV = np.asarray(signal_mV)
+        if np.iscomplexobj(signal_mV):
+            return signal_mV.real if self.channel == 'I' else signal_mV.imag
+        return signal_mV
+
+    def _zoom_kernel(self, samples: int):
+        '''
+        Chirp-z factors for signals of the given length, cached as the windows: pre-chirp, FFT of the chirp filter, post-chirp.
+        :return: The factors and their FFT size, or None if the full FFT is cheaper (long window, short zero padding).
+        '''
+        if samples not in self._zoomKernels:
+            F = self.freqBins_FFT
+            bins = len(self.freqAxis_Hz)
+            length = _fast_length(samples + bins - 1)
+            kernel = None
+            if 2*length < F: # Two FFTs of this length instead of one of F
+                firstBin = self.minBin - F//2 if self.complexFFT else self.minBin # Signed index of the first bin
+                n = np.arange(samples, dtype=np.int64)
+                m = np.arange(bins, dtype=np.int64)
+                # Phases in units of pi/F, reduced with integer arithmetic: exact for any signal length
+                preChirp = np.exp(-1j*np.pi/F * ((n*n + 2*firstBin*n) % (2*F)))
+                postChirp = np.exp(-1j*np.pi/F * ((m*m) % (2*F)))
+                chirpFilter = np.zeros(length, dtype=complex)
+                chirpFilter[:bins] = np.conj(postChirp)
+                chirpFilter[length-samples+1:] = np.exp(1j*np.pi/F * ((n[:0:-1]**2) % (2*F)))
+                kernel = (preChirp, np.fft.fft(chirpFilter), postChirp, length)
+            self._zoomKernels[samples] = kernel
+        return self._zoomKernels[samples]
+
+    def _spectrum(self, signals_mV):
+        # Spectrum on the bins of freqAxis_Hz, along the last axis, of signals already without offset and windowed
+        if self.spectrumMode == 'zoom':
+            signals_mV = signals_mV[..., :self.freqBins_FFT] # Longer signals are truncated, as by np.fft.fft
+            kernel = self._zoom_kernel(signals_mV.shape[-1])
+            if kernel is not None:
+                preChirp, chirpFilterFFT, postChirp, length = kernel
+                FFT = np.fft.fft(signals_mV * preChirp, length, axis=-1)
+                FFT *= chirpFilterFFT
+                FFT = np.fft.ifft(FFT, axis=-1)[..., :len(postChirp)]
+                FFT *= postChirp
+                return FFT
+        if self.complexFFT:
+            FFT = np.fft.fftshift(np.fft.fft(signals_mV, n = self.freqBins_FFT, axis=-1), axes=-1) # FFT of complex signals
+        else:
+            FFT = np.fft.rfft(signals_mV, n = self.freqBins_FFT, axis=-1) # One-sided FFT of real signals
+        if self.spectrumMode == 'zoom':
+            FFT = FFT[..., self.minBin:self.minBin+len(self.freqAxis_Hz)]
+        return FFT
+
+    def _welch(self, signals_mV):
+        '''
+        Averaged periodogram (Welch) along the last axis: windowed segments of welchSegmentSamples, overlapping by
+        welchOverlapSamples, each transformed on freqBins_FFT bins. Segments are a strided view of the signals (no copy),
+        transformed WELCH_BATCH_SEGMENTS at a time: memory does not depend on the signal length.
+        Offset removal is applied to each segment; hanning-windowing is replaced by the Welch window.
+        :return: Root mean square of the segment spectra (same scale as a FFT, on the same bins) and segment length.
+        '''
+        segmentSamples = self.welch_segment_samples(signals_mV.shape[-1])
+        segments = np.lib.stride_tricks.sliding_window_view(signals_mV, segmentSamples, axis=-1)[..., ::self.welch_hop(), :]
+        power = np.zeros(signals_mV.shape[:-1] + (self.freqBins_FFT if self.complexFFT else self.freqBins_FFT//2 + 1,))
+        self._welch_accumulate(power, segments)
+        return self._welch_rms(power, segments.shape[-2]), segmentSamples
+
+    def welch_segment_samples(self, totalSamples: int):
+        # Signal shorter than a segment: one periodogram of the whole signal
+        return min(self.welchSegmentSamples, totalSamples, self.freqBins_FFT)
+
+    def welch_hop(self):
+        return max(self.welchSegmentSamples - self.welchOverlapSamples, 1)
+
+    def _welch_accumulate(self, power, segments):
+        # Add the periodograms of the segments (axis -2) to power, WELCH_BATCH_SEGMENTS at a time
+        window = self.welch_window(segments.shape[-1])
+        for start in range(0, segments.shape[-2], WELCH_BATCH_SEGMENTS):
+            batch = segments[..., start:start+WELCH_BATCH_SEGMENTS, :]
+            if self.offsetRemoval==True:
+                batch = batch - np.mean(batch, axis=-1, keepdims=True)
+                batch *= window
+            else:
+                batch = batch * window
+            FFT = np.fft.fft(batch, n = self.freqBins_FFT, axis=-1) if self.complexFFT else np.fft.rfft(batch, n = self.freqBins_FFT, axis=-1)
+            del batch
+            power += np.sum(FFT.real**2 + FFT.imag**2, axis=-2)
+
+    def _welch_rms(self, power, segments: int):
+        # Mean of the accumulated periodograms, as a magnitude on the bins of freqAxis_Hz (power is overwritten)
+        power *= 1/max(segments, 1)
+        logger.debug("Welch: %d segments", segments)
+        if self.complexFFT:
+            power = np.fft.fftshift(power, axes=-1)
+        return np.sqrt(power, out=power)
+
+    def _spectrum_mV(self, FFT, totalSamples: int):
+        # FFT magnitude (mV): amplitude of each tone. One-sided spectrum: negative frequencies folded on the positive ones.
+        FFT_mV = np.abs(FFT)
+        FFT_mV *= 1/totalSamples
+        if self._oneSidedGain is not None:
+            FFT_mV *= self._oneSidedGain
+        return FFT_mV
+
+    def _smoothing_edges(self, FFT_dBV_smoothed):
+        # Zoom: the smoothing window of the first and last bins reaches the zero-forced bins (-inf dB) of the full spectrum
+        FFT_dBV_smoothed[..., :self.smoothingBins//2] = -np.inf
+        FFT_dBV_smoothed[..., FFT_dBV_smoothed.shape[-1] - (self.smoothingBins-1)//2:] = -np.inf
+
+    def _zero_force(self, FFT_mV):
+        FFT_mV[..., 0:self.minBin] = 0
+        if self.complexFFT:
+            FFT_mV[..., self.maxBin:] = 0
+        else:
+            FFT_mV[..., self.maxBin+1:] = 0
+
+    @instrumented('fft')
+    def process(self, signal_mV, antennaBeamDirection_DEG: float, tiltAngle_DEG: float):
+        '''
+        Spectrum, Doppler centroid and surface velocity of one acquisition.
+        signal_mV: complex signal (I + jQ) or, for the real FFT, a single channel (a complex signal is reduced to the selected channel).
+        :return: FFTResult (same values as FFT()).
+        '''
+        if not self.complexFFT:
+            signal_mV = self._real_signal(signal_mV)
+        totalSamples = len(signal_mV)
+        if self.spectrumMode == 'welch':
+            FFT, totalSamples = self._welch(signal_mV)
+        elif totalSamples <= self.freqBins_FFT and self.spectrumMode == 'fft':
+            # Zero-padded signal in the work buffer
+            samples = self._workBuffer[:totalSamples]
+            samples[:] = signal_mV
+            if self.offsetRemoval==True:
+                samples -= np.mean(signal_mV)
+            if self.hanningWindowing==True:
+                samples *= self.window(totalSamples)
+            self._workBuffer[totalSamples:] = 0
+            FFT = np.fft.fftshift(np.fft.fft(self._workBuffer)) if self.complexFFT else np.fft.rfft(self._workBuffer)
+        else: # Zoom, or signal longer than FFT (truncated by np.fft.fft, as in FFT())
+            if self.offsetRemoval==True:
+                signal_mV = signal_mV - np.mean(signal_mV)
+            if self.hanningWindowing==True:
+                signal_mV = signal_mV * self.window(totalSamples)
+            FFT = self._spectrum(signal_mV)
+        return self._result(self._spectrum_mV(FFT, totalSamples), antennaBeamDirection_DEG, tiltAngle_DEG)
+
+    @instrumented('fft')
+    def process_stream(self, chunks, totalSamples: int, antennaBeamDirection_DEG: float, tiltAngle_DEG: float):
+        '''
+        process() of a signal fed in chunks (e.g. CaptureStream, custom_modules/raw_capture.py): memory does not depend on its length.
+        Welch mode: chunks are accumulated by a StreamingWelch, same values as process().
+        Other modes: only the first freqBins_FFT samples are transformed (as in process()); with offset removal, chunks are
+        read twice (mean of the whole signal first), so they must be iterable more than once.
+        chunks: complex (I + jQ) or single-channel arrays, totalSamples in all. They can be overwritten after use.
+        :return: FFTResult.
+        '''
+        if self.spectrumMode == 'welch':
+            welch = StreamingWelch(self, totalSamples)
+            for chunk in chunks:
+                welch.update(chunk)
+            FFT, totalSamples = welch.spectrum()
+        else:
+            if self.offsetRemoval==True:
+                mean = sum(np.sum(chunk if self.complexFFT else self._real_signal(chunk)) for chunk in chunks) / totalSamples
+            samples = self._workBuffer if self.spectrumMode == 'fft' else np.zeros(self.freqBins_FFT, dtype=complex if self.complexFFT else float)
+            headSamples = 0
+            for chunk in chunks:
+                chunk = chunk[:len(samples) - headSamples]
+                samples[headSamples:headSamples+len(chunk)] = chunk if self.complexFFT else self._real_signal(chunk)
+                headSamples += len(chunk)
+                if headSamples == len(samples):
+                    break
+            samples = samples[:headSamples]
+            if self.offsetRemoval==True:
+                samples -= mean
+            if self.hanningWindowing==True:
+                samples *= self._window_head(totalSamples, headSamples)
+            FFT = self._spectrum(samples)
+        return self._result(self._spectrum_mV(FFT, totalSamples), antennaBeamDirection_DEG, tiltAngle_DEG)
+
+    def _window_head(self, totalSamples: int, headSamples: int):
+        # First samples of the Hamming window of the whole signal (np.hamming), without computing the rest
+        if headSamples == totalSamples:
+            return self.window(totalSamples)
+        return 0.54 - 0.46*np.cos(2*np.pi*np.arange(headSamples)/(totalSamples - 1))
+
+    def _result(self, FFT_mV, antennaBeamDirection_DEG: float, tiltAngle_DEG: float):
+        # Zero forcing, smoothing, Doppler centroid and surface velocity from the FFT magnitude (mV)
+        if self.zeroForcing == True and self.spectrumMode != 'zoom':
+            self._zero_force(FFT_mV)
         FFT_dBV = 20*np.log10(FFT_mV/1000)
         FFT_dBV_max = np.amax(FFT_dBV)
-        if smoothing == True:
-            FFT_dBV_smoothed = np.convolve(FFT_dBV, np.ones(smoothingBins), 'same') / smoothingBins
+        if self.smoothing == True:
+            FFT_dBV_smoothed = np.convolve(FFT_dBV, self.smoothingKernel, 'same') / self.smoothingBins
+            if self.spectrumMode == 'zoom':
+                self._smoothing_edges(FFT_dBV_smoothed)
             FFT_dBV_max_previous = FFT_dBV_max
             FFT_dBV_max = np.amax(FFT_dBV_smoothed)
             shift_of_FFT_max = FFT_dBV_max_previous - FFT_dBV_max # dB
-            print("After smoothing, the FTT peak is shifted by {:.1f} dB".format(shift_of_FFT_max))
-        freqAxis = np.fft.fftshift(np.fft.fftfreq(freqBins_FFT)) # freqBins+1
-        freqAxis_Hz = freqAxis * samplingFrequency
-        peakFreq = freqAxis_Hz[FFT_dBV.argmax()] # If two identical maxima, only the first occurrence is shown (negative frequency)
-    else: # FFT of real signal
-        print("real FFT to be completed")
-    
-    if (FFT_dBV_max < targetThreshold):
-        print('WARNING: Target not detected.')
-        centroid_frequency = 0 # Hz
-    elif (FFT_dBV_smoothed[minBin] >= FFT_dBV_max - bandwidthThreshold):
-        print('WARNING: The zero-forcing window is too narrow.')
-        raise ValueError
-    else:
-        # Doppler centroid
-        centroid_frequency, centroid_start, centroid_stop, centroid_threshold = centroid_estimation(FFT_dBV_smoothed, bandwidthThreshold, freqAxis_Hz, frequencyMin_fixed, FFT_dBV_max, freqBins_FFT)
-    surface_velocity = evaluate_surface_velocity(centroid_frequency, antennaBeamDirection_DEG, tiltAngle_DEG)
-    return FFT_dBV_max, centroid_frequency, centroid_start, centroid_stop, centroid_threshold, surface_velocity, FFT_dBV, FFT_dBV_smoothed, freqAxis_Hz
+            logger.debug("After smoothing, the FTT peak is shifted by %.1f dB", shift_of_FFT_max)
+        else:
+            FFT_dBV_smoothed = FFT_dBV
+
+        centroid_threshold = FFT_dBV_max - self.bandwidthThreshold
+        if (FFT_dBV_max < self.targetThreshold):
+            logger.warning('Target not detected.')
+            centroid_frequency = 0 # Hz
+            centroid_start = centroid_stop = 0 # Hz
+        elif (FFT_dBV_smoothed[self._firstBin] >= FFT_dBV_max - self.bandwidthThreshold):
+            logger.warning('The zero-forcing window is too narrow.')
+            raise ValueError
+        else:
+            # Doppler centroid
+            centroid_frequency, centroid_start, centroid_stop, centroid_threshold = centroid_estimation(FFT_dBV_smoothed, self.bandwidthThreshold, self.freqAxis_Hz, self.frequencyMin_fixed, FFT_dBV_max, self.freqBins_FFT, self.centroidMethod, self.contiguousBand)
+        surface_velocity = evaluate_surface_velocity(centroid_frequency, antennaBeamDirection_DEG, tiltAngle_DEG)
+        return FFTResult(FFT_dBV_max, centroid_frequency, centroid_start, centroid_stop, centroid_threshold, surface_velocity, FFT_dBV, FFT_dBV_smoothed, self.freqAxis_Hz)
+
+    def process_batch(self, signals_mV, antennaBeamDirections_DEG, tiltAngle_DEG, keepSpectra: bool = False):
+        '''
+        Vectorized process() for many acquisitions of the same length, e.g. signals_mV with shape
+        (EPISODES, DIRECTIONS, samples) and antennaBeamDirections_DEG with shape (DIRECTIONS,).
+        Directions and tilt angles must broadcast to signals_mV.shape[:-1].
+        Undetected targets give a centroid of 0 Hz (as process()); a zero-forcing window too narrow gives NaN.
+        :return: FFTBatchResult, arrays shaped as signals_mV.shape[:-1]. Spectra only if keepSpectra.
+        '''
+        signals_mV = np.asarray(signals_mV) if self.complexFFT else self._real_signal(signals_mV)
+        totalSamples = signals_mV.shape[-1]
+        if self.spectrumMode == 'welch':
+            FFT, totalSamples = self._welch(signals_mV)
+        else:
+            if self.offsetRemoval==True:
+                signals_mV = signals_mV - np.mean(signals_mV, axis=-1, keepdims=True)
+            if self.hanningWindowing==True:
+                signals_mV = signals_mV * self.window(totalSamples)
+            FFT = self._spectrum(signals_mV)
+        FFT_mV = self._spectrum_mV(FFT, totalSamples) # FFT magnitude
+        del FFT
+        if self.zeroForcing == True and self.spectrumMode != 'zoom':
+            self._zero_force(FFT_mV)
+        with np.errstate(divide='ignore'):
+            FFT_dBV = 20*np.log10(FFT_mV/1000)
+        del FFT_mV
+        if self.smoothing == True:
+            FFT_dBV_smoothed = _moving_average(FFT_dBV, self.smoothingBins)
+            if self.spectrumMode == 'zoom':
+                self._smoothing_edges(FFT_dBV_smoothed)
+        else:
+            FFT_dBV_smoothed = FFT_dBV
+        FFT_dBV_peaks = np.amax(FFT_dBV_smoothed, axis=-1)
+        centroid_thresholds = FFT_dBV_peaks - self.bandwidthThreshold
+
+        centroid_frequencies, centroid_starts, centroid_stops = _centroid_bands(FFT_dBV_smoothed, FFT_dBV_peaks, self.bandwidthThreshold, self.freqAxis_Hz, self.frequencyMin_fixed, self.centroidMethod, self.contiguousBand)
+        notDetected = FFT_dBV_peaks < self.targetThreshold
+        tooNarrow = ~notDetected & (FFT_dBV_smoothed[..., self._firstBin] >= centroid_thresholds)
+        for values in (centroid_frequencies, centroid_starts, centroid_stops):
+            values[notDetected] = 0 # Hz
+            values[tooNarrow] = np.nan
+        if np.any(notDetected):
+            logger.warning('Target not detected in %d of %d acquisitions.', np.count_nonzero(notDetected), notDetected.size)
+        if np.any(tooNarrow):
+            logger.warning('The zero-forcing window is too narrow for %d of %d acquisitions.', np.count_nonzero(tooNarrow), tooNarrow.size)
+        surface_velocities = _surface_velocity(centroid_frequencies, antennaBeamDirections_DEG, tiltAngle_DEG)
+        if not keepSpectra:
+            FFT_dBV = FFT_dBV_smoothed = None
+        return FFTBatchResult(FFT_dBV_peaks, centroid_frequencies, centroid_starts, centroid_stops, centroid_thresholds, surface_velocities, FFT_dBV, FFT_dBV_smoothed, self.freqAxis_Hz)
+
+STFT_TUKEY_ALPHA = 0.25 # Same window as scipy.signal.spectrogram() default.
+STFT_BATCH_COLUMNS = 32 # Columns transformed together by StreamingSTFT.update().
+
+def stft_columns(samples: int, SAMPLES_IN_SEGMENT: int, OVERLAPPING_SAMPLES: int):
+    # Spectral columns of a signal of the given length
+    return 0 if samples < SAMPLES_IN_SEGMENT else 1 + (samples - SAMPLES_IN_SEGMENT) // (SAMPLES_IN_SEGMENT - OVERLAPPING_SAMPLES)
+
+def _tukey_window(samples: int, alpha: float = STFT_TUKEY_ALPHA):
+    # Periodic Tukey window, as scipy.signal.windows.tukey(samples, alpha, sym=False)
+    if samples <= 1:
+        return np.ones(samples)
+    n = samples + 1
+    x = np.arange(n)
+    width = int(np.floor(alpha*(n-1)/2.0))
+    window = np.ones(n)
+    window[:width+1] = 0.5*(1 + np.cos(np.pi*(-1 + 2.0*x[:width+1]/alpha/(n-1))))
+    window[n-width-1:] = 0.5*(1 + np.cos(np.pi*(-2.0/alpha + 1 + 2.0*x[n-width-1:]/alpha/(n-1))))
+    return window[:-1]
+
+class StreamingWelch:
+    '''
+    Welch spectrum (see FFTPlan, spectrumMode 'welch') of a signal fed in chunks of any length, e.g. a capture read
+    from disk. Chunks are copied into a buffer reused from one update to the next; only the samples of the segments
+    not yet complete are kept. Memory is set by the chunk and segment lengths, not by the signal length.
+    '''
+    def __init__(self, fftPlan, totalSamples: int):
+        self.fftPlan = fftPlan
+        self.segmentSamples = fftPlan.welch_segment_samples(totalSamples)
+        self.hop = fftPlan.welch_hop()
+        self.power = np.zeros(fftPlan.freqBins_FFT if fftPlan.complexFFT else fftPlan.freqBins_FFT//2 + 1)
+        self.segments = 0
+        self._buffer = np.zeros(max(self.segmentSamples, 1) + WELCH_BATCH_SEGMENTS*self.hop, dtype=complex if fftPlan.complexFFT else float)
+        self._buffered = 0 # Samples in the buffer, not yet used by a complete segment.
+        self._skip = 0 # Samples to drop before the next segment: segments shorter than the hop (truncated to freqBins_FFT).
+
+    def update(self, samples_mV):
+        # Add the next chunk of samples (complex, or the channel of the real FFT)
+        if not self.fftPlan.complexFFT:
+            samples_mV = self.fftPlan._real_signal(samples_mV)
+        while len(samples_mV) > 0:
+            skipped = min(self._skip, len(samples_mV))
+            samples_mV = samples_mV[skipped:]
+            self._skip -= skipped
+            copied = min(len(samples_mV), len(self._buffer) - self._buffered)
+            self._buffer[self._buffered:self._buffered+copied] = samples_mV[:copied]
+            self._buffered += copied
+            samples_mV = samples_mV[copied:]
+            if self._buffered >= self.segmentSamples:
+                segments = 1 + (self._buffered - self.segmentSamples) // self.hop
+                view = np.lib.stride_tricks.sliding_window_view(self._buffer[:self._buffered], self.segmentSamples)[:segments*self.hop:self.hop]
+                self.fftPlan._welch_accumulate(self.power, view)
+                self.segments += segments
+                remaining = self._buffered - segments*self.hop
+                self._buffer[:max(remaining, 0)] = self._buffer[segments*self.hop:self._buffered]
+                self._buffered = max(remaining, 0)
+                self._skip = max(-remaining, 0)
+
+    def spectrum(self):
+        '''
+        :return: Root mean square of the segment spectra and segment length, as FFTPlan._welch().
+        '''
+        return self.fftPlan._welch_rms(self.power.copy(), self.segments), self.segmentSamples
+
+class StreamingSTFT:
+    '''
+    Short-time Fourier transform of a complex signal fed in chunks of any length (e.g. as frames arrive
+    from the serial port). One spectral column is emitted every (SAMPLES_IN_SEGMENT - OVERLAPPING_SAMPLES)
+    samples; only the samples needed by the next column are kept between updates, in a preallocated buffer.
+    Spectral columns are kept for spectrogram(): all of them, or the last maxColumns in a preallocated ring.
+    Columns match scipy.signal.spectrogram(..., scaling='spectrum', return_onesided=False, detrend=False),
+    with frequencies in ascending order (fftshift).
+    With a bandwidth threshold, a Doppler centroid is evaluated on each column (centroid track).
+    '''
+    def __init__(self, samplingFrequency: float, SAMPLES_IN_SEGMENT: int, OVERLAPPING_SAMPLES: int, STFT_BINS: int, bandwidthThreshold=None, targetThreshold: float = -np.inf, frequencyMin=None, frequencyMax=None, centroidMethod: str = 'band-center', contiguousBand: bool = False, maxColumns=None):
+        assert 0 <= OVERLAPPING_SAMPLES < SAMPLES_IN_SEGMENT, "Overlapping samples should be less than samples in segment."
+        assert STFT_BINS >= SAMPLES_IN_SEGMENT, "STFT bins should be at least equal to samples in segment."
+        self.samplingFrequency = samplingFrequency
+        self.SAMPLES_IN_SEGMENT = SAMPLES_IN_SEGMENT
+        self.OVERLAPPING_SAMPLES = OVERLAPPING_SAMPLES
+        self.STFT_BINS = STFT_BINS
+        self.hop = SAMPLES_IN_SEGMENT - OVERLAPPING_SAMPLES
+        self.window = _tukey_window(SAMPLES_IN_SEGMENT)
+        self.scale = 1/np.sum(self.window)**2 # 'spectrum' scaling: power of each tone, mV^2.
+        self.freqAxis_Hz = np.fft.fftshift(np.fft.fftfreq(STFT_BINS, 1/samplingFrequency))
+        self.bandwidthThreshold = bandwidthThreshold
+        self.targetThreshold = targetThreshold
+        self.frequencyMin = self.freqAxis_Hz[0] if frequencyMin is None else frequencyMin
+        self.frequencyMax = self.freqAxis_Hz[-1] if frequencyMax is None else frequencyMax
+        self.outOfBand = (self.freqAxis_Hz < self.frequencyMin) | (self.freqAxis_Hz > self.frequencyMax)
+        self.centroidMethod = centroidMethod
+        self.contiguousBand = contiguousBand
+        self.maxColumns = maxColumns # Spectral columns kept for spectrogram(). None: all of them.
+        self._buffer = np.zeros(SAMPLES_IN_SEGMENT + (STFT_BATCH_COLUMNS - 1)*self.hop, dtype=complex) # Samples of the next columns.
+        self._ring = None if maxColumns is None else np.zeros((maxColumns, STFT_BINS))
+        self.reset()
+
+    @classmethod
+    def from_plan(cls, fftPlan, SAMPLES_IN_SEGMENT: int, OVERLAPPING_SAMPLES: int, STFT_BINS: int, maxColumns=None):
+        # Centroid track with the thresholds, zero-forcing band and centroid method of an FFTPlan
+        frequencyMin, frequencyMax = (fftPlan.frequencyMin_fixed, fftPlan.frequencyMax_fixed) if fftPlan.zeroForcing else (None, None)
+        return cls(fftPlan.samplingFrequency, SAMPLES_IN_SEGMENT, OVERLAPPING_SAMPLES, STFT_BINS, fftPlan.bandwidthThreshold, fftPlan.targetThreshold, frequencyMin, frequencyMax, fftPlan.centroidMethod, fftPlan.contiguousBand, maxColumns)
+
+    @classmethod
+    def from_settings(cls, signalProcessingSettings: dict, samplingFrequency: float, fftPlan=None, maxColumns=None):
+        '''
+        STFT from the "signal-processing" block of settings.json (stft-samples-in-segment, stft-overlapping-samples, stft-bins).
+        With an FFTPlan, the centroid track uses its thresholds, zero-forcing band and centroid method.
+        '''
+        SAMPLES_IN_SEGMENT = int(signalProcessingSettings["stft-samples-in-segment"])
+        OVERLAPPING_SAMPLES = int(signalProcessingSettings["stft-overlapping-samples"])
+        STFT_BINS = int(signalProcessingSettings["stft-bins"])
+        if fftPlan is None:
+            return cls(samplingFrequency, SAMPLES_IN_SEGMENT, OVERLAPPING_SAMPLES, STFT_BINS, maxColumns=maxColumns)
+        return cls.from_plan(fftPlan, SAMPLES_IN_SEGMENT, OVERLAPPING_SAMPLES, STFT_BINS, maxColumns)
+
+    def reset(self):
+        # Start a new signal
+        self._buffered = 0 # Samples in the buffer, not yet used by a complete segment.
+        self._consumed = 0 # Samples dropped from the head of the signal so far.
+        self._times = []
+        self._columns = [] # Without maxColumns.
+        self._columnsWritten = 0 # With maxColumns: columns written to the ring so far.
+        self._peaks = []
+        self._centroids = []
+
+    def update(self, samples_mV):
+        '''
+        Add the next chunk of samples.
+        :return: STFTColumns with the columns completed by this chunk (possibly none).
+        '''
+        samples_mV = np.asarray(samples_mV)
+        completed = []
+        while True:
+            copied = min(len(samples_mV), len(self._buffer) - self._buffered)
+            self._buffer[self._buffered:self._buffered+copied] = samples_mV[:copied]
+            self._buffered += copied
+            samples_mV = samples_mV[copied:]
+            if self._buffered < self.SAMPLES_IN_SEGMENT: # Chunk used up, segment not complete yet
+                break
+            columns = 1 + (self._buffered - self.SAMPLES_IN_SEGMENT) // self.hop
+            segments = np.lib.stride_tricks.sliding_window_view(self._buffer[:self._buffered], self.SAMPLES_IN_SEGMENT)[:columns*self.hop:self.hop]
+            completed.append(self._add_columns(segments))
+            remaining = self._buffered - columns*self.hop
+            self._buffer[:remaining] = self._buffer[columns*self.hop:self._buffered]
+            self._buffered = remaining
+            if len(samples_mV) == 0:
+                break
+        if len(completed) == 1:
+            return completed[0]
+        if len(completed) == 0:
+            return STFTColumns(np.zeros(0), np.zeros((0, self.STFT_BINS)), np.zeros(0), np.zeros(0))
+        return STFTColumns(*(np.concatenate(values) for values in zip(*completed)))
+
+    def _add_columns(self, segments):
+        # Spectra and centroid track of complete segments, kept for track() and spectrogram()
+        columns = len(segments)
+        spectra = np.fft.fftshift(np.fft.fft(segments * self.window, n=self.STFT_BINS, axis=-1), axes=-1)
+        spectra = (spectra.real**2 + spectra.imag**2) * self.scale
+        times_s = (self._consumed + np.arange(columns)*self.hop + self.SAMPLES_IN_SEGMENT/2) / self.samplingFrequency
+        peaks_dBV, centroid_frequencies = self._centroid_track(spectra)
+        self._consumed += columns*self.hop
+        self._times.append(times_s)
+        self._peaks.append(peaks_dBV)
+        self._centroids.append(centroid_frequencies)
+        if self.maxColumns is None:
+            self._columns.append(spectra)
+        elif self.maxColumns > 0:
+            skipped = max(columns - self.maxColumns, 0) # Overwritten anyway
+            self._ring[(self._columnsWritten + skipped + np.arange(columns - skipped)) % self.maxColumns] = spectra[skipped:]
+            self._columnsWritten += columns
+        return STFTColumns(times_s, spectra, peaks_dBV, centroid_frequencies)
+
+    def _centroid_track(self, spectra):
+        # Peak (dBV) and Doppler centroid (Hz) of each column. Centroid is NaN if the target is not detected.
+        if self.bandwidthThreshold is None or len(spectra) == 0:
+            return np.full(len(spectra), np.nan), np.full(len(spectra), np.nan)
+        with np.errstate(divide='ignore'):
+            spectra_dBV = 10*np.log10(np.where(self.outOfBand, 0, spectra)) - 60 # mV^2 to V^2
+        peaks_dBV = np.amax(spectra_dBV, axis=-1)
+        centroid_frequencies, centroid_starts, centroid_stops = _centroid_bands(spectra_dBV, peaks_dBV, self.bandwidthThreshold, self.freqAxis_Hz, self.frequencyMin, self.centroidMethod, self.contiguousBand)
+        centroid_frequencies[peaks_dBV < self.targetThreshold] = np.nan
+        return peaks_dBV, centroid_frequencies
+
+    def track(self):
+        '''
+        Centroid track of the signal since the last reset().
+        :return: STFTColumns without spectra (see spectrogram()).
+        '''
+        concatenate = lambda values: np.concatenate(values) if values else np.zeros(0)
+        return STFTColumns(concatenate(self._times), None, concatenate(self._peaks), concatenate(self._centroids))
+
+    def surface_velocities(self, antennaBeamDirection_DEG: float, tiltAngle_DEG: float):
+        # Surface velocity along the centroid track
+        return _surface_velocity(self.track().centroid_frequencies, antennaBeamDirection_DEG, tiltAngle_DEG)
+
+    def spectrogram(self):
+        '''
+        Kept spectral columns, in the layout of scipy.signal.spectrogram() (after fftshift).
+        :return: Frequency axis (Hz), time axis (s), spectrogram with shape (STFT_BINS, columns).
+        '''
+        if self.maxColumns is None:
+            columns = np.concatenate(self._columns) if self._columns else np.zeros((0, self.STFT_BINS))
+        else:
+            kept = min(self._columnsWritten, self.maxColumns)
+            columns = self._ring[(self._columnsWritten - kept + np.arange(kept)) % max(self.maxColumns, 1)]
+        times_s = self.track().times_s
+        times_s = times_s[len(times_s) - len(columns):]
+        return self.freqAxis_Hz, times_s, columns.T
+
+def FFT(signal_mV, complexFFT: bool, totalSamples: int, samplingFrequency: float, freqBins_FFT, offsetRemoval: bool, hanningWindowing: bool, zeroForcing: bool, minBin, maxBin, smoothing: bool, smoothingBins, targetThreshold: float, bandwidthThreshold: float, frequencyMin_fixed, antennaBeamDirection_DEG: float, tiltAngle_DEG: float, FFT_initialized=False):
+    assert FFT_initialized, "FFT not initialized. Use \'FFT_parameters()\' from signal_processing.py costum module."
+    # One-off plan. Build an FFTPlan once, and call its process() method, to avoid repeating this setup on every call.
+    frequencyMax_fixed = (maxBin - freqBins_FFT/2 if complexFFT else maxBin) * samplingFrequency/freqBins_FFT
+    plan = FFTPlan(complexFFT, samplingFrequency, freqBins_FFT, smoothingBins, minBin, maxBin, frequencyMin_fixed, frequencyMax_fixed, offsetRemoval, hanningWindowing, zeroForcing, smoothing, targetThreshold, bandwidthThreshold)
+    return plan.process(signal_mV[:totalSamples], antennaBeamDirection_DEG, tiltAngle_DEG)
 
 if __name__ == "__main__":
     print("Standalone script not yet developed.")
\ No newline at end of file
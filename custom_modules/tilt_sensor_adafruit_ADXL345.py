@@ -181,5 +181,9 @@ def sleep_mode(accelerometer):
     # Accelerometer in sleep mode
     accelerometer._write_register_byte(adafruit_adxl34x._REG_BW_RATE, 0b00000100)
 
+def wake_up(accelerometer):
+    # Same data rate and power mode as setup_ADX345()
+    accelerometer._write_register_byte(adafruit_adxl34x._REG_BW_RATE, 0b00001000)
+
 if __name__ == "__main__":
     print("Standalone script not yet delevoped.")
\ No newline at end of file
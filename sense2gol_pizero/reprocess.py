@@ -0,0 +1,127 @@
+#!/usr/bin/python
+# Offline reprocessing of archived Sense2GoL raw captures (no hardware needed)
+#
+# Usage (from the repository root):
+#   python sense2gol_pizero/reprocess.py <captures folder> <settings *.json> [--workers N] [--report-path PATH] [--database FILE]
+# The settings file is usually the snapshot saved by river_monitoring_doppler.py in the output folder,
+# possibly edited (thresholds, smoothing...) before reprocessing.
+
+import argparse
+import glob
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+sys.path.insert(1, ".")
+import numpy as np
+
+from custom_modules.raw_capture import CAPTURE_EXTENSION, CaptureStream, parse_capture_label
+from custom_modules.results_store import ResultsStore
+from custom_modules.sense2gol import raw_extract, write_report
+from custom_modules.settings import get_settings
+
+_worker = {} # Settings of the current worker process, see _init_worker().
+
+def find_captures(path):
+    '''
+    List the raw captures (*.bin and *.txt) in a folder, in acquisition order.
+    Files whose name does not follow the acquisition naming scheme (e.g. reports) are ignored,
+    and so are *.txt captures already converted to binary.
+    :return: List of (file name, labels dictionary).
+    '''
+    captures = []
+    for fileName in sorted(glob.glob(os.path.join(path, '*' + CAPTURE_EXTENSION)) + glob.glob(os.path.join(path, '*.txt'))):
+        if fileName.endswith('.txt') and os.path.exists(os.path.splitext(fileName)[0] + CAPTURE_EXTENSION):
+            continue
+        labels = parse_capture_label(fileName)
+        if labels is not None:
+            captures.append((fileName, labels))
+    captures.sort(key=lambda capture: capture[1]['timestamp'])
+    return captures
+
+def split_campaigns(captures):
+    '''
+    Group consecutive captures into scans (campaigns): a new campaign starts when an
+    (episode, direction) slot is acquired again, or when the number of episodes changes.
+    :return: List of campaigns, each one a list of (file name, labels dictionary).
+    '''
+    campaigns = []
+    slots = set()
+    for fileName, labels in captures:
+        slot = (labels['episode'], labels['direction_DEG'])
+        if not campaigns or slot in slots or labels['episodes'] != campaigns[-1][0][1]['episodes']:
+            campaigns.append([])
+            slots = set()
+        campaigns[-1].append((fileName, labels))
+        slots.add(slot)
+    return campaigns
+
+def _init_worker(fftPlan, ADC_RANGE_BITS, ADC_RANGE_V, SAMPLING_FREQUENCY, STREAM_CHUNK_SAMPLES, verbose):
+    _worker.update(fftPlan=fftPlan, ADC_RANGE_BITS=ADC_RANGE_BITS, ADC_RANGE_V=ADC_RANGE_V, SAMPLING_FREQUENCY=SAMPLING_FREQUENCY, STREAM_CHUNK_SAMPLES=STREAM_CHUNK_SAMPLES)
+    # Console log of every capture (DEBUG records) only if verbose, warnings anyway
+    logging.basicConfig(level=logging.DEBUG if verbose else logging.WARNING, format='%(message)s', stream=sys.stdout)
+
+def process_capture(fileName, direction_DEG, tiltAngle_DEG):
+    # Extraction and FFT of one capture, in a worker process
+    fftPlan = _worker['fftPlan']
+    if _worker['STREAM_CHUNK_SAMPLES'] > 0 and fileName.endswith(CAPTURE_EXTENSION):
+        # Binary capture mapped in memory, converted and processed chunk by chunk
+        signalStream = CaptureStream.from_file(fileName, fftPlan.complexFFT, fftPlan.channel, _worker['STREAM_CHUNK_SAMPLES'])
+        result = fftPlan.process_stream(signalStream, len(signalStream), direction_DEG, tiltAngle_DEG)
+    else:
+        I_array_mV, Q_array_mV, complexSignal_mV, timeAxis_s, IQ_arrays_length = raw_extract(fileName, _worker['ADC_RANGE_BITS'], _worker['ADC_RANGE_V'], _worker['SAMPLING_FREQUENCY'])
+        result = fftPlan.process(complexSignal_mV, direction_DEG, tiltAngle_DEG)
+    return result.FFT_dBV_max, result.centroid_frequency, result.surface_velocity, result.centroid_start, result.centroid_stop
+
+def main():
+    parser = argparse.ArgumentParser(description="Reprocess archived Sense2GoL raw captures and generate the surface velocity reports.")
+    parser.add_argument('captures', help="Folder with the raw captures (*.bin or *.txt).")
+    parser.add_argument('settings', help="Settings *.json file used for processing (e.g. the snapshot saved with the captures).")
+    parser.add_argument('--workers', type=int, default=None, help="Number of worker processes (default: number of CPUs).")
+    parser.add_argument('--report-path', default=None, help="Folder for the reports (default: captures folder).")
+    parser.add_argument('--database', default=None, help="Results database (*.sqlite) where the reprocessed results are appended.")
+    parser.add_argument('--verbose', action='store_true', help="Show the console log of every capture.")
+    args = parser.parse_args()
+
+    # Settings summary and warnings on the console
+    logging.basicConfig(level=logging.INFO, format='%(message)s', stream=sys.stdout)
+    settings = get_settings(args.settings)
+    settings.print_summary()
+    reportPath = args.captures if args.report_path is None else args.report_path
+
+    captures = find_captures(args.captures)
+    campaigns = split_campaigns(captures)
+    print("{:d} captures found, {:d} scan(s).".format(len(captures), len(campaigns)))
+
+    resultsStore = None if args.database is None else ResultsStore(args.database).open()
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(settings.fftPlan, settings.adcRangeBits, getattr(settings.radar, 'adcRange_V', None), settings.samplingFrequency, settings.signalProcessing.streamChunkSamples, args.verbose)) as executor:
+        # Submit everything first, so that the pool is never idle between campaigns
+        futures = [[executor.submit(process_capture, fileName, labels['direction_DEG'], labels['tilt_DEG']) for fileName, labels in campaign] for campaign in campaigns]
+        for campaign, campaignFutures in zip(campaigns, futures):
+            directions_DEG = sorted(set(labels['direction_DEG'] for fileName, labels in campaign))
+            episodes = campaign[0][1]['episodes']
+            # Missing acquisitions are left as NaN
+            FFT_dBV_peaks = np.full((episodes, len(directions_DEG)), np.nan)
+            centroid_frequencies = np.full((episodes, len(directions_DEG)), np.nan)
+            surface_velocities_table = np.full((episodes, len(directions_DEG)), np.nan)
+            for (fileName, labels), future in zip(campaign, campaignFutures):
+                episode, direction = labels['episode'], directions_DEG.index(labels['direction_DEG'])
+                FFT_dBV_peaks[episode,direction], centroid_frequencies[episode,direction], surface_velocities_table[episode,direction], centroid_start, centroid_stop = future.result()
+                if resultsStore is not None:
+                    resultsStore.append(datetime.strptime(labels['timestamp'], "%Y%m%d_%H%M%S_%f"), campaign[0][1]['timestamp'], episode, labels['direction_DEG'], labels['tilt_DEG'], FFT_dBV_peaks[episode,direction], centroid_frequencies[episode,direction], centroid_start, centroid_stop, surface_velocities_table[episode,direction], FFT_dBV_peaks[episode,direction] >= settings.fftPlan.targetThreshold)
+            text = "SCAN {} ({:d} captures)".format(campaign[0][1]['timestamp'], len(campaign))
+            print(f"{text:-^60}")
+            print('[EP.,\tDEG,\tdBV,\tHz,\tm/s]')
+            for episode in range(episodes):
+                for direction in range(len(directions_DEG)):
+                    print('[{:d},\t{:.1f},\t{:.1f},\t{:.1f},\t{:.3f}]'.format(episode+1, directions_DEG[direction], FFT_dBV_peaks[episode,direction], centroid_frequencies[episode,direction], surface_velocities_table[episode,direction]))
+            reportFileName = campaign[0][1]['timestamp'] + "_reprocessed_report.txt"
+            write_report(os.path.join(reportPath, reportFileName), FFT_dBV_peaks, centroid_frequencies, surface_velocities_table, directions_DEG, True, settings.statistics.enabled and episodes >= 3)
+            print("Report:", os.path.join(reportPath, reportFileName))
+    if resultsStore is not None:
+        resultsStore.close()
+    print('Done.')
+
+if __name__ == "__main__":
+    main()
@@ -1,122 +1,332 @@
 #!/usr/bin/python
 # River monitoring using Sense2GoL Doppler radar
 
+import time
+STARTUP_TIME = time.perf_counter()
+import argparse
 import glob
+import logging
 import os
 import sys
 from datetime import datetime
 sys.path.insert(1, ".")
 import shutil
-from scipy import stats
 import numpy as np
 
-from custom_modules.plots_readytouse import plot_doppler_centroid, plot_IFI_IFQ, plot_spectrogram
-from custom_modules.sense2gol import txt_extract, serialPort_acquisition, load_settings
-from custom_modules.servo_motor import define_PWM_pin, rotate_servo_to_angle, shut_down_servo
-from custom_modules.signal_processing import FFT
+# Plots (matplotlib), statistics (scipy) and the plot worker are imported in main(), only if the settings need them.
+from custom_modules.import_timing import print_import_report, record_import_time, timed_import
+from custom_modules.instrumentation import METRICS, instrumented, span
+from custom_modules.logging_setup import configure_logging
+from custom_modules.online_statistics import DirectionStatistics
+from custom_modules.results_store import ResultsStore
+from custom_modules.scan_pipeline import ScanPipeline
+from custom_modules.devices import open_radar, open_servo
+from custom_modules.sense2gol import AcquisitionIncomplete, raw_extract, write_report
+from custom_modules.scheduler import make_schedule, run_forever
+from custom_modules.settings import DEFAULT_SETTINGS_FILE, get_settings, SettingsWatcher
+from custom_modules.signal_processing import StreamingSTFT, stft_columns
 from custom_modules.antenna_footprint import evaluate_antenna_footprint
+record_import_time('core (numpy, custom modules)', time.perf_counter() - STARTUP_TIME)
 
-def main():
-    HEIGHT_FROM_WATER_LEVEL, ANTENNA_BEAM_WIDTH_ELEVATION, ANTENNA_BEAM_WIDTH_AZIMUTH, SAMPLING_FREQUENCY, lines_to_be_read, ADC_RANGE_BITS, ADC_RANGE_V, COMPLEX_FFT, SMOOTHING, BANDWIDTH_THRESHOLD, HANNING_WINDOWING, ZERO_FORCING, FFT_initialized, freqBins_FFT, smoothingBins, minBin, frequencyMin_fixed, maxBin, frequencyMax_fixed, OFFSET_REMOVAL, SPECTROGRAM_ENABLED, STFT_OVERLAPPING_SAMPLES, STFT_SAMPLES_IN_SEGMENT, STFT_BINS, PWM_PIN, PWM_FREQUENCY, RAW_DATA, SHOW_FIGURE, SAVE_PLOTS, PNG_PLOT, PDF_PLOT, PLOT_PATH, REALTIME_MEAS, TARGET_THRESHOLD, DIRECTIONS, antennaBeamDirections_DEG, tiltAngle_DEG, tiltAngle_DEG_str, STATISTICAL_ANALYSIS, EPISODES = load_settings()
-
-    # Antenna footprint evaluation
-    evaluate_antenna_footprint(HEIGHT_FROM_WATER_LEVEL, ANTENNA_BEAM_WIDTH_ELEVATION, ANTENNA_BEAM_WIDTH_AZIMUTH, tiltAngle_DEG, antennaBeamDirections_DEG, SHOW_FIGURE, SAVE_PLOTS, PDF_PLOT, PNG_PLOT, PLOT_PATH)
-
-    # Save current *.json settings file for offline analysis
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-    json_filename = "./sense2gol_pizero/output/" + timestamp + ".json"
-    shutil.copyfile("./sense2gol_pizero/settings.json",json_filename)
-    
-    # Array to save FFT peak amplitudes and frequencies
-    FFT_dBV_peaks = np.zeros((EPISODES, DIRECTIONS))
-    centroid_frequencies = np.zeros((EPISODES, DIRECTIONS))
-    surface_velocities_table = np.zeros((EPISODES, DIRECTIONS))
-
-    # Initiate servo motor
-    servo_motor = define_PWM_pin(PWM_PIN, PWM_FREQUENCY)
-
-    for episode in range(EPISODES):
-        text = "EPISODE {:d} OF {:d}".format(episode+1, EPISODES)
-        print(f"{text:-^60}")
-        for direction in range(DIRECTIONS):
+logger = logging.getLogger(__name__)
+
+class RiverMonitor:
+    '''
+    Scanning station: servo, Sense2GoL connection, results database, plot worker and optional modules, kept between scans.
+    Servo and Sense2GoL are real or simulated, as set in the "devices" settings (see custom_modules/devices.py).
+    configure() applies new settings, reopening only the hardware whose settings changed;
+    scan() runs one campaign (EPISODES x DIRECTIONS) and writes its report.
+    '''
+    def __init__(self, settings):
+        self.settings = None
+        self.servoMotor = None
+        self.sense2gol = None
+        self.resultsStore = None
+        self.plotter = None
+        self.plots = None
+        self.configure(settings)
+
+    def configure(self, settings):
+        previous, self.settings = self.settings, settings
+        installation, radar, platform = settings.installation, settings.radar, settings.platform
+        # Console verbosity (DEBUG: per-measurement diagnostics), written by a listener thread
+        configure_logging(platform.logLevel, platform.logModuleLevels, platform.logFile)
+        settings.print_summary()
+        SHOW_FIGURE, SAVE_PLOTS = platform.showFigure, platform.savePlots
+
+        # Optional dependencies
+        if settings.statistics.enabled == True:
+            timed_import('scipy.stats') # Normality test
+        asyncPlots = platform.asyncPlots and SAVE_PLOTS and not SHOW_FIGURE
+        if self.plotter is not None and (not asyncPlots or platform.plotBacklogPolicy != self.plotter.policy):
+            self.plotter.close()
+            self.plotter = None
+        if asyncPlots and self.plotter is None:
+            # Plots saved by a separate process (figures can't be shown from there)
+            self.plotter = timed_import('custom_modules.plot_worker').PlotWorker(platform.plotBacklogPolicy)
+            self.plotter.start()
+        elif not asyncPlots and (SAVE_PLOTS or SHOW_FIGURE):
+            self.plots = timed_import('custom_modules.plots_readytouse')
+        if platform.importTimingReport == True:
+            print_import_report()
+
+        # Antenna footprint evaluation
+        evaluate_antenna_footprint(installation.heightFromWaterLevel_m, installation.antennaBeamWidthElevation_DEG, installation.antennaBeamWidthAzimuth_DEG, settings.tiltAngle_DEG, settings.antennaBeamDirections_DEG, SHOW_FIGURE, SAVE_PLOTS, platform.pdfPlot, platform.pngPlot, platform.plotPath)
+
+        # Save current *.json settings file for offline analysis
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        json_filename = "./sense2gol_pizero/output/" + timestamp + ".json"
+        shutil.copyfile(settings.fileName, json_filename)
+
+        # Initiate servo motor
+        if previous is None or (platform.pwmPin, platform.pwmFrequency_Hz, settings.devices.servo) != (previous.platform.pwmPin, previous.platform.pwmFrequency_Hz, previous.devices.servo):
+            if self.servoMotor is not None:
+                self.servoMotor.close()
+                self.servoMotor = None
+            self.servoMotor = open_servo(settings)
+        # Connect to the Sense2GoL once, for all the scans
+        if previous is None or (radar.serialPorts, radar.usbIds, radar.baudRate, settings.devices) != (previous.radar.serialPorts, previous.radar.usbIds, previous.radar.baudRate, previous.devices):
+            if self.sense2gol is not None:
+                self.sense2gol.close()
+            self.sense2gol = open_radar(settings)
+        # Results appended to the database as soon as they are available
+        if previous is None or platform.resultsDatabase != previous.platform.resultsDatabase:
+            if self.resultsStore is not None:
+                self.resultsStore.close()
+                self.resultsStore = None
+            if platform.resultsDatabase:
+                self.resultsStore = ResultsStore(platform.resultsDatabase).open()
+        # Time, CPU and memory of each stage: JSON lines and Prometheus endpoint
+        METRICS.configure(platform.metricsFile, platform.metricsFileMaxBytes, platform.metricsFileBackups, platform.metricsPort, platform.metricsAddress)
+
+    def sleep(self):
+        # Between scans: servo PWM stopped. The serial port stays open (input discarded before each acquisition).
+        self.servoMotor.sleep()
+
+    def wake_up(self):
+        self.servoMotor.wake_up()
+
+    def close(self):
+        if self.plotter is not None:
+            self.plotter.close()
+            self.plotter = None
+        if self.resultsStore is not None:
+            self.resultsStore.close()
+            self.resultsStore = None
+        # Close serial connection
+        if self.sense2gol is not None:
+            self.sense2gol.close()
+        # End servo motor control
+        if self.servoMotor is not None:
+            self.servoMotor.close()
+            self.servoMotor = None
+        METRICS.close()
+
+    @instrumented('scan')
+    def scan(self):
+        settings = self.settings
+        radar, signalProcessing, platform = settings.radar, settings.signalProcessing, settings.platform
+        SAMPLING_FREQUENCY = settings.samplingFrequency # Hz
+        ADC_RANGE_BITS = settings.adcRangeBits
+        SAMPLES_PER_FRAME = radar.samplesPerFrame
+        fftPlan = settings.fftPlan
+        SPECTROGRAM_ENABLED = signalProcessing.spectrogramEnabled
+        STFT_OVERLAPPING_SAMPLES, STFT_SAMPLES_IN_SEGMENT, STFT_BINS = signalProcessing.stftOverlappingSamples, signalProcessing.stftSamplesInSegment, signalProcessing.stftBins
+        SHOW_FIGURE, SAVE_PLOTS, PNG_PLOT, PDF_PLOT, PLOT_PATH = platform.showFigure, platform.savePlots, platform.pngPlot, platform.pdfPlot, platform.plotPath
+        REALTIME_MEAS = platform.realtimeMeasurements
+        DIRECTIONS = platform.directions
+        antennaBeamDirections_DEG = settings.antennaBeamDirections_DEG
+        tiltAngle_DEG, tiltAngle_DEG_str = settings.tiltAngle_DEG, settings.tiltAngle_DEG_str
+        STATISTICAL_ANALYSIS, EPISODES, NORMALITY_WINDOW = settings.statistics.enabled, settings.statistics.episodes, settings.statistics.normalityWindow
+        PLOTS_ENABLED = SAVE_PLOTS or SHOW_FIGURE
+        servo_motor, sense2gol, resultsStore, plotter, plots = self.servoMotor, self.sense2gol, self.resultsStore, self.plotter, self.plots
+        campaign = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+
+        # Array to save FFT peak amplitudes and frequencies
+        FFT_dBV_peaks = np.zeros((EPISODES, DIRECTIONS))
+        centroid_frequencies = np.zeros((EPISODES, DIRECTIONS))
+        surface_velocities_table = np.zeros((EPISODES, DIRECTIONS))
+        # Running statistics of the surface velocity, updated after each acquisition (live normality test on the last NORMALITY_WINDOW values)
+        velocityStatistics = DirectionStatistics(DIRECTIONS, normalityWindow=NORMALITY_WINDOW)
+        # Spectrogram columns of one acquisition: the last ones are kept if the device sends more samples than requested
+        STFT_COLUMNS = stft_columns(radar.frames * SAMPLES_PER_FRAME, STFT_SAMPLES_IN_SEGMENT, STFT_OVERLAPPING_SAMPLES)
+        COUNTS_TO_mV = radar.adcRange_V / ADC_RANGE_BITS * 1000
+
+        @instrumented('acquisition')
+        def acquire_direction(episode, direction):
             text = "Scanning direction " + str(direction+1) + " of " + str(DIRECTIONS)
-            print(f"{text:-^60}")
+            logger.info(f"{text:-^60}")
             direction_DEG = antennaBeamDirections_DEG[direction]
             direction_DEG_str = "dir" + str("{0:.1f}".format(direction_DEG)) + "deg"
-            rotate_servo_to_angle(servo_motor, direction_DEG)
+            with span('servo'):
+                servo_motor.rotate(direction_DEG)
+
+            # STFT fed as the samples arrive from the serial port (one per acquisition: the pipelined scan overlaps them)
+            stft = onSamples = None
+            if SPECTROGRAM_ENABLED:
+                stft = StreamingSTFT.from_plan(fftPlan, STFT_SAMPLES_IN_SEGMENT, STFT_OVERLAPPING_SAMPLES, STFT_BINS, STFT_COLUMNS)
+                def onSamples(firstSample, I_samples, Q_samples):
+                    with span('stft'):
+                        if firstSample == 0: # Acquisition (re)started
+                            stft.reset()
+                        # Seems that Q and I needs to be inverted (same as txt_extract)
+                        stft.update((Q_samples + 1j*I_samples) * COUNTS_TO_mV)
 
             # Acquisition from serial port
-            completeFileName = serialPort_acquisition(tiltAngle_DEG_str, episode, EPISODES, direction_DEG_str, lines_to_be_read)
+            try:
+                completeFileName = sense2gol.acquire(tiltAngle_DEG_str, episode, EPISODES, direction_DEG_str, radar.frames, SAMPLES_PER_FRAME, settings.serialBufferSize, radar.serialTimeout_s, platform.rawDataFormat, SAMPLING_FREQUENCY, ADC_RANGE_BITS, radar.adcRange_V, tiltAngle_DEG, direction_DEG, onSamples)
+            except AcquisitionIncomplete as error:
+                # Truncated acquisition: direction skipped (NaN in the tables), raw data kept for diagnosis
+                logger.warning("Direction %.1f deg skipped: %s", direction_DEG, error)
+                completeFileName = None
+            return episode, direction, direction_DEG, completeFileName, time.time(), stft
 
+        @instrumented('processing')
+        def process_direction(acquisition):
+            episode, direction, direction_DEG, completeFileName, acquisitionTime, stft = acquisition
+            if completeFileName is None: # Acquisition incomplete
+                FFT_dBV_peaks[episode,direction] = centroid_frequencies[episode,direction] = surface_velocities_table[episode,direction] = np.nan
+                if REALTIME_MEAS == True:
+                    print_recap(episode)
+                return None
             # Extract time-domain signals
-            I_array_mV, Q_array_mV, complexSignal_mV, timeAxis_s, IQ_arrays_length = txt_extract(completeFileName, ADC_RANGE_BITS, ADC_RANGE_V, SAMPLING_FREQUENCY)
-            
-            # Plot of time-domain signals
-            plot_IFI_IFQ(timeAxis_s, I_array_mV, Q_array_mV, "time (s)", "voltage (mV)", SHOW_FIGURE, SAVE_PLOTS, PDF_PLOT, PNG_PLOT, PLOT_PATH)
-            
+            I_array_mV, Q_array_mV, complexSignal_mV, timeAxis_s, IQ_arrays_length = raw_extract(completeFileName, ADC_RANGE_BITS, radar.adcRange_V, SAMPLING_FREQUENCY)
+
             # FFT evaluation
-            FFT_dBV_peaks[episode,direction], centroid_frequencies[episode,direction], centroid_start, centroid_stop, centroid_threshold, surface_velocities_table[episode,direction], FFT_dBV, FFT_dBV_smoothed, freqAxis_Hz = FFT(complexSignal_mV, COMPLEX_FFT, IQ_arrays_length, SAMPLING_FREQUENCY, freqBins_FFT, OFFSET_REMOVAL, HANNING_WINDOWING, ZERO_FORCING, minBin, maxBin, SMOOTHING, smoothingBins, TARGET_THRESHOLD, BANDWIDTH_THRESHOLD, frequencyMin_fixed, direction_DEG, tiltAngle_DEG, FFT_initialized)
-            # Plot of FFT
-            plot_doppler_centroid(freqAxis_Hz, FFT_dBV, FFT_dBV_smoothed, centroid_start, centroid_stop, centroid_threshold, "frequency (Hz)", "FFT magnitude (dBV)", ZERO_FORCING, frequencyMin_fixed, frequencyMax_fixed, SHOW_FIGURE, SAVE_PLOTS, PDF_PLOT, PNG_PLOT, PLOT_PATH)
-            if SPECTROGRAM_ENABLED:
-                plot_spectrogram(complexSignal_mV, SAMPLING_FREQUENCY, STFT_OVERLAPPING_SAMPLES, STFT_SAMPLES_IN_SEGMENT, STFT_BINS, 'time (s)', 'frequency (Hz)', SHOW_FIGURE, SAVE_PLOTS, PDF_PLOT, PNG_PLOT, PLOT_PATH)
+            FFT_dBV_peaks[episode,direction], centroid_frequencies[episode,direction], centroid_start, centroid_stop, centroid_threshold, surface_velocities_table[episode,direction], FFT_dBV, FFT_dBV_smoothed, freqAxis_Hz = fftPlan.process(complexSignal_mV, direction_DEG, tiltAngle_DEG)
+            velocityStatistics.update(direction, surface_velocities_table[episode,direction])
+            if resultsStore is not None:
+                resultsStore.append(acquisitionTime, campaign, episode, direction_DEG, tiltAngle_DEG, FFT_dBV_peaks[episode,direction], centroid_frequencies[episode,direction], centroid_start, centroid_stop, surface_velocities_table[episode,direction], FFT_dBV_peaks[episode,direction] >= fftPlan.targetThreshold)
+
+            # STFT, already fed during the acquisition
+            spectrogram = None
+            if stft is not None and len(stft.track().times_s) > 0:
+                spectrogram = stft.spectrogram()
+                if REALTIME_MEAS == True:
+                    velocityTrack = stft.surface_velocities(direction_DEG, tiltAngle_DEG)
+                    if np.any(np.isfinite(velocityTrack)):
+                        logger.info('Surface velocity within the acquisition: min %.3f m/s, max %.3f m/s (%d STFT columns)', np.nanmin(velocityTrack), np.nanmax(velocityTrack), len(velocityTrack))
 
             # Console log of real-time measurements
             if REALTIME_MEAS == True:
-                print('Recap:')
-                print('[EP.,\tDEG,\tdBV,\tHz,\tm/s]')
+                print_recap(episode)
+            return I_array_mV, Q_array_mV, complexSignal_mV, timeAxis_s, centroid_start, centroid_stop, centroid_threshold, FFT_dBV, FFT_dBV_smoothed, freqAxis_Hz, spectrogram
+
+        @instrumented('plots')
+        def plot_direction(processed):
+            if not PLOTS_ENABLED or processed is None:
+                return
+            I_array_mV, Q_array_mV, complexSignal_mV, timeAxis_s, centroid_start, centroid_stop, centroid_threshold, FFT_dBV, FFT_dBV_smoothed, freqAxis_Hz, spectrogram = processed
+            if plotter is not None: # Same plots, queued to the plot worker
+                plotter.plot_IFI_IFQ(timeAxis_s, I_array_mV, Q_array_mV, "time (s)", "voltage (mV)", SAVE_PLOTS, PDF_PLOT, PNG_PLOT, PLOT_PATH)
+                plotter.plot_doppler_centroid(freqAxis_Hz, FFT_dBV, FFT_dBV_smoothed, centroid_start, centroid_stop, centroid_threshold, "frequency (Hz)", "FFT magnitude (dBV)", fftPlan.zeroForcing, fftPlan.frequencyMin_fixed, fftPlan.frequencyMax_fixed, SAVE_PLOTS, PDF_PLOT, PNG_PLOT, PLOT_PATH)
+                if SPECTROGRAM_ENABLED and spectrogram is not None:
+                    plotter.plot_spectrogram(spectrogram, 'time (s)', 'frequency (Hz)', SAVE_PLOTS, PDF_PLOT, PNG_PLOT, PLOT_PATH)
+                elif SPECTROGRAM_ENABLED: # Signal shorter than one STFT segment
+                    timed_import('custom_modules.plots_readytouse').plot_spectrogram(complexSignal_mV, SAMPLING_FREQUENCY, STFT_OVERLAPPING_SAMPLES, STFT_SAMPLES_IN_SEGMENT, STFT_BINS, 'time (s)', 'frequency (Hz)', SHOW_FIGURE, SAVE_PLOTS, PDF_PLOT, PNG_PLOT, PLOT_PATH)
+                return
+            # Plot of time-domain signals
+            plots.plot_IFI_IFQ(timeAxis_s, I_array_mV, Q_array_mV, "time (s)", "voltage (mV)", SHOW_FIGURE, SAVE_PLOTS, PDF_PLOT, PNG_PLOT, PLOT_PATH)
+            # Plot of FFT
+            plots.plot_doppler_centroid(freqAxis_Hz, FFT_dBV, FFT_dBV_smoothed, centroid_start, centroid_stop, centroid_threshold, "frequency (Hz)", "FFT magnitude (dBV)", fftPlan.zeroForcing, fftPlan.frequencyMin_fixed, fftPlan.frequencyMax_fixed, SHOW_FIGURE, SAVE_PLOTS, PDF_PLOT, PNG_PLOT, PLOT_PATH)
+            if SPECTROGRAM_ENABLED:
+                plots.plot_spectrogram(complexSignal_mV, SAMPLING_FREQUENCY, STFT_OVERLAPPING_SAMPLES, STFT_SAMPLES_IN_SEGMENT, STFT_BINS, 'time (s)', 'frequency (Hz)', SHOW_FIGURE, SAVE_PLOTS, PDF_PLOT, PNG_PLOT, PLOT_PATH, spectrogram)
+
+        def print_recap(episode):
+            # One log record for the whole table
+            lines = ['Recap:', '[EP.,\tDEG,\tdBV,\tHz,\tm/s]']
+            for direction in range(DIRECTIONS):
+                lines.append('[{:d},\t{:.1f},\t{:.1f},\t{:.1f},\t{:.1f}]'.format(episode+1, antennaBeamDirections_DEG[direction], FFT_dBV_peaks[episode, direction], centroid_frequencies[episode, direction], surface_velocities_table[episode, direction]))
+            if STATISTICAL_ANALYSIS == True and episode >= 2:
+                lines.append('Statistical analysis (episode {:d} of {:d}):'.format(episode+1, EPISODES))
+                if NORMALITY_WINDOW > 0:
+                    lines.append('[angle, mean, std.dev., S.W. stat, S.W. p-value] (S.W. on the last {:d} episodes at most)'.format(NORMALITY_WINDOW))
+                    lines.append('[DEG,\tm/s,\tm/s,\tS.W.,\tp-value]')
+                else:
+                    lines.append('[angle, mean, std.dev.]')
+                    lines.append('[DEG,\tm/s,\tm/s]')
                 for direction in range(DIRECTIONS):
-                    print('[{:d},'.format(episode+1), end='\t')
-                    print('{:.1f},'.format(antennaBeamDirections_DEG[direction]), end='\t')
-                    print('{:.1f},'.format(FFT_dBV_peaks[episode, direction]), end='\t')
-                    print('{:.1f},'.format(centroid_frequencies[episode, direction]), end='\t')
-                    print('{:.1f}]'.format(surface_velocities_table[episode, direction]))
-                if STATISTICAL_ANALYSIS == True and episode >= 2:
-                    print('Statistical analysis (episode {:d} of {:d}):'.format(episode+1, EPISODES))
-                    print('[angle, mean, std.dev., S.W. stat, S.W. p-value]')
-                    print('[DEG,\tm/s,\tm/s,\tS.W.,\tp-value]')
+                    statistics = velocityStatistics[direction]
+                    line = '[{:.1f},\t{:.3f},\t{:.3f}'.format(antennaBeamDirections_DEG[direction], statistics.mean, statistics.std())
+                    if NORMALITY_WINDOW > 0:
+                        line += ',\t{:.3f},\t{:.3f}'.format(*statistics.shapiro())
+                    lines.append(line + ']')
+            logger.info('\n'.join(lines))
+
+        # Pipelined scan: the servo moves to the next direction and acquires while the previous one is processed and plotted.
+        # Figures can't be shown from a worker thread, hence the sequential scan when SHOW_FIGURE is enabled.
+        if platform.pipelinedScan and not SHOW_FIGURE:
+            with ScanPipeline(process_direction, plot_direction) as pipeline:
+                for episode in range(EPISODES):
+                    text = "EPISODE {:d} OF {:d}".format(episode+1, EPISODES)
+                    logger.info(f"{text:-^60}")
                     for direction in range(DIRECTIONS):
-                        shapiro_test = stats.shapiro(surface_velocities_table[:episode+1,direction])
-                        print('[{:.1f},'.format(antennaBeamDirections_DEG[direction]), end='\t')
-                        print('{:.3f},'.format(np.mean(surface_velocities_table[:episode+1,direction])), end='\t')
-                        print('{:.3f},'.format(np.std(surface_velocities_table[:episode+1,direction], ddof=1)), end='\t')
-                        print('{:.3f},'.format(shapiro_test.statistic), end='\t')
-                        print('{:.3f}]'.format(shapiro_test.pvalue))
-    # Report on *.txt file
-    print('Generating report...')
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-    reportFileName = timestamp + "_report.txt"
-    completeFileName = os.path.join(PLOT_PATH, reportFileName)
-    with open(completeFileName,'w') as file:
-        if REALTIME_MEAS == True:
-            file.write('### SURFACE VELOCITY TABLE ###\n')
-            file.write('[EP.,\tDEG,\tdBV,\tHz,\tm/s]\n')
+                        pipeline.check() # No servo motion nor acquisition after a processing failure
+                        pipeline.submit(acquire_direction(episode, direction))
+        else:
             for episode in range(EPISODES):
+                text = "EPISODE {:d} OF {:d}".format(episode+1, EPISODES)
+                logger.info(f"{text:-^60}")
                 for direction in range(DIRECTIONS):
-                    file.write('[{:d},\t'.format(episode+1))
-                    file.write('{:.1f},\t'.format(antennaBeamDirections_DEG[direction]))
-                    file.write('{:.1f},\t'.format(FFT_dBV_peaks[episode,direction]))
-                    file.write('{:.1f},\t'.format(centroid_frequencies[episode,direction]))
-                    file.write('{:.3f}]\n'.format(surface_velocities_table[episode,direction]))
-            if STATISTICAL_ANALYSIS == True:
-                file.write('### STATISTICAL ANALYSIS (@ episode {:d} of {:d}) ###\n'.format(episode+1, EPISODES))
-                file.write('[scanning angle, mean value, std.dev., S.W. test statistic, S.W. test p-value]\n')
-                file.write('[DEG,\tm/s,\tm/s,\tS.W.,\tp-value]\n')
-                for direction in range(DIRECTIONS):
-                    shapiro_test = stats.shapiro(surface_velocities_table[:episode+1,direction])
-                    file.write('[{:.1f},\t'.format(antennaBeamDirections_DEG[direction]))
-                    file.write('{:.3f},\t'.format(np.mean(surface_velocities_table[:episode+1,direction])))
-                    file.write('{:.3f},\t'.format(np.std(surface_velocities_table[:episode+1,direction], ddof=1)))
-                    file.write('{:.3f},\t'.format(shapiro_test.statistic))
-                    file.write('{:.3f}]\n'.format(shapiro_test.pvalue))
-    print('Done.')
-    # End servo motor control
-    shut_down_servo(servo_motor)
-    # Delete raw data if not needed
-    if not RAW_DATA:
-        raw_samples_files = glob.glob('sense2gol_pizero/output/*.txt')
-        for txtfile in raw_samples_files:
-            os.remove(txtfile)
+                    plot_direction(process_direction(acquire_direction(episode, direction)))
+        if plotter is not None: # Last plots of the scan, if kept aside by the plot backlog policy
+            plotter.flush()
+        # Report on *.txt file
+        logger.info('Generating report...')
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        reportFileName = timestamp + "_report.txt"
+        write_report(os.path.join(PLOT_PATH, reportFileName), FFT_dBV_peaks, centroid_frequencies, surface_velocities_table, antennaBeamDirections_DEG, REALTIME_MEAS, STATISTICAL_ANALYSIS, velocityStatistics)
+        logger.info('Done.')
+        # Delete raw data if not needed
+        if not platform.rawData:
+            raw_samples_files = glob.glob('sense2gol_pizero/output/*.txt') + glob.glob('sense2gol_pizero/output/*.bin')
+            for rawfile in raw_samples_files:
+                os.remove(rawfile)
+
+def main(SETTINGS_FILE=DEFAULT_SETTINGS_FILE, daemon=False):
+    if not daemon:
+        monitor = RiverMonitor(get_settings(SETTINGS_FILE))
+        try:
+            monitor.scan()
+        finally:
+            METRICS.end_cycle()
+            monitor.close()
+        return
+
+    # Daemon mode: one scan at startup, then on schedule. Settings reloaded between scans, if modified.
+    watcher = SettingsWatcher(SETTINGS_FILE)
+    monitor = RiverMonitor(watcher.settings)
+
+    def measurement_cycle():
+        monitor.wake_up()
+        try:
+            monitor.scan()
+        finally:
+            monitor.sleep()
+            METRICS.end_cycle()
+
+    def between_cycles():
+        previous = watcher.settings
+        if watcher.reload_if_changed():
+            try:
+                monitor.configure(watcher.settings)
+            except Exception:
+                # New settings not applicable (e.g. a device fails to reopen): back to the previous ones
+                watcher.reject(previous)
+                monitor.configure(previous)
+                raise
+        return make_schedule(watcher.settings.platform.scheduleInterval_s, watcher.settings.platform.scheduleCron)
+
+    try:
+        monitor.sleep()
+        cycles = run_forever(make_schedule(watcher.settings.platform.scheduleInterval_s, watcher.settings.platform.scheduleCron), measurement_cycle, between_cycles, runNow=True)
+        logger.info("Daemon stopped after %d scan(s).", cycles)
+    finally:
+        monitor.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="River surface velocity monitoring with the Sense2GoL Doppler radar.")
+    parser.add_argument('--settings', default=DEFAULT_SETTINGS_FILE, help="Settings *.json file.")
+    parser.add_argument('--daemon', action='store_true', help="Stay resident and scan on the schedule set in the settings (schedule-interval-s, schedule-cron).")
+    args = parser.parse_args()
+    main(args.settings, args.daemon)
@@ -0,0 +1,5 @@
+# Tests run from the repository root, modules imported as in the scripts (custom_modules.*)
+import os
+import sys
+
+sys.path.insert(1, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
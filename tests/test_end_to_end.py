@@ -0,0 +1,78 @@
+import glob
+import json
+import os
+import runpy
+
+import numpy as np
+import pytest
+
+from custom_modules.logging_setup import stop_logging
+from custom_modules.results_store import ResultsStore
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SURFACE_VELOCITY_MPS = 1.0
+
+pytestmark = pytest.mark.filterwarnings('ignore:divide by zero:RuntimeWarning') # Zero-forced bins: -inf dBV
+
+@pytest.fixture
+def station(tmp_path, monkeypatch):
+    # Scripts write to paths relative to the repository root (e.g. sense2gol_pizero/output): run them from a scratch copy of the tree
+    for driver in ('sense2gol_pizero', 'unipg_prototype'):
+        os.makedirs(tmp_path / driver / 'output')
+    monkeypatch.chdir(tmp_path)
+    yield tmp_path
+    stop_logging()
+
+def simulated_settings(driver, platformSection, **platform):
+    # Settings shipped with the driver, all devices simulated, output in the scratch tree
+    with open(os.path.join(REPOSITORY, driver, 'settings.json')) as f:
+        settings = json.load(f)
+    settings['devices'].update({'radar': 'simulated', 'servo': 'simulated', 'accelerometer': 'simulated', 'simulated-surface-velocity-mps': SURFACE_VELOCITY_MPS,
+                                'simulated-real-time': False, 'simulation-seed': 1})
+    settings[platformSection].update({'show-figure': False, 'save-plots': False, 'plot-path': driver + '/output/', 'import-timing-report': False,
+                                      'results-database': driver + '/output/results.sqlite', 'metrics-file': driver + '/output/metrics.jsonl', 'metrics-port': 0,
+                                      'log-level': 'WARNING', 'log-module-levels': [], 'log-file': ''})
+    settings[platformSection].update(platform)
+    settings['statistical-analysis'].update({'enabling': True, 'episodes-number': 3})
+    fileName = os.path.join(driver, 'simulated.json')
+    with open(fileName, 'w') as f:
+        json.dump(settings, f)
+    return fileName
+
+def update_settings(fileName, section, values):
+    with open(fileName) as f:
+        settings = json.load(f)
+    settings[section].update(values)
+    with open(fileName, 'w') as f:
+        json.dump(settings, f)
+
+def check_results(driver, directions):
+    # One report, one metrics line per scan and every acquisition in the database, at the simulated surface velocity
+    assert len(glob.glob(driver + '/output/*_report.txt')) == 1
+    with open(driver + '/output/metrics.jsonl') as f:
+        assert len(f.readlines()) == 1
+    with ResultsStore(driver + '/output/results.sqlite') as store:
+        results = store.query()
+    assert len(results) == 3 * directions
+    assert len(np.unique(results['direction_DEG'])) == directions
+    assert np.allclose(results['surface_velocity'], SURFACE_VELOCITY_MPS, rtol=0.25) # Short acquisitions: spread of the echo spectrum
+    assert np.isclose(np.mean(results['surface_velocity']), SURFACE_VELOCITY_MPS, rtol=0.05)
+
+@pytest.mark.parametrize('rawDataFormat, pipelinedScan, asyncPlots', [('bin', True, False), ('txt', False, False), ('bin', True, True)])
+def test_sense2gol_scan(station, rawDataFormat, pipelinedScan, asyncPlots):
+    settingsFile = simulated_settings('sense2gol_pizero', 'raspberry-pi-zero', **{'directions': 3, 'raw-data': True, 'raw-data-format': rawDataFormat,
+                                      'pipelined-scan': pipelinedScan, 'async-plots': asyncPlots, 'save-plots': asyncPlots, 'plot-backlog-policy': 'block', 'png-plot': True, 'pdf-plot': False})
+    update_settings(settingsFile, 'sense2gol', {'number-of-frames': 16}) # Longer than one STFT segment: spectrogram fed during the acquisition
+    runpy.run_path(os.path.join(REPOSITORY, 'sense2gol_pizero', 'river_monitoring_doppler.py'))['main'](settingsFile)
+    check_results('sense2gol_pizero', 3)
+    assert len(glob.glob('sense2gol_pizero/output/*deg.' + rawDataFormat)) == 3 * 3
+    if asyncPlots:
+        assert len(glob.glob('sense2gol_pizero/output/*.png')) > 0
+
+@pytest.mark.parametrize('rawData, streamChunkSamples', [(True, 1000), (False, 0)])
+def test_unipg_scan(station, rawData, streamChunkSamples):
+    settingsFile = simulated_settings('unipg_prototype', 'raspberry-pi-3bplus', **{'directions': 5, 'raw-data': rawData})
+    update_settings(settingsFile, 'signal-processing', {'stream-chunk-samples': streamChunkSamples})
+    runpy.run_path(os.path.join(REPOSITORY, 'unipg_prototype', 'river_monitoring_doppler.py'))['main'](settingsFile, simulatedScope=True)
+    check_results('unipg_prototype', 5)
+    assert len(glob.glob('unipg_prototype/output/*deg.bin')) == (3 * 5 if rawData else 0)
@@ -0,0 +1,167 @@
+import numpy as np
+import pytest
+
+from custom_modules.signal_processing import FFT_parameters, FFTPlan
+
+SAMPLING_FREQUENCY = 3000.0 # Hz
+TONE_FREQUENCY = 150.0 # Hz
+
+pytestmark = pytest.mark.filterwarnings('ignore:divide by zero:RuntimeWarning') # Zero-forced bins: -inf dBV
+
+def make_plan(complexFFT=True, spectrumMode='fft', resolution=0.5, frequencyMin=20.0, frequencyMax=600.0, targetThreshold=-200.0, **options):
+    FFT_initialized, freqBins_FFT, smoothingBins, minBin, frequencyMin_fixed, maxBin, frequencyMax_fixed = FFT_parameters(complexFFT, SAMPLING_FREQUENCY, resolution, True, 10.0, frequencyMin, frequencyMax, False)
+    return FFTPlan(complexFFT, SAMPLING_FREQUENCY, freqBins_FFT, smoothingBins, minBin, maxBin, frequencyMin_fixed, frequencyMax_fixed,
+                   offsetRemoval=True, hanningWindowing=True, zeroForcing=True, smoothing=True, targetThreshold=targetThreshold, bandwidthThreshold=6.0, spectrumMode=spectrumMode, **options)
+
+def echo(samples, shape=(), seed=0):
+    # Doppler tone with some spread, noise and a DC offset (mV)
+    rng = np.random.default_rng(seed)
+    t = np.arange(samples) / SAMPLING_FREQUENCY
+    frequencies = TONE_FREQUENCY + rng.normal(0, 10, shape + (1,))
+    signal = 50*np.exp(2j*np.pi*frequencies*t) + 5*(rng.normal(size=shape + (samples,)) + 1j*rng.normal(size=shape + (samples,)))
+    return signal + (800 + 800j)
+
+def reference_dBV(plan, signal_mV):
+    # Plain zero-padded FFT of the offset-free, Hamming-windowed signal, on the bins of the zero-forcing window
+    signal_mV = signal_mV - np.mean(signal_mV)
+    signal_mV = signal_mV * np.hamming(len(signal_mV))
+    if plan.complexFFT:
+        FFT_mV = np.abs(np.fft.fftshift(np.fft.fft(signal_mV, plan.freqBins_FFT))) / len(signal_mV)
+        window = slice(plan.minBin, plan.maxBin)
+    else:
+        FFT_mV = 2*np.abs(np.fft.rfft(signal_mV, plan.freqBins_FFT)) / len(signal_mV)
+        window = slice(plan.minBin, plan.maxBin + 1)
+    return 20*np.log10(FFT_mV[window]/1000), window
+
+@pytest.mark.parametrize('complexFFT', [True, False])
+def test_fft_matches_plain_fft(complexFFT):
+    plan = make_plan(complexFFT)
+    signal_mV = echo(2048)
+    result = plan.process(signal_mV if complexFFT else signal_mV.real, 0.0, 30.0)
+    expected, window = reference_dBV(plan, signal_mV if complexFFT else signal_mV.real)
+    assert np.allclose(result.FFT_dBV[window], expected)
+    assert abs(result.centroid_frequency - TONE_FREQUENCY) < 30
+
+@pytest.mark.parametrize('complexFFT', [True, False])
+@pytest.mark.parametrize('spectrumMode', ['fft', 'zoom', 'welch'])
+def test_process_batch_matches_process(complexFFT, spectrumMode):
+    plan = make_plan(complexFFT, spectrumMode, welchSegmentSamples=512, welchOverlapSamples=256)
+    signals_mV = echo(2048, (2, 3))
+    directions_DEG = np.array([-15.0, 0.0, 15.0])
+    batch = plan.process_batch(signals_mV, directions_DEG, 30.0, keepSpectra=True)
+    for episode in range(2):
+        for direction in range(3):
+            result = plan.process(signals_mV[episode, direction], directions_DEG[direction], 30.0)
+            assert np.isclose(batch.FFT_dBV_peaks[episode, direction], result.FFT_dBV_max)
+            assert np.isclose(batch.centroid_frequencies[episode, direction], result.centroid_frequency)
+            assert np.isclose(batch.centroid_starts[episode, direction], result.centroid_start)
+            assert np.isclose(batch.centroid_stops[episode, direction], result.centroid_stop)
+            assert np.isclose(batch.surface_velocities[episode, direction], result.surface_velocity)
+            assert np.allclose(batch.FFT_dBV[episode, direction], result.FFT_dBV)
+
+def test_undetected_target():
+    # Peak under the target threshold: centroid and velocity set to 0, in both paths
+    plan = make_plan(targetThreshold=0.0)
+    signals_mV = echo(2048, (2,))
+    batch = plan.process_batch(signals_mV, 0.0, 30.0)
+    result = plan.process(signals_mV[0], 0.0, 30.0)
+    assert np.all(batch.centroid_frequencies == 0) and np.all(batch.surface_velocities == 0)
+    assert result.centroid_frequency == 0 and result.surface_velocity == 0
+    assert np.isclose(batch.FFT_dBV_peaks[0], result.FFT_dBV_max)
+
+@pytest.mark.parametrize('channel', ['I', 'Q'])
+def test_real_fft_selects_channel(channel):
+    # A complex signal is reduced to the selected channel: same result as the channel alone
+    plan = make_plan(False, channel=channel)
+    signal_mV = echo(2048)
+    channel_mV = signal_mV.real if channel == 'I' else signal_mV.imag
+    result = plan.process(signal_mV, 0.0, 30.0)
+    expected = plan.process(channel_mV, 0.0, 30.0)
+    assert np.array_equal(result.FFT_dBV, expected.FFT_dBV)
+    assert result.centroid_frequency == expected.centroid_frequency
+    assert np.array_equal(plan.select(signal_mV.real, signal_mV.imag), channel_mV)
+    assert len(plan.freqAxis_Hz) == plan.freqBins_FFT//2 + 1 and plan.freqAxis_Hz[0] == 0
+
+@pytest.mark.parametrize('spectrumMode', ['fft', 'zoom'])
+def test_top_bin_zero_forced(spectrumMode):
+    # Strong tone on the last bin of the complex FFT, outside the window: neither the peak nor the centroid
+    plan = make_plan(True, spectrumMode)
+    t = np.arange(4096) / SAMPLING_FREQUENCY
+    signal_mV = echo(4096) + 1e4*np.exp(2j*np.pi*(SAMPLING_FREQUENCY/2 - SAMPLING_FREQUENCY/plan.freqBins_FFT)*t)
+    result = plan.process(signal_mV, 0.0, 30.0)
+    if spectrumMode == 'fft':
+        assert np.all(np.isneginf(result.FFT_dBV[plan.maxBin:]))
+    assert abs(result.centroid_frequency - TONE_FREQUENCY) < 30
+
+@pytest.mark.parametrize('complexFFT', [True, False])
+@pytest.mark.parametrize('samples', [1024, 2048, 8192])
+def test_zoom_matches_fft_window(complexFFT, samples):
+    # Chirp-z transform of the window bins (or full FFT when cheaper, or truncated signals): same bins as the full FFT
+    fftPlan = make_plan(complexFFT)
+    zoomPlan = make_plan(complexFFT, 'zoom')
+    signal_mV = echo(samples)
+    expected = fftPlan.process(signal_mV, 0.0, 30.0)
+    result = zoomPlan.process(signal_mV, 0.0, 30.0)
+    window = slice(fftPlan.minBin, fftPlan.maxBin if complexFFT else fftPlan.maxBin + 1)
+    assert np.array_equal(zoomPlan.freqAxis_Hz, fftPlan.freqAxis_Hz[window])
+    assert np.allclose(result.FFT_dBV, expected.FFT_dBV[window])
+    assert np.isclose(result.centroid_frequency, expected.centroid_frequency)
+    assert np.isclose(result.surface_velocity, expected.surface_velocity)
+
+@pytest.mark.parametrize('complexFFT', [True, False])
+@pytest.mark.parametrize('samples, segmentSamples, overlapSamples', [(4096, 512, 256), (40000, 512, 256), (5000, 1024, 0), (300, 512, 256)])
+def test_welch_matches_averaged_periodogram(complexFFT, samples, segmentSamples, overlapSamples):
+    plan = make_plan(complexFFT, 'welch', welchSegmentSamples=segmentSamples, welchOverlapSamples=overlapSamples, welchWindow='hann')
+    signal_mV = echo(samples)
+    if not complexFFT:
+        signal_mV = signal_mV.real
+    # Loop over the segments (a signal shorter than a segment is one segment), instead of batches of strided segments
+    segmentSamples = min(segmentSamples, samples)
+    power = 0
+    starts = range(0, samples - segmentSamples + 1, segmentSamples - overlapSamples)
+    for start in starts:
+        segment = signal_mV[start:start+segmentSamples]
+        segment = (segment - np.mean(segment)) * np.hanning(segmentSamples)
+        FFT = np.fft.fft(segment, plan.freqBins_FFT) if complexFFT else np.fft.rfft(segment, plan.freqBins_FFT)
+        power = power + np.abs(FFT)**2
+    FFT_mV = np.sqrt(power / len(starts)) / segmentSamples
+    if complexFFT:
+        FFT_mV = np.fft.fftshift(FFT_mV)
+        window = slice(plan.minBin, plan.maxBin)
+    else:
+        FFT_mV = 2*FFT_mV
+        window = slice(plan.minBin, plan.maxBin + 1)
+    result = plan.process(signal_mV, 0.0, 30.0)
+    assert np.allclose(result.FFT_dBV[window], 20*np.log10(FFT_mV[window]/1000))
+
+def chunked(signal_mV, chunkSamples):
+    return [signal_mV[start:start+chunkSamples] for start in range(0, len(signal_mV), chunkSamples)]
+
+@pytest.mark.parametrize('complexFFT', [True, False])
+@pytest.mark.parametrize('spectrumMode', ['fft', 'zoom', 'welch'])
+@pytest.mark.parametrize('samples', [4000, 20000])
+@pytest.mark.parametrize('chunkSamples', [333, 4096])
+def test_process_stream_matches_process(complexFFT, spectrumMode, samples, chunkSamples):
+    # Same result from the whole signal and from its chunks, shorter or longer than the FFT
+    plan = make_plan(complexFFT, spectrumMode, welchSegmentSamples=1024, welchOverlapSamples=512)
+    signal_mV = echo(samples, seed=6)
+    expected = plan.process(signal_mV, -15.0, 30.0)
+    result = plan.process_stream(chunked(signal_mV, chunkSamples), samples, -15.0, 30.0)
+    assert np.allclose(result.FFT_dBV, expected.FFT_dBV)
+    assert np.isclose(result.centroid_frequency, expected.centroid_frequency)
+    assert np.isclose(result.surface_velocity, expected.surface_velocity)
+
+@pytest.mark.parametrize('channel', ['I', 'Q'])
+def test_process_stream_of_capture(tmp_path, channel):
+    # Real FFT of a capture file streamed by CaptureStream: the chunk buffer is overwritten and read twice (offset removal)
+    from custom_modules.raw_capture import CaptureStream, capture_extract, write_capture
+    rng = np.random.default_rng(7)
+    signal_mV = echo(10000, seed=7)
+    I_counts = np.round(signal_mV.real / 0.8).astype(np.uint16)
+    Q_counts = np.round(signal_mV.imag / 0.8 + rng.normal(0, 5, 10000)).astype(np.uint16)
+    fileName = write_capture(str(tmp_path / 'capture.bin'), I_counts, Q_counts, SAMPLING_FREQUENCY, 4096, 3.2768, 3.2768)
+    plan = make_plan(False, channel=channel)
+    expected = plan.process(capture_extract(fileName)[2], 0.0, 30.0)
+    result = plan.process_stream(CaptureStream.from_file(fileName, False, channel, 1000), 10000, 0.0, 30.0)
+    assert np.allclose(result.FFT_dBV, expected.FFT_dBV)
+    assert np.isclose(result.centroid_frequency, expected.centroid_frequency)
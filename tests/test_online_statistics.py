@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+from scipy import stats
+
+from custom_modules.online_statistics import DirectionStatistics, P2Quantile, RunningStatistics, shapiro_test
+
+@pytest.mark.parametrize('p', [0.05, 0.25, 0.5, 0.9, 0.95])
+@pytest.mark.parametrize('distribution', ['normal', 'uniform', 'exponential'])
+def test_p2_quantile_close_to_numpy(p, distribution):
+    rng = np.random.default_rng(0)
+    values = getattr(rng, distribution)(size=20000)
+    estimator = P2Quantile(p)
+    for value in values:
+        estimator.update(value)
+    # P² error is a small fraction of the spread of the distribution
+    assert abs(estimator.value() - np.quantile(values, p)) < 0.02 * (np.quantile(values, 0.99) - np.quantile(values, 0.01))
+
+@pytest.mark.parametrize('count', [1, 2, 3, 4, 5])
+def test_p2_quantile_exact_for_few_values(count):
+    values = [3.0, -1.0, 7.5, 2.0, 0.5][:count]
+    estimator = P2Quantile(0.5)
+    for value in values:
+        estimator.update(value)
+    assert estimator.value() == pytest.approx(np.quantile(values, 0.5))
+
+def test_p2_quantile_empty():
+    assert np.isnan(P2Quantile(0.5).value())
+
+def test_running_statistics_match_numpy():
+    rng = np.random.default_rng(1)
+    values = rng.normal(1.2, 0.3, size=1000)
+    statistics = RunningStatistics(normalityWindow=100)
+    for value in values:
+        statistics.update(value)
+    statistics.update(float('nan')) # No target detected: ignored
+    assert statistics.count == len(values)
+    assert statistics.mean == pytest.approx(np.mean(values))
+    assert statistics.std() == pytest.approx(np.std(values, ddof=1))
+    assert (statistics.minimum, statistics.maximum) == (np.min(values), np.max(values))
+    assert np.array_equal(statistics.recent(), values[-100:])
+    statistic, pvalue = statistics.shapiro()
+    assert (statistic, pvalue) == pytest.approx(tuple(stats.shapiro(values[-100:])))
+
+def test_direction_statistics_from_table():
+    table = np.array([[1.0, 2.0], [np.nan, 4.0], [3.0, 6.0]])
+    statistics = DirectionStatistics.from_table(table)
+    assert len(statistics) == 2
+    assert statistics[0].count == 2 and statistics[0].mean == 2.0
+    assert statistics[1].count == 3 and statistics[1].mean == 4.0
+    assert np.isnan(statistics[0].shapiro()[0]) # Less than 3 values
+
+def test_no_live_normality_test():
+    statistics = RunningStatistics(normalityWindow=0)
+    for value in np.random.default_rng(2).normal(size=50):
+        statistics.update(value)
+    assert statistics.count == 50 and len(statistics.recent()) == 0
+    assert np.all(np.isnan(statistics.shapiro()))
+
+def test_shapiro_test_ignores_nan():
+    values = np.random.default_rng(3).normal(size=40)
+    assert shapiro_test(np.append(values, np.nan)) == pytest.approx(tuple(stats.shapiro(values)))
+    assert np.all(np.isnan(shapiro_test([1.0, np.nan, 2.0])))
+
+def test_report_tests_every_episode(tmp_path):
+    # Final report: Shapiro-Wilk on the whole table, even if the live test only kept the last values
+    from custom_modules.sense2gol import write_report
+    table = np.random.default_rng(4).normal(1.0, 0.1, size=(60, 2))
+    velocityStatistics = DirectionStatistics.from_table(table, normalityWindow=5)
+    write_report(str(tmp_path / 'report.txt'), np.zeros_like(table), np.zeros_like(table), table, np.array([-10.0, 10.0]), True, True, velocityStatistics)
+    report = (tmp_path / 'report.txt').read_text().splitlines()
+    rows = report[report.index('[DEG,\tm/s,\tm/s,\tS.W.,\tp-value]') + 1:][:2]
+    for direction, row in enumerate(rows):
+        statistic, pvalue = stats.shapiro(table[:, direction])
+        assert row.endswith('{:.3f},\t{:.3f}]'.format(statistic, pvalue))
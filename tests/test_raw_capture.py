@@ -0,0 +1,124 @@
+import math
+
+import numpy as np
+import pytest
+
+from custom_modules.devices import SimulatedScene, SimulatedSense2GoL
+from custom_modules.raw_capture import CaptureStream, capture_extract, create_capture, load_capture, parse_capture_label, read_capture_header, txt_to_capture, write_capture
+from custom_modules.sense2gol import txt_extract
+
+SAMPLING_FREQUENCY = 3000.0 # Hz
+ADC_RANGE_BITS = 4096
+ADC_RANGE_V = 3.3
+LABEL = '20221005_101010_123456__tilt45.0deg__episode2of3__dir-30.0deg'
+
+def counts(samples, dtype='<u2', seed=0):
+    rng = np.random.default_rng(seed)
+    info = np.iinfo(dtype) if np.dtype(dtype).kind in 'iu' else None
+    if info is None:
+        return rng.normal(size=(2, samples)).astype(dtype)
+    return rng.integers(info.min, info.max, size=(2, samples), endpoint=True).astype(dtype)
+
+@pytest.mark.parametrize('dtype', ['<u2', '<i2', '<i4', '<f4'])
+@pytest.mark.parametrize('label', ['', 'x', LABEL, 'tilt 45° ✓'])
+@pytest.mark.parametrize('mmap', [True, False])
+def test_header_round_trip(tmp_path, dtype, label, mmap):
+    fileName = str(tmp_path / 'capture.bin')
+    I_counts, Q_counts = counts(1000, dtype)
+    write_capture(fileName, I_counts, Q_counts, SAMPLING_FREQUENCY, ADC_RANGE_BITS, 2.5, ADC_RANGE_V, dtype,
+                  tiltAngle_DEG=45.0, direction_DEG=-30.0, episode=1, episodes=3, label=label)
+    header, samples = load_capture(fileName, mmap)
+    assert header['version'] == 1
+    assert header['header_length'] % 8 == 0
+    assert header['sampling_frequency_Hz'] == SAMPLING_FREQUENCY
+    assert header['adc_full_scale'] == ADC_RANGE_BITS
+    assert header['adc_range_I_V'] == 2.5 and header['adc_range_Q_V'] == ADC_RANGE_V
+    assert header['dtype'] == np.dtype(dtype)
+    assert (header['tilt_DEG'], header['direction_DEG'], header['episode'], header['episodes']) == (45.0, -30.0, 1, 3)
+    assert header['samples'] == 1000
+    assert header['label'] == label
+    assert samples.dtype == np.dtype(dtype) and samples.shape == (2, 1000)
+    assert np.array_equal(samples[0], I_counts) and np.array_equal(samples[1], Q_counts)
+    assert (tmp_path / 'capture.bin').stat().st_size == header['header_length'] + 2 * 1000 * np.dtype(dtype).itemsize
+
+def test_default_labels(tmp_path):
+    fileName = write_capture(str(tmp_path / 'capture.bin'), [1, 2], [3, 4], SAMPLING_FREQUENCY, ADC_RANGE_BITS, ADC_RANGE_V, ADC_RANGE_V)
+    header = read_capture_header(fileName)
+    assert math.isnan(header['tilt_DEG']) and math.isnan(header['direction_DEG'])
+    assert (header['episode'], header['episodes'], header['label']) == (0, 1, '')
+
+@pytest.mark.parametrize('mmap', [True, False])
+def test_empty_capture(tmp_path, mmap):
+    fileName = write_capture(str(tmp_path / 'capture.bin'), [], [], SAMPLING_FREQUENCY, ADC_RANGE_BITS, ADC_RANGE_V, ADC_RANGE_V)
+    header, samples = load_capture(fileName, mmap)
+    assert header['samples'] == 0 and samples.shape == (2, 0)
+
+def test_create_capture_written_in_place(tmp_path):
+    # Samples written into the map while they arrive, e.g. one frame at a time
+    fileName = str(tmp_path / 'capture.bin')
+    I_counts, Q_counts = counts(1024, seed=1)
+    samplesMap = create_capture(fileName, 1024, SAMPLING_FREQUENCY, ADC_RANGE_BITS, ADC_RANGE_V, ADC_RANGE_V, label=LABEL)
+    for start in range(0, 1024, 128):
+        samplesMap[0, start:start+128] = I_counts[start:start+128]
+        samplesMap[1, start:start+128] = Q_counts[start:start+128]
+    samplesMap.flush()
+    del samplesMap
+    header, samples = load_capture(fileName)
+    assert header['label'] == LABEL
+    assert np.array_equal(samples, np.stack((I_counts, Q_counts)))
+
+def test_not_a_capture(tmp_path):
+    (tmp_path / 'dump.txt').write_bytes(b'  ------------- I raw samples ------------- \n')
+    with pytest.raises(ValueError):
+        read_capture_header(str(tmp_path / 'dump.txt'))
+    (tmp_path / 'short.bin').write_bytes(b'RDRCAP')
+    with pytest.raises(ValueError):
+        read_capture_header(str(tmp_path / 'short.bin'))
+
+def test_newer_version_rejected(tmp_path):
+    fileName = write_capture(str(tmp_path / 'capture.bin'), [1], [2], SAMPLING_FREQUENCY, ADC_RANGE_BITS, ADC_RANGE_V, ADC_RANGE_V)
+    with open(fileName, 'r+b') as f:
+        f.seek(6)
+        f.write((2).to_bytes(2, 'little'))
+    with pytest.raises(ValueError, match='version 2'):
+        read_capture_header(fileName)
+
+def test_parse_capture_label():
+    labels = parse_capture_label('/data/' + LABEL + '.bin')
+    assert labels == {'timestamp': '20221005_101010_123456', 'label': LABEL, 'tilt_DEG': 45.0, 'episode': 1, 'episodes': 3, 'direction_DEG': -30.0}
+    assert parse_capture_label('capture.bin') is None
+
+def test_txt_to_capture_matches_txt_extract(tmp_path):
+    # Same signal from the legacy text dump and from its binary conversion, labels taken from the file name
+    radar = SimulatedSense2GoL(SimulatedScene(seed=2), outputPath=str(tmp_path))
+    txtFileName = radar.acquire('tilt45.0deg', 1, 3, 'dir-30.0deg', 8, 128, 0, 1.0, 'txt', SAMPLING_FREQUENCY, ADC_RANGE_BITS, ADC_RANGE_V, 10.0, 0.0)
+    captureFileName = txt_to_capture(txtFileName, SAMPLING_FREQUENCY, ADC_RANGE_BITS, ADC_RANGE_V)
+    assert captureFileName.endswith('.bin')
+    expected = txt_extract(txtFileName, ADC_RANGE_BITS, ADC_RANGE_V, SAMPLING_FREQUENCY)
+    extracted = capture_extract(captureFileName)
+    assert extracted[4] == expected[4] > 0
+    for array, expectedArray in zip(extracted[:4], expected[:4]):
+        assert np.allclose(array, expectedArray)
+    header = read_capture_header(captureFileName)
+    assert (header['tilt_DEG'], header['direction_DEG'], header['episode'], header['episodes']) == (45.0, -30.0, 1, 3)
+    assert header['label'] == parse_capture_label(txtFileName)['label']
+
+@pytest.mark.parametrize('chunkSamples', [1, 7, 256, 1000, 5000])
+@pytest.mark.parametrize('complexSignal, channel', [(True, 'I'), (False, 'I'), (False, 'Q')])
+def test_capture_stream_chunks(tmp_path, chunkSamples, complexSignal, channel):
+    # Chunks concatenate to the whole signal in mV, as capture_extract() gives it, on every pass
+    fileName = write_capture(str(tmp_path / 'capture.bin'), *counts(1000, seed=3), SAMPLING_FREQUENCY, ADC_RANGE_BITS, 2.5, ADC_RANGE_V)
+    I_array_mV, Q_array_mV, complexSignal_mV = capture_extract(fileName)[:3]
+    expected = complexSignal_mV if complexSignal else (I_array_mV if channel == 'I' else Q_array_mV)
+    signalStream = CaptureStream.from_file(fileName, complexSignal, channel, chunkSamples)
+    assert len(signalStream) == 1000
+    for _ in range(2):
+        chunks = [chunk.copy() for chunk in signalStream]
+        assert all(len(chunk) == chunkSamples for chunk in chunks[:-1]) and 0 < len(chunks[-1]) <= chunkSamples
+        assert np.iscomplexobj(chunks[0]) == complexSignal
+        assert np.allclose(np.concatenate(chunks), expected)
+
+def test_capture_stream_reuses_its_buffer():
+    signalStream = CaptureStream(counts(100, seed=4), (0.5, 0.25), chunkSamples=30)
+    chunks = list(signalStream)
+    assert all(np.shares_memory(chunk, chunks[0]) for chunk in chunks)
@@ -0,0 +1,31 @@
+import numpy as np
+
+from custom_modules.results_store import ResultsStore
+
+def test_rollup_skips_acquisitions_without_target(tmp_path):
+    with ResultsStore(str(tmp_path / 'results.sqlite')) as store:
+        # Two detections and one acquisition under the target threshold, same direction and hour
+        store.append(3600.0, 'c1', 0, 0.0, 10.0, -40.0, 150.0, 120.0, 180.0, 1.0)
+        store.append(3660.0, 'c1', 1, 0.0, 10.0, -42.0, 170.0, 140.0, 200.0, 1.2)
+        store.append(3720.0, 'c1', 2, 0.0, 10.0, -95.0, 0.0, 0.0, 0.0, 0.0, detected=False)
+        results = store.query()
+        rollup = store.rollup(3600)
+    assert len(results) == 3
+    assert results['FFT_dBV_peak'][2] == -95.0
+    assert np.all(np.isnan([results[field][2] for field in ('centroid_Hz', 'band_start_Hz', 'band_stop_Hz', 'surface_velocity')]))
+    assert len(rollup) == 1
+    assert rollup['timestamp'][0] == 3600.0
+    assert rollup['count'][0] == 2
+    assert np.isclose(rollup['surface_velocity_mean'][0], 1.1)
+    assert rollup['surface_velocity_min'][0] == 1.0
+    assert np.isclose(rollup['centroid_Hz_mean'][0], 160.0)
+
+def test_rollup_buckets_and_direction_filter(tmp_path):
+    with ResultsStore(str(tmp_path / 'results.sqlite')) as store:
+        for hour in range(3):
+            for direction_DEG, velocity in ((-15.0, 0.5), (15.0, 0.7)):
+                store.append(hour*3600.0 + 10, 'c', 0, direction_DEG, 10.0, -40.0, 100.0, 80.0, 120.0, velocity + hour)
+        rollup = store.rollup(3600, start=3600, direction_DEG=15.0)
+    assert list(rollup['timestamp']) == [3600.0, 7200.0]
+    assert np.all(rollup['direction_DEG'] == 15.0)
+    assert np.allclose(rollup['surface_velocity_mean'], [1.7, 2.7])
@@ -0,0 +1,28 @@
+import pytest
+
+from custom_modules.scan_pipeline import ScanPipeline
+
+def test_jobs_in_submission_order():
+    outputs = []
+    with ScanPipeline(lambda job: job * 2, outputs.append) as pipeline:
+        for job in range(20):
+            pipeline.check()
+            pipeline.submit(job)
+    assert outputs == [2 * job for job in range(20)]
+
+def test_no_acquisition_after_a_processing_failure():
+    # The failure is raised by check(), before the next job of the first stage is started
+    def process(job):
+        if job == 1:
+            raise RuntimeError("processing failed")
+        return job
+    acquired = []
+    with pytest.raises(RuntimeError, match="processing failed"):
+        with ScanPipeline(process, lambda result: None) as pipeline:
+            for job in range(5):
+                pipeline.check()
+                acquired.append(job)
+                pipeline.submit(job)
+                if job == 1:
+                    pipeline.failed.wait(5) # Processing done before the next acquisition
+    assert acquired == [0, 1]
@@ -0,0 +1,124 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from custom_modules.scheduler import CronSchedule, IntervalSchedule, StopRequest, make_schedule, run_forever
+
+def brute_force_next_run(expression, after, limit_days=800):
+    # Reference: every day, then every minute of the matching days, checked against the cron fields
+    def values(text, minimum, maximum):
+        result = set()
+        for item in text.split(','):
+            rangeText, _, stepText = item.partition('/')
+            if rangeText == '*':
+                start, stop = minimum, maximum
+            elif '-' in rangeText:
+                start, stop = map(int, rangeText.split('-'))
+            else:
+                start = int(rangeText)
+                stop = maximum if stepText else start
+            result.update(range(start, stop + 1, int(stepText or 1)))
+        return result
+    minute, hour, day, month, weekday = expression.split()
+    minutes, hours, days, months = values(minute, 0, 59), values(hour, 0, 23), values(day, 1, 31), values(month, 1, 12)
+    weekdays = {value % 7 for value in values(weekday, 0, 7)}
+    first = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    midnight = first.replace(hour=0, minute=0)
+    for dayIndex in range(limit_days):
+        date = midnight + timedelta(days=dayIndex)
+        dayMatches, weekdayMatches = date.day in days, date.isoweekday() % 7 in weekdays
+        if day != '*' and weekday != '*':
+            dayOk = dayMatches or weekdayMatches
+        else:
+            dayOk = dayMatches and weekdayMatches
+        if date.month not in months or not dayOk:
+            continue
+        for minuteOfDay in range(24 * 60):
+            time = date + timedelta(minutes=minuteOfDay)
+            if time >= first and time.hour in hours and time.minute in minutes:
+                return time
+    return None
+
+@pytest.mark.parametrize('expression, after, expected', [
+    ('*/15 * * * *', datetime(2024, 3, 10, 12, 7, 30), datetime(2024, 3, 10, 12, 15)),
+    ('*/15 * * * *', datetime(2024, 3, 10, 12, 15), datetime(2024, 3, 10, 12, 30)), # Strictly after
+    ('*/15 * * * *', datetime(2024, 3, 10, 12, 14, 59, 999999), datetime(2024, 3, 10, 12, 15)),
+    ('0 0 * * *', datetime(2023, 12, 31, 23, 59), datetime(2024, 1, 1, 0, 0)), # Year rollover
+    ('30 6-20/2 * * *', datetime(2024, 3, 10, 20, 30), datetime(2024, 3, 11, 6, 30)),
+    ('0 12 31 * *', datetime(2024, 4, 1), datetime(2024, 5, 31, 12, 0)), # Months without a 31st skipped
+    ('0 0 29 2 *', datetime(2024, 3, 1), datetime(2028, 2, 29, 0, 0)), # Leap day
+    ('0 0 29 2 *', datetime(2023, 6, 1), datetime(2024, 2, 29, 0, 0)),
+    ('0 8 * * 1-5', datetime(2024, 3, 8, 9, 0), datetime(2024, 3, 11, 8, 0)), # Friday to Monday
+    ('0 8 * * 0', datetime(2024, 3, 8), datetime(2024, 3, 10, 8, 0)), # Sunday as 0...
+    ('0 8 * * 7', datetime(2024, 3, 8), datetime(2024, 3, 10, 8, 0)), # ... and as 7
+    ('0 8 13 * 5', datetime(2024, 3, 1), datetime(2024, 3, 1, 8, 0)), # Both day fields: either matches (Friday)
+    ('0 8 13 * 5', datetime(2024, 3, 12, 9, 0), datetime(2024, 3, 13, 8, 0)),
+    ('0 8 1-7 * */7', datetime(2024, 3, 8), datetime(2024, 3, 10, 8, 0)),
+    ('5,10-12,50-59/5 1 * 1,7 *', datetime(2024, 1, 31, 1, 55), datetime(2024, 7, 1, 1, 5)),
+])
+def test_cron_next_run(expression, after, expected):
+    assert CronSchedule(expression).next_run(after) == expected
+
+@pytest.mark.parametrize('expression', ['*/7 */5 * * *', '0 0 1,15 * 1', '45 23 31 1,3,12 *', '0 6 * 2 0', '59 23 28-31 2 *', '0 0 * * 6,0', '20 4 29 2 1'])
+def test_cron_next_run_matches_brute_force(expression):
+    schedule = CronSchedule(expression)
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        after = datetime(2023, 1, 1) + timedelta(minutes=int(rng.integers(0, 3*365*24*60)), seconds=int(rng.integers(0, 60)))
+        assert schedule.next_run(after) == brute_force_next_run(expression, after, limit_days=6*365)
+
+@pytest.mark.parametrize('expression', ['* * * *', '* * * * * *', '60 * * * *', '* 24 * * *', '* * 0 * *', '* * * 13 *', '* * * * 8',
+                                        '5-1 * * * *', '*/0 * * * *', 'a * * * *', '1-2-3 * * * *', '0 0 30 2 *', '0 0 31 4,6,9,11 *'])
+def test_invalid_cron_expression(expression):
+    with pytest.raises(ValueError):
+        CronSchedule(expression)
+
+def test_interval_schedule():
+    schedule = IntervalSchedule(900)
+    after = datetime(2024, 3, 10, 12, 7, 30)
+    nextRun = schedule.next_run(after)
+    assert after < nextRun <= after + timedelta(seconds=900)
+    assert nextRun.timestamp() % 900 == 0
+    assert schedule.next_run(nextRun) == nextRun + timedelta(seconds=900) # Strictly after
+    with pytest.raises(ValueError):
+        IntervalSchedule(0)
+
+def test_make_schedule():
+    assert isinstance(make_schedule(60), IntervalSchedule)
+    assert isinstance(make_schedule(60, ''), IntervalSchedule)
+    schedule = make_schedule(60, '*/5 * * * *') # The cron expression wins
+    assert isinstance(schedule, CronSchedule) and str(schedule) == 'cron "*/5 * * * *"'
+
+class _Soon:
+    # Schedule with a cycle every few milliseconds
+    def next_run(self, after):
+        return after + timedelta(milliseconds=5)
+
+def test_run_forever_goes_on_after_a_failed_cycle():
+    stopRequest = StopRequest()
+    calls = []
+    def cycle():
+        calls.append(len(calls))
+        if len(calls) == 1:
+            raise RuntimeError("first cycle fails")
+    def between_cycles():
+        if len(calls) == 3:
+            stopRequest.event.set()
+        return _Soon()
+    assert run_forever(_Soon(), cycle, between_cycles, stopRequest, runNow=True) == 2
+    assert calls == [0, 1, 2]
+
+def test_run_forever_stopped_while_waiting():
+    stopRequest = StopRequest()
+    stopRequest.event.set()
+    assert run_forever(IntervalSchedule(3600), lambda: pytest.fail("no cycle expected"), stopRequest=stopRequest) == 0
+
+def test_run_forever_keeps_the_schedule_after_a_failed_reconfiguration():
+    stopRequest = StopRequest()
+    calls = []
+    def between_cycles():
+        if len(calls) == 3:
+            stopRequest.event.set()
+        raise ZeroDivisionError("float division by zero")
+    assert run_forever(_Soon(), lambda: calls.append(len(calls)), between_cycles, stopRequest, runNow=True) == 3
@@ -0,0 +1,72 @@
+import json
+import os
+
+import pytest
+
+from custom_modules import settings as settings_module
+from custom_modules.settings import Settings, SettingsError, SettingsWatcher
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def shipped_settings(driver):
+    with open(os.path.join(REPOSITORY, driver, 'settings.json')) as f:
+        return json.load(f)
+
+@pytest.mark.parametrize('driver', ['sense2gol_pizero', 'unipg_prototype'])
+def test_shipped_settings_are_valid(driver):
+    settings = Settings(shipped_settings(driver))
+    assert settings.fftPlan.maxBin <= settings.fftPlan.freqBins_FFT
+
+@pytest.mark.parametrize('driver', ['sense2gol_pizero', 'unipg_prototype'])
+@pytest.mark.parametrize('key, value, message', [('fft-resolution-Hz', 1e6, 'fft-resolution-Hz'),
+                                                 ('frequency-max-Hz', 1e6, 'Nyquist'),
+                                                 ('frequency-min-Hz', -1e6, 'Nyquist')])
+def test_values_beyond_the_sampling_frequency_rejected(driver, key, value, message):
+    raw = shipped_settings(driver)
+    raw['signal-processing'][key] = value
+    with pytest.raises(SettingsError, match=message):
+        Settings(raw)
+
+def test_derived_quantities_errors_are_settings_errors(monkeypatch):
+    def broken_plan(*args):
+        raise ZeroDivisionError("float division by zero")
+    monkeypatch.setattr(settings_module.FFTPlan, 'from_settings', broken_plan)
+    with pytest.raises(SettingsError, match='ZeroDivisionError'):
+        Settings(shipped_settings('sense2gol_pizero'))
+
+def test_watcher_keeps_previous_settings(tmp_path):
+    fileName = str(tmp_path / 'settings.json')
+    raw = shipped_settings('sense2gol_pizero')
+    with open(fileName, 'w') as f:
+        json.dump(raw, f)
+    watcher = SettingsWatcher(fileName)
+    previous = watcher.settings
+    raw['signal-processing']['fft-resolution-Hz'] = 1e6
+    with open(fileName, 'w') as f:
+        json.dump(raw, f)
+    os.utime(fileName, ns=(previous.modificationTime + 10**9, previous.modificationTime + 10**9))
+    assert watcher.reload_if_changed() is False
+    assert watcher.settings is previous
+    raw['signal-processing']['fft-resolution-Hz'] = 2
+    with open(fileName, 'w') as f:
+        json.dump(raw, f)
+    os.utime(fileName, ns=(previous.modificationTime + 2*10**9, previous.modificationTime + 2*10**9))
+    assert watcher.reload_if_changed() is True
+    assert watcher.settings.signalProcessing.fftResolution_Hz == 2.0
+
+def test_watcher_reject_restores_previous_settings(tmp_path):
+    # Reloaded settings that could not be applied: previous ones back, the file is not reloaded until modified again
+    fileName = str(tmp_path / 'settings.json')
+    raw = shipped_settings('sense2gol_pizero')
+    with open(fileName, 'w') as f:
+        json.dump(raw, f)
+    watcher = SettingsWatcher(fileName)
+    previous = watcher.settings
+    raw['raspberry-pi-zero']['directions'] = 5
+    with open(fileName, 'w') as f:
+        json.dump(raw, f)
+    os.utime(fileName, ns=(previous.modificationTime + 10**9, previous.modificationTime + 10**9))
+    assert watcher.reload_if_changed() is True
+    watcher.reject(previous)
+    assert watcher.settings is previous
+    assert watcher.reload_if_changed() is False
@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+from scipy import signal as scipy_signal
+
+from custom_modules.devices import SimulatedScene, SimulatedSense2GoL
+from custom_modules.sense2gol import raw_extract, serial_buffer_size, serial_read
+from custom_modules.signal_processing import StreamingSTFT, stft_columns
+
+SAMPLING_FREQUENCY = 3000.0 # Hz
+
+def scipy_spectrogram(signal_mV, SAMPLES_IN_SEGMENT, OVERLAPPING_SAMPLES, STFT_BINS):
+    # Reference, with frequencies in ascending order
+    f, t, Sxx = scipy_signal.spectrogram(signal_mV, SAMPLING_FREQUENCY, nperseg=SAMPLES_IN_SEGMENT, noverlap=OVERLAPPING_SAMPLES, nfft=STFT_BINS,
+                                         scaling='spectrum', return_onesided=False, detrend=False)
+    return np.fft.fftshift(f), t, np.fft.fftshift(Sxx, axes=0)
+
+def feed(stft, signal_mV, seed=0):
+    # Chunks of random length, from single samples to several segments
+    rng = np.random.default_rng(seed)
+    start = 0
+    while start < len(signal_mV):
+        stop = start + int(rng.integers(1, 700))
+        stft.update(signal_mV[start:stop])
+        start = stop
+
+@pytest.mark.parametrize('SAMPLES_IN_SEGMENT, OVERLAPPING_SAMPLES, STFT_BINS', [(128, 96, 256), (256, 0, 256), (100, 50, 128)])
+def test_matches_scipy_spectrogram(SAMPLES_IN_SEGMENT, OVERLAPPING_SAMPLES, STFT_BINS):
+    rng = np.random.default_rng(1)
+    signal_mV = rng.normal(size=6000) + 1j*rng.normal(size=6000)
+    stft = StreamingSTFT(SAMPLING_FREQUENCY, SAMPLES_IN_SEGMENT, OVERLAPPING_SAMPLES, STFT_BINS)
+    feed(stft, signal_mV)
+    f, t, Sxx = scipy_spectrogram(signal_mV, SAMPLES_IN_SEGMENT, OVERLAPPING_SAMPLES, STFT_BINS)
+    freqAxis_Hz, times_s, spectrogram = stft.spectrogram()
+    assert spectrogram.shape == Sxx.shape == (STFT_BINS, stft_columns(len(signal_mV), SAMPLES_IN_SEGMENT, OVERLAPPING_SAMPLES))
+    assert np.allclose(freqAxis_Hz, f)
+    assert np.allclose(times_s, t)
+    assert np.allclose(spectrogram, Sxx)
+
+@pytest.mark.parametrize('maxColumns', [0, 1, 7, 40, 1000])
+def test_max_columns_keeps_the_last_columns(maxColumns):
+    rng = np.random.default_rng(2)
+    signal_mV = rng.normal(size=5000) + 1j*rng.normal(size=5000)
+    stft = StreamingSTFT(SAMPLING_FREQUENCY, 128, 64, 256, maxColumns=maxColumns)
+    feed(stft, signal_mV, seed=3)
+    f, t, Sxx = scipy_spectrogram(signal_mV, 128, 64, 256)
+    freqAxis_Hz, times_s, spectrogram = stft.spectrogram()
+    kept = min(maxColumns, Sxx.shape[1])
+    assert spectrogram.shape == (256, kept)
+    assert np.allclose(spectrogram, Sxx[:, Sxx.shape[1]-kept:])
+    assert np.allclose(times_s, t[len(t)-kept:])
+    assert len(stft.track().times_s) == Sxx.shape[1] # The centroid track is kept whole
+
+def test_reset_and_update_columns():
+    rng = np.random.default_rng(4)
+    signal_mV = rng.normal(size=1000) + 1j*rng.normal(size=1000)
+    stft = StreamingSTFT(SAMPLING_FREQUENCY, 128, 64, 256, maxColumns=4)
+    stft.update(rng.normal(size=3000))
+    stft.reset()
+    columns = stft.update(signal_mV[:100])
+    assert len(columns.times_s) == 0 and columns.spectra.shape == (0, 256)
+    columns = stft.update(signal_mV[100:])
+    f, t, Sxx = scipy_spectrogram(signal_mV, 128, 64, 256)
+    assert np.allclose(columns.times_s, t)
+    assert np.allclose(columns.spectra, Sxx.T)
+
+def test_centroid_track_follows_the_tone():
+    t = np.arange(6000) / SAMPLING_FREQUENCY
+    signal_mV = np.exp(2j*np.pi*200*t)
+    stft = StreamingSTFT(SAMPLING_FREQUENCY, 256, 128, 1024, bandwidthThreshold=3.0)
+    feed(stft, signal_mV)
+    track = stft.track()
+    assert np.allclose(track.centroid_frequencies, 200, atol=2*SAMPLING_FREQUENCY/1024)
+
+class _SerialDump:
+    # Serial port replaying a Sense2GoL dump, a few hundred bytes per read
+    def __init__(self, data):
+        self.data = data
+        self.position = 0
+        self.timeout = 1
+
+    def read(self, size):
+        chunk = self.data[self.position:self.position + min(size, 700)]
+        self.position += len(chunk)
+        return chunk
+
+@pytest.mark.parametrize('rawDataFormat', ['txt', 'bin'])
+def test_fed_during_acquisition(tmp_path, rawDataFormat):
+    # Samples handed over while they arrive (simulated Sense2GoL, and serial_read() of the same dump): same STFT as the extracted signal
+    FRAMES, SAMPLES_PER_FRAME, ADC_RANGE_BITS, ADC_RANGE_V = 20, 128, 4096, 3.3
+    radar = SimulatedSense2GoL(SimulatedScene(seed=5), outputPath=str(tmp_path))
+    stfts = []
+    def new_stft():
+        stfts.append(StreamingSTFT(SAMPLING_FREQUENCY, 256, 128, 512, maxColumns=stft_columns(FRAMES*SAMPLES_PER_FRAME, 256, 128)))
+        def onSamples(firstSample, I_samples, Q_samples):
+            if firstSample == 0:
+                stfts[-1].reset()
+            stfts[-1].update((Q_samples + 1j*I_samples) * ADC_RANGE_V / ADC_RANGE_BITS * 1000) # I and Q swapped, as in txt_extract()
+        return onSamples
+    fileName = radar.acquire('tilt', 0, 1, 'dir', FRAMES, SAMPLES_PER_FRAME, 0, 1.0, rawDataFormat, SAMPLING_FREQUENCY, ADC_RANGE_BITS, ADC_RANGE_V, 10.0, 0.0, new_stft())
+    complexSignal_mV = raw_extract(fileName, ADC_RANGE_BITS, ADC_RANGE_V, SAMPLING_FREQUENCY)[2]
+    if rawDataFormat == 'txt':
+        with open(fileName, 'rb') as dump:
+            serial_read(_SerialDump(dump.read()), FRAMES, SAMPLES_PER_FRAME, serial_buffer_size(FRAMES, SAMPLES_PER_FRAME, 10), 5.0, new_stft())
+    f, t, Sxx = scipy_spectrogram(complexSignal_mV, 256, 128, 512)
+    for stft in stfts:
+        freqAxis_Hz, times_s, spectrogram = stft.spectrogram()
+        assert np.allclose(spectrogram, Sxx)
+        assert np.allclose(times_s, t)
@@ -1,107 +1,228 @@
-import json
+import argparse
 from datetime import datetime
+import logging
+import os
 import shutil
 import sys
 
 sys.path.insert(1, ".")
-import custom_modules.picoscope as picoscope
+from custom_modules.devices import open_accelerometer, open_radar
+from custom_modules.instrumentation import METRICS, instrumented, span
+from custom_modules.logging_setup import configure_logging
+from custom_modules.online_statistics import DirectionStatistics
+from custom_modules.raw_capture import CAPTURE_EXTENSION, CaptureStream, load_capture
+from custom_modules.results_store import ResultsStore
+from custom_modules.scheduler import make_schedule, run_forever
+from custom_modules.sense2gol import acquisition_label, write_report
+from custom_modules.settings import get_settings, SettingsWatcher
 from custom_modules.signal_processing import *
-import custom_modules.tilt_sensor_adafruit_ADXL345 as ADXL345
-
-def main():
-
-    # Load settings from *.json file.
-    with open('unipg_prototype/settings.json') as f:
-        settings = json.load(f)
-
-    # Save current *.json
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-    json_filename = "./unipg_prototype/raw_samples/" + timestamp + ".json"
-    shutil.copyfile("./unipg_prototype/settings.json", json_filename)
-
-    # Mounting support settings
-    PIVOT_HEIGHT = settings["mounting-support"]["pivot-height-m"] # m. Height of the pivot of the tiltable plane.
-    WATER_VERTICAL_DISTANCE = settings["mounting-support"]["water-vertical-distance-m"] # m. Vertical distance from water level and radar mounting support.
-    RX_ANTENNA_OFFSET = settings["mounting-support"]["rx-antenna-offset-m"] # m. Distance between RX antenna and pivot.
-
-    # Antenna properties
-    MIN_SQUINT_ANGLE = settings["antennas"]["min-squint-angle-deg"] # Degrees. Minimum horizontal beam angle, where 0° is the broadside direction.
-    FREQ_MIN_SQUINT = float(settings["antennas"]["freq-min-squint-hz"]) # Hz. TRX frequency corresponding to beam directed toward MIN_SQUINT_ANGLE
-    MAX_SQUINT_ANGLE = settings["antennas"]["max-squint-angle-deg"] # Degrees. Maximum horizontal beam angle, where 0° is the broadside direction.
-    FREQ_MAX_SQUINT = float(settings["antennas"]["freq-max-squint-hz"]) # Hz. TRX frequency corresponding to beam directed toward MAX_SQUINT_ANGLE
-
-    # Accelerometer settings
-    ACCELEROMETER_AVERAGES = settings["accelerometer"]["averages"] # Tilt angle is evaluated averaging multiple measurements.
-    REPEAT_MEASUREMENT = settings["accelerometer"]["repeat-measurement"] # Ask to repeat tilt angle measurement.
-    ## Parameters from calibration
-    X_MIN = settings["accelerometer"]["x-min"] 
-    X_MAX = settings["accelerometer"]["x-max"]
-    Y_MIN = settings["accelerometer"]["y-min"]
-    Y_MAX = settings["accelerometer"]["y-max"]
-    Z_MIN = settings["accelerometer"]["z-min"]
-    Z_MAX = settings["accelerometer"]["z-max"]
-
-    # PicoScope 2206B settings
-    ACQUISITION_TIME = float(settings["picoscope"]["acquisition-time-s"]) # s
-    SAMPLING_FREQUENCY = picoscope.conform_sampling_frequency(float(settings["picoscope"]["sampling-frequency-Hz"])) # Hz
-    print('Sampling frequency: {:.3e}'.format(SAMPLING_FREQUENCY) + ' Hz')
-    time_resolution = 1/SAMPLING_FREQUENCY # s
-    print('Time resolution: {:.3e}'.format(time_resolution) + ' s')
-    totalSamples = round(ACQUISITION_TIME/time_resolution)
-    print('Number of total samples (for each channel): {:,d}'.format(totalSamples))
-    CH_A_RANGE_V = picoscope.get_channel_range_id(settings["picoscope"]["channel-a-range-v"]) # Volts.
-    CH_B_RANGE_V = picoscope.get_channel_range_id(settings["picoscope"]["channel-b-range-v"]) # Volts.
-    TRIGGER_DELAY_SEC = float(settings["picoscope"]["trigger-delay-s"]) # s
-    triggerDelay_samples = int(SAMPLING_FREQUENCY * TRIGGER_DELAY_SEC) # trigger delay in number of samples
-
-    # Signal processing settings
-    COMPLEX_FFT = settings["signal-processing"]["complex-fft"] # Boolean. If True, the FFT of a complex signal (two-sided spectrum) is computed.
-    FFT_RESOL = settings["signal-processing"]["fft-resolution-Hz"] # Hz
-    SMOOTHING = settings["signal-processing"]["fft-smoothing"] # Boolean.
-    SMOOTHING_WINDOW = settings["signal-processing"]["smoothing-window-Hz"] # Hz. Smoothing of FFT spectrum done with moving average.
-    BANDWIDTH_THRESHOLD = settings["signal-processing"]["bandwidth-threshold-dB"] # dB. Parameter that defines the bandwidth of the Doppler centroid, with respect to the maximum value.
-    HANNING_WINDOWING = settings["signal-processing"]["hanning-windowing"] # Boolean. Enable Hanning windowing on samples before FFT computation.
-    ZERO_FORCING = settings["signal-processing"]["zero-forcing"] # Boolean. Enable forcing FFT to zero, everywhere except between FREQUENCY_MIN and FREQUENCY_MAX.
-    FREQUENCY_MIN = settings["signal-processing"]["frequency-min-Hz"] # Hz. Before that frequency, FFT forced to zero.
-    FREQUENCY_MAX = settings["signal-processing"]["frequency-max-Hz"] # Hz. After that frequency, FFT forced to zero.
-    PRINT_FFT_INFO = settings["signal-processing"]["print-fft-info"] # Boolean.
-    FFT_initialized = FFT_parameters(COMPLEX_FFT, SAMPLING_FREQUENCY, FFT_RESOL, SMOOTHING, SMOOTHING_WINDOW, FREQUENCY_MIN, FREQUENCY_MAX, PRINT_FFT_INFO)
-    OFFSET_REMOVAL = settings["signal-processing"]["offset-removal"] # Boolean.
-
-    # Raspberry Pi 3B+ settings
-    MEASURE_TILT_ANGLE = settings["raspberry-pi-3bplus"]["measure-tilt-angle"] # Boolean. If True, enable measurement of tilt angle with ADXL345.
-    RAW_DATA = settings["raspberry-pi-3bplus"]["raw-data"] # Boolean. Data stored in *.txt files.
-    SHOW_FIGURE = settings["raspberry-pi-3bplus"]["show-figure"] # Boolean. Disable if running on Raspberry Pi without GUI.
-    SAVE_PLOTS = settings["raspberry-pi-3bplus"]["save-plots"] # Boolean. For each acquisition, the plots saved in PNG or PDF format.
-    PNG_PLOT = settings["raspberry-pi-3bplus"]["png-plot"] # Boolean.
-    PDF_PLOT = settings["raspberry-pi-3bplus"]["pdf-plot"] # Boolean. 
-    PLOT_PATH = settings["raspberry-pi-3bplus"]["plot-path"]
-    REALTIME_MEAS = settings["raspberry-pi-3bplus"]["realtime-measurements"] # Boolean. Real-time measurements of Doppler velocity.
-    TARGET_THRESHOLD = settings["raspberry-pi-3bplus"]["target-threshold-dBV"] # dBV. If FFT maximum is under this value, target not detected.
-    MIN_BEAM_ANGLE = settings["raspberry-pi-3bplus"]["min-beam-angle"] # Degree. Angle between broadside direction and beam direction.
-    MAX_BEAM_ANGLE = settings["raspberry-pi-3bplus"]["max-beam-angle"] # Degree. Angle between broadside direction and beam direction.
-    DIRECTIONS = settings["raspberry-pi-3bplus"]["directions"]
-    if DIRECTIONS == 1: # Only broadside direction
-        antennaBeamDirections_DEG = np.array([0])
-    else:
-        antennaBeamDirections_DEG = np.linspace(start=MIN_BEAM_ANGLE, stop=MAX_BEAM_ANGLE, num=DIRECTIONS, endpoint=True) # Degrees.
-
-    # Statistical analysis settings
-    STATISTICAL_ANALYSIS = settings["statistical-analysis"]["enabling"] # Boolean. Enable/disable statystical analysis.
-    EPISODES = int(settings["statistical-analysis"]["episodes-number"]) # Number of episodes for the statystical analysis.
-    if STATISTICAL_ANALYSIS == True:
-        assert (EPISODES>=3), "Number of episodes should be 3 at least. Please edit \"settings.json\"."
-    
-    # Array to save FFT peak amplitudes and frequencies
-    FFT_dBV_peaks = np.zeros((EPISODES, DIRECTIONS))
-    centroid_frequencies = np.zeros((EPISODES, DIRECTIONS))
-    surface_velocities_table = np.zeros((EPISODES, DIRECTIONS))
-
-    # Measure tilt angle
-    accelerometer = ADXL345.setup_ADX345()
-    tiltAngle_DEG = ADXL345.tilt_angle(accelerometer, X_MIN, X_MAX, Y_MIN, Y_MAX, Z_MIN, Z_MAX, ACCELEROMETER_AVERAGES, REPEAT_MEASUREMENT) # Degrees.
-    ADXL345.sleep_mode(accelerometer)
-    tiltAngle_DEG_str = "tilt" + str("{0:.1f}".format(tiltAngle_DEG)) + "deg"
+
+DEFAULT_SETTINGS_FILE = 'unipg_prototype/settings.json'
+OUTPUT_PATH = "./unipg_prototype/output/"
+
+logger = logging.getLogger(__name__)
+
+class RiverMonitor:
+    '''
+    Measuring station: PicoScope, accelerometer, results database and reused sample buffer, kept between measurements.
+    PicoScope and accelerometer are real or simulated, as set in the "devices" settings (see custom_modules/devices.py).
+    configure() applies new settings, reopening only the devices whose settings changed;
+    scan() runs one campaign (EPISODES x DIRECTIONS) and writes its report.
+    '''
+    def __init__(self, settings, simulatedScope=False):
+        self.simulatedScope = simulatedScope # Simulated PicoScope, whatever the "devices" settings.
+        self.settings = None
+        self.accelerometer = None
+        self.scope = None
+        self.counts = None
+        self.resultsStore = None
+        self.configure(settings)
+
+    def configure(self, settings):
+        previous, self.settings = self.settings, settings
+        platform = settings.platform
+        # Console verbosity (DEBUG: per-measurement diagnostics), written by a listener thread
+        configure_logging(platform.logLevel, platform.logModuleLevels, platform.logFile)
+        settings.print_summary()
+
+        # Save current *.json
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        json_filename = OUTPUT_PATH + timestamp + ".json"
+        shutil.copyfile(settings.fileName, json_filename)
+
+        # Accelerometer (calibration in settings.accelerometer) set up once, then kept in sleep mode between measurements.
+        if previous is None or (settings.accelerometer, settings.devices) != (previous.accelerometer, previous.devices):
+            if self.accelerometer is not None:
+                self.accelerometer.close()
+            self.accelerometer = open_accelerometer(settings)
+        # PicoScope opened once, for all the acquisitions of a measurement (closed by sleep())
+        if previous is None or (settings.samplingFrequency, settings.radar, settings.devices) != (previous.samplingFrequency, previous.radar, previous.devices):
+            if self.scope is not None:
+                self.scope.close()
+            self.scope = open_radar(settings, True if self.simulatedScope else None)
+        # Without raw data, every acquisition reuses the same buffer
+        self.counts = None if platform.rawData else np.empty((2, settings.totalSamples), dtype=np.int16)
+        # Results appended to the database as soon as they are available
+        if previous is None or platform.resultsDatabase != previous.platform.resultsDatabase:
+            if self.resultsStore is not None:
+                self.resultsStore.close()
+                self.resultsStore = None
+            if platform.resultsDatabase:
+                self.resultsStore = ResultsStore(platform.resultsDatabase).open()
+        # Time, CPU and memory of each stage: JSON lines and Prometheus endpoint
+        METRICS.configure(platform.metricsFile, platform.metricsFileMaxBytes, platform.metricsFileBackups, platform.metricsPort, platform.metricsAddress)
+
+    def sleep(self):
+        # Between measurements: PicoScope closed (powered from USB, released for other programs). The accelerometer sleeps anyway.
+        self.scope.close()
+
+    def wake_up(self):
+        self.scope.open()
+
+    def close(self):
+        if self.scope is not None:
+            self.scope.close()
+            self.scope = None
+        if self.accelerometer is not None:
+            self.accelerometer.close()
+            self.accelerometer = None
+        METRICS.close()
+        if self.resultsStore is not None:
+            self.resultsStore.close()
+            self.resultsStore = None
+
+    @instrumented('scan')
+    def scan(self):
+        settings = self.settings
+        accelerometer, scope, counts, resultsStore = self.accelerometer, self.scope, self.counts, self.resultsStore
+        # Mounting support settings
+        PIVOT_HEIGHT = settings.installation.pivotHeight_m # m. Height of the pivot of the tiltable plane.
+        WATER_VERTICAL_DISTANCE = settings.installation.waterVerticalDistance_m # m. Vertical distance from water level and radar mounting support.
+        RX_ANTENNA_OFFSET = settings.installation.rxAntennaOffset_m # m. Distance between RX antenna and pivot.
+
+        # Antenna properties (beam squint)
+        antennas = settings.antennas
+
+        # PicoScope 2206B settings
+        totalSamples = settings.totalSamples
+        triggerDelay_samples = settings.triggerDelay_samples # trigger delay in number of samples
+
+        # Signal processing settings
+        fftPlan = settings.fftPlan
+        STREAM_CHUNK_SAMPLES = settings.signalProcessing.streamChunkSamples # 0: whole captures converted to mV at once.
+
+        # Raspberry Pi 3B+ settings
+        platform = settings.platform
+        DIRECTIONS = platform.directions
+        antennaBeamDirections_DEG = settings.antennaBeamDirections_DEG
+        REALTIME_MEAS = platform.realtimeMeasurements
+
+        # Statistical analysis settings
+        STATISTICAL_ANALYSIS = settings.statistics.enabled
+        EPISODES = settings.statistics.episodes # Number of episodes for the statystical analysis.
+
+        # Measure tilt angle
+        with span('tilt_angle'):
+            tiltAngle_DEG = accelerometer.tilt_angle() # Degrees.
+        tiltAngle_DEG_str = "tilt" + str("{0:.1f}".format(tiltAngle_DEG)) + "deg"
+        campaign = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+
+        # Array to save FFT peak amplitudes and frequencies
+        FFT_dBV_peaks = np.zeros((EPISODES, DIRECTIONS))
+        centroid_frequencies = np.zeros((EPISODES, DIRECTIONS))
+        surface_velocities_table = np.zeros((EPISODES, DIRECTIONS))
+        velocityStatistics = DirectionStatistics(DIRECTIONS, normalityWindow=settings.statistics.normalityWindow)
+
+        for episode in range(EPISODES):
+            text = "EPISODE {:d} OF {:d}".format(episode+1, EPISODES)
+            logger.info(f"{text:-^60}")
+            for direction in range(DIRECTIONS):
+                text = "Scanning direction " + str(direction+1) + " of " + str(DIRECTIONS)
+                logger.info(f"{text:-^60}")
+                direction_DEG = antennaBeamDirections_DEG[direction]
+                direction_DEG_str = "dir" + str("{0:.1f}".format(direction_DEG)) + "deg"
+                # Beam steering by frequency squint. The ADF4158 is programmed separately (see custom_modules/adf4158.py).
+                squintFrequency = np.interp(direction_DEG, [antennas.minSquintAngle_DEG, antennas.maxSquintAngle_DEG], [antennas.freqMinSquint_Hz, antennas.freqMaxSquint_Hz])
+                logger.debug("VCO frequency for this direction: %.4e Hz", squintFrequency)
+
+                # Acquisition: samples written by the PicoScope straight into the capture file (or into the reused buffer)
+                with span('acquisition'):
+                    if platform.rawData:
+                        label = acquisition_label(tiltAngle_DEG_str, episode, EPISODES, direction_DEG_str)
+                        captureFileName = scope.acquire_capture(OUTPUT_PATH + label + CAPTURE_EXTENSION, totalSamples, triggerDelay_samples, tiltAngle_DEG, direction_DEG, episode, EPISODES, label)
+                        header, acquiredCounts = load_capture(captureFileName)
+                    else:
+                        acquiredCounts = scope.acquire(totalSamples, triggerDelay_samples, counts, direction_DEG, tiltAngle_DEG)
+                acquisitionTime = datetime.now()
+                with span('processing'):
+                    if STREAM_CHUNK_SAMPLES > 0:
+                        # Long captures: counts converted and processed chunk by chunk (capture file read from disk as needed)
+                        signalStream = CaptureStream(acquiredCounts, scope.scales_mV(), fftPlan.complexFFT, fftPlan.channel, STREAM_CHUNK_SAMPLES)
+                        result = fftPlan.process_stream(signalStream, len(signalStream), direction_DEG, tiltAngle_DEG)
+                    else:
+                        I_array_mV, Q_array_mV = scope.to_mV(acquiredCounts)
+                        # I + jQ, or only the channel of the real FFT
+                        signal_mV = fftPlan.select(I_array_mV, Q_array_mV)
+                        # FFT evaluation
+                        result = fftPlan.process(signal_mV, direction_DEG, tiltAngle_DEG)
+                    FFT_dBV_peaks[episode,direction], centroid_frequencies[episode,direction], centroid_start, centroid_stop, centroid_threshold, surface_velocities_table[episode,direction], FFT_dBV, FFT_dBV_smoothed, freqAxis_Hz = result
+                velocityStatistics.update(direction, surface_velocities_table[episode,direction])
+                if resultsStore is not None:
+                    resultsStore.append(acquisitionTime, campaign, episode, direction_DEG, tiltAngle_DEG, FFT_dBV_peaks[episode,direction], centroid_frequencies[episode,direction], centroid_start, centroid_stop, surface_velocities_table[episode,direction], FFT_dBV_peaks[episode,direction] >= fftPlan.targetThreshold)
+                if REALTIME_MEAS == True:
+                    logger.info('[%d,\t%.1f,\t%.1f,\t%.1f,\t%.3f]', episode+1, direction_DEG, FFT_dBV_peaks[episode,direction], centroid_frequencies[episode,direction], surface_velocities_table[episode,direction])
+
+        # Report on *.txt file
+        logger.info('Generating report...')
+        reportFileName = datetime.now().strftime("%Y%m%d_%H%M%S_%f") + "_report.txt"
+        write_report(os.path.join(platform.plotPath, reportFileName), FFT_dBV_peaks, centroid_frequencies, surface_velocities_table, antennaBeamDirections_DEG, REALTIME_MEAS, STATISTICAL_ANALYSIS, velocityStatistics)
+        logger.info('Done.')
+
+def main(SETTINGS_FILE=DEFAULT_SETTINGS_FILE, daemon=False, simulatedScope=False):
+    if not daemon:
+        monitor = RiverMonitor(get_settings(SETTINGS_FILE), simulatedScope)
+        try:
+            monitor.scan()
+        finally:
+            METRICS.end_cycle()
+            monitor.close()
+        return
+
+    # Daemon mode: one measurement at startup, then on schedule. Settings reloaded between measurements, if modified.
+    watcher = SettingsWatcher(SETTINGS_FILE)
+    monitor = RiverMonitor(watcher.settings, simulatedScope)
+
+    def measurement_cycle():
+        monitor.wake_up()
+        try:
+            monitor.scan()
+        finally:
+            monitor.sleep()
+            METRICS.end_cycle()
+
+    def between_cycles():
+        previous = watcher.settings
+        if watcher.reload_if_changed():
+            try:
+                monitor.configure(watcher.settings)
+            except Exception:
+                # New settings not applicable (e.g. a device fails to reopen): back to the previous ones
+                watcher.reject(previous)
+                monitor.configure(previous)
+                raise
+        return make_schedule(watcher.settings.platform.scheduleInterval_s, watcher.settings.platform.scheduleCron)
+
+    try:
+        monitor.sleep()
+        cycles = run_forever(make_schedule(watcher.settings.platform.scheduleInterval_s, watcher.settings.platform.scheduleCron), measurement_cycle, between_cycles, runNow=True)
+        logger.info("Daemon stopped after %d measurement(s).", cycles)
+    finally:
+        monitor.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="River surface velocity monitoring with the UniPG radar prototype (PicoScope 2206B).")
+    parser.add_argument('--settings', default=DEFAULT_SETTINGS_FILE, help="Settings *.json file.")
+    parser.add_argument('--daemon', action='store_true', help="Stay resident and measure on the schedule set in the settings (schedule-interval-s, schedule-cron).")
+    parser.add_argument('--simulated-scope', action='store_true', help="Simulated PicoScope, whatever the \"devices\" settings (no hardware needed).")
+    args = parser.parse_args()
+    main(args.settings, args.daemon, args.simulated_scope)